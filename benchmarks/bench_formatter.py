@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from typing import List, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import Document
+from utils.content_formatter import ContentFormatter
+
+CATALOG_PDF = "sources/sfbu-2024-2025-university-catalog-8-20-2024.pdf"
+
+def legacy_format_content(text: str) -> str:
+    """Previous implementation: three list passes per page, kept as the reference"""
+    lines = text.split('\n')
+    lines = [line.strip() for line in lines]
+    lines = [line for line in lines if line]
+    return '\n'.join(lines)
+
+# Runs of whitespace containing a line break, matched only from the start of the run
+# (the lookbehind keeps long runs of spaces from being rescanned at every position)
+_LINE_BREAKS = re.compile(r"(?<![^\S\n])[^\S\n]*\n\s*")
+
+def regex_format_content(text: str) -> str:
+    """Single-pass alternative: one re.sub over the page, timed for comparison"""
+    return _LINE_BREAKS.sub("\n", text).strip()
+
+def legacy_format_documents(docs: List[Document]) -> List[Document]:
+    """Previous implementation: a new Document per page"""
+    return [
+        Document(page_content=legacy_format_content(doc.page_content), metadata=doc.metadata)
+        for doc in docs
+    ]
+
+def synthetic_pages(count: int, seed: int = 0) -> List[str]:
+    """
+    Generate PDF-like pages with ragged indentation, blank lines and mixed whitespace
+    Args:
+        count (int): Number of pages
+        seed (int): Random seed
+    Returns:
+        List[str]: Page texts
+    """
+    rng = random.Random(seed)
+    words = ["course", "MBA", "tuition", "$1,200", "CS-501", "credit", "units", "policy", "...."]
+    padding = [" ", "  ", "\t", " \t ", "\r", "\xa0", "　", "\x0c"]
+    pages = []
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(30, 80)):
+            if rng.random() < 0.2:
+                lines.append(rng.choice(padding) * rng.randint(0, 3))
+            else:
+                text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 14)))
+                lines.append(rng.choice(padding) * rng.randint(0, 2) + text + rng.choice(padding))
+        pages.append("\n".join(lines))
+    return pages
+
+def random_texts(count: int, seed: int = 1) -> List[str]:
+    """Short texts over a whitespace-heavy alphabet for the equivalence check"""
+    rng = random.Random(seed)
+    alphabet = "ab \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f\x85\xa0  　"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+def load_catalog_pages() -> List[str]:
+    """Pages of the catalog PDF, or an empty list if it is not available"""
+    if not os.path.exists(CATALOG_PDF):
+        return []
+    from loaders.pdf_loader import load_pdf_pages
+    return [doc.page_content for doc in load_pdf_pages(CATALOG_PDF, 0, None)]
+
+def check_equivalence(pages: List[str]) -> None:
+    """Fail loudly if the formatter output differs from the reference"""
+    for text in pages + random_texts(20_000):
+        expected = legacy_format_content(text)
+        for actual in (ContentFormatter.format_content(text), regex_format_content(text)):
+            if actual != expected:
+                raise AssertionError(f"Formatter output differs for {text!r}: {actual!r} != {expected!r}")
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Fastest of several runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def run(name: str, pages: List[str], repeat: int) -> Dict[str, float]:
+    """
+    Time the reference and current formatters on one corpus
+    Args:
+        name (str): Corpus name
+        pages (List[str]): Page texts
+        repeat (int): Runs per measurement
+    Returns:
+        dict: Timings in milliseconds
+    """
+    def documents() -> List[Document]:
+        return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(pages)]
+
+    results = {
+        "legacy_text_ms": best_time(lambda: [legacy_format_content(text) for text in pages], repeat),
+        "text_ms": best_time(lambda: [ContentFormatter.format_content(text) for text in pages], repeat),
+        "regex_text_ms": best_time(lambda: [regex_format_content(text) for text in pages], repeat),
+    }
+    # Document construction is excluded by building the inputs before timing
+    timings = {"legacy_documents_ms": [], "documents_ms": [], "in_place_ms": []}
+    for _ in range(repeat):
+        for key, formatter in (
+            ("legacy_documents_ms", legacy_format_documents),
+            ("documents_ms", ContentFormatter.format_documents),
+            ("in_place_ms", lambda docs: ContentFormatter.format_documents(docs, in_place=True)),
+        ):
+            docs = documents()
+            start = time.perf_counter()
+            formatter(docs)
+            timings[key].append((time.perf_counter() - start) * 1000)
+    results.update({key: min(values) for key, values in timings.items()})
+
+    megabytes = sum(len(text) for text in pages) / 1e6
+    print(f"\n{name}: {len(pages)} pages, {megabytes:.1f} MB")
+    print("-" * 50)
+    for key, value in results.items():
+        print(f"{key:<22}{value:>10.2f}")
+    return results
+
+def main(pages: int = 2000, repeat: int = 5):
+    """
+    Benchmark ContentFormatter against the previous implementation
+    Args:
+        pages (int): Number of synthetic pages
+        repeat (int): Runs per measurement, the fastest is reported
+    """
+    synthetic = synthetic_pages(pages)
+    catalog = load_catalog_pages()
+    check_equivalence(synthetic + catalog)
+    print("Output identical to the previous implementation")
+
+    run("Synthetic", synthetic, repeat)
+    if catalog:
+        run("Catalog PDF", catalog, repeat)
+    else:
+        print(f"\n{CATALOG_PDF} not found, skipping PDF-derived text")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the content formatter")
+    parser.add_argument("--pages", type=int, default=2000, help="Number of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    args = parser.parse_args()
+    main(pages=args.pages, repeat=args.repeat)
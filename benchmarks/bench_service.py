@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import argparse
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorstore import EmbeddingsStore, VectorSearch, FakeEmbeddings
+from vectorstore.search_service import SearchService
+from benchmarks.synthetic import synthetic_documents, synthetic_queries
+from benchmarks.bench_suite import latency_summary
+
+async def run_client(port: int, queries: List[str], k: int, latencies: List[float], statuses: Dict[int, int]):
+    """Send queries one after another over a keep-alive connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for query in queries:
+            body = json.dumps({"query": query, "k": k}).encode("utf-8")
+            start = time.perf_counter()
+            writer.write(
+                b"POST /search HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+async def load_test(
+    search: VectorSearch,
+    embedding: FakeEmbeddings,
+    concurrency: int,
+    requests_per_client: int,
+    k: int,
+    max_batch_size: int,
+    max_wait_ms: float,
+    max_pending: int
+) -> Dict[str, Any]:
+    """
+    Run concurrent clients against an in-process service
+    Args:
+        search (VectorSearch): Search to serve
+        embedding (FakeEmbeddings): Query embedding model, for counting calls
+        concurrency (int): Concurrent client connections
+        requests_per_client (int): Sequential requests per client
+        k (int): Results per query
+        max_batch_size (int): Service batch limit; 1 disables batching
+        max_wait_ms (float): Service batch window
+        max_pending (int): Service queue limit
+    Returns:
+        dict: Throughput, latency percentiles, status counts and embedding calls
+    """
+    service = SearchService(
+        search, port=0, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, max_pending=max_pending
+    )
+    port = await service.start()
+    queries = synthetic_queries(concurrency * requests_per_client, seed=7)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    calls = embedding.calls
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            run_client(
+                port,
+                queries[client * requests_per_client:(client + 1) * requests_per_client],
+                k,
+                latencies,
+                statuses
+            )
+            for client in range(concurrency)
+        ])
+    finally:
+        seconds = time.perf_counter() - start
+        await service.stop()
+    result = latency_summary(latencies) if latencies else {"count": 0}
+    result.update({
+        "requests_per_second": sum(statuses.values()) / seconds,
+        "statuses": statuses,
+        "embedding_calls": embedding.calls - calls,
+        "batches": service.batcher.batches,
+        "mean_batch_size": service.batcher.queries / max(service.batcher.batches, 1)
+    })
+    return result
+
+def main(
+    documents: int = 2000,
+    concurrency: int = 500,
+    requests_per_client: int = 4,
+    k: int = 5,
+    embedding_latency_ms: float = 20.0,
+    max_batch_size: int = 64,
+    max_wait_ms: float = 5.0,
+    max_pending: int = 1024
+):
+    """
+    Load-test the search service with and without micro-batching
+    Args:
+        documents (int): Synthetic pages in the index
+        concurrency (int): Concurrent client connections
+        requests_per_client (int): Sequential requests per client
+        k (int): Results per query
+        embedding_latency_ms (float): Delay of each fake embedding call, mimicking a remote model
+        max_batch_size (int): Batch limit of the batched run
+        max_wait_ms (float): Batch window of the batched run
+        max_pending (int): Queue limit of both runs
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_service_")
+    try:
+        embedding = FakeEmbeddings(256)
+        store = EmbeddingsStore(
+            persist_directory=workdir,
+            cache_dir=None,
+            embedding=embedding,
+            backend="numpy",
+            dedup_threshold=None,
+            lexical_index=False
+        )
+        search = VectorSearch(store.process_documents(synthetic_documents(documents)))
+        embedding.latency = embedding_latency_ms / 1000
+        print(f"{concurrency} clients x {requests_per_client} requests, "
+              f"{embedding_latency_ms:.0f} ms per embedding call")
+        print("-" * 88)
+        print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'embed calls':>13}{'batch':>8}  statuses")
+        results = {}
+        for mode, batch_size in (("unbatched", 1), ("batched", max_batch_size)):
+            result = asyncio.run(load_test(
+                search, embedding, concurrency, requests_per_client, k,
+                batch_size, max_wait_ms, max_pending
+            ))
+            results[mode] = result
+            print(f"{mode:<12}{result['requests_per_second']:>10.0f}{result.get('p50_ms', 0):>10.1f}"
+                  f"{result.get('p95_ms', 0):>10.1f}{result.get('p99_ms', 0):>10.1f}"
+                  f"{result['embedding_calls']:>13}{result['mean_batch_size']:>8.1f}  {result['statuses']}")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the micro-batching search service")
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic pages in the index")
+    parser.add_argument("--concurrency", type=int, default=500, help="Concurrent client connections")
+    parser.add_argument("--requests-per-client", type=int, default=4, help="Sequential requests per client")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0, help="Delay per embedding call")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Batch limit of the batched run")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Batch window of the batched run")
+    parser.add_argument("--max-pending", type=int, default=1024, help="Queued queries before 503")
+    args = parser.parse_args()
+    main(
+        documents=args.documents,
+        concurrency=args.concurrency,
+        requests_per_client=args.requests_per_client,
+        k=args.k,
+        embedding_latency_ms=args.embedding_latency_ms,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending
+    )
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+from typing import List, Dict, Any
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorstore import NumpyVectorIndex, ShardedVectorIndex, FakeEmbeddings
+from benchmarks.bench_suite import latency_summary
+
+SOURCE_TYPES = ["PDF", "URL", "YouTube"]
+
+def synthetic_rows(count: int, dimension: int, sources: int, seed: int = 0):
+    """Random unit vectors with source, source_type and page metadata"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{number}" for number in range(count)]
+    metadatas = [
+        {
+            "source": f"source-{number % sources}",
+            "source_type": SOURCE_TYPES[number % len(SOURCE_TYPES)],
+            "page": number % 50
+        }
+        for number in range(count)
+    ]
+    texts = [f"text of chunk {number}" for number in range(count)]
+    return ids, vectors, metadatas, texts
+
+def measure(
+    index: ShardedVectorIndex,
+    queries: np.ndarray,
+    k: int,
+    batch_size: int,
+    filter: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Time single queries and batches against a sharded index
+    Args:
+        index (ShardedVectorIndex): Index to search
+        queries (np.ndarray): Query embeddings
+        k (int): Results per query
+        batch_size (int): Queries per batch in the throughput run
+        filter (dict, optional): Metadata filter
+    Returns:
+        dict: Latency percentiles of single queries and batched queries per second
+    """
+    index.search(queries[:1], k, filter)  # start the workers and map the shards
+    latencies: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k, filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+    result = latency_summary(latencies)
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        index.search(queries[offset:offset + batch_size], k, filter)
+    result["batched_queries_per_second"] = len(queries) / (time.perf_counter() - start)
+    return result
+
+def main(
+    rows: int = 200_000,
+    dimension: int = 256,
+    queries: int = 200,
+    k: int = 10,
+    batch_size: int = 64,
+    shard_counts: List[int] = (1, 2, 4, 8),
+    workers: str = "process",
+    shard_by: str = "hash"
+):
+    """
+    Compare ingest time, query latency and throughput across shard counts
+    Args:
+        rows (int): Synthetic rows in the index
+        dimension (int): Embedding dimension
+        queries (int): Queries per measurement
+        k (int): Results per query
+        batch_size (int): Queries per batch in the throughput run
+        shard_counts (list): Shard counts to compare
+        workers (str): "process", "thread" or "none", see ShardedVectorIndex
+        shard_by (str): "hash" or "source"
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_shards_")
+    try:
+        embedding = FakeEmbeddings(dimension)
+        ids, vectors, metadatas, texts = synthetic_rows(rows, dimension, sources=max(rows // 100, 1))
+        probes = np.random.default_rng(1).normal(size=(queries, dimension)).astype(np.float32)
+        reference = NumpyVectorIndex(embedding)
+        reference.upsert(ids, vectors, metadatas, texts)
+        expected = [[reference.ids[row] for row in rows] for rows, _ in reference.search_rows(probes, k)]
+        del reference
+
+        print(f"{rows} rows x {dimension} dims, {queries} queries, k={k}, "
+              f"workers={workers}, shard_by={shard_by}, {os.cpu_count()} CPUs")
+        print("-" * 92)
+        print(f"{'shards':>6}{'ingest s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'qps':>8}"
+              f"{'batch qps':>11}{'filtered p50':>14}{'recall':>8}")
+        results = {}
+        for shards in shard_counts:
+            directory = os.path.join(workdir, f"shards-{shards}")
+            index = ShardedVectorIndex(embedding, directory, num_shards=shards, shard_by=shard_by, workers=workers)
+            try:
+                start = time.perf_counter()
+                for offset in range(0, rows, 10_000):
+                    index.upsert(
+                        ids[offset:offset + 10_000],
+                        vectors[offset:offset + 10_000],
+                        metadatas[offset:offset + 10_000],
+                        texts[offset:offset + 10_000]
+                    )
+                index.save()
+                ingest = time.perf_counter() - start
+                found = [[chunk_id for _, chunk_id in hits] for hits in index.search(probes, k)]
+                recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, expected)])
+                result = measure(index, probes, k, batch_size)
+                filtered = measure(index, probes, k, batch_size, {"source_type": "PDF", "page": {"$lt": 25}})
+            finally:
+                index.close()
+            result.update({"ingest_seconds": ingest, "recall": float(recall), "filtered": filtered})
+            results[shards] = result
+            print(f"{shards:>6}{ingest:>10.2f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                  f"{result['p99_ms']:>9.2f}{result['queries_per_second']:>8.0f}"
+                  f"{result['batched_queries_per_second']:>11.0f}{filtered['p50_ms']:>14.2f}{recall:>8.2f}")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sharded vector index")
+    parser.add_argument("--rows", type=int, default=200_000, help="Synthetic rows in the index")
+    parser.add_argument("--dimension", type=int, default=256, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batch in the throughput run")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="Shard counts to compare")
+    parser.add_argument("--workers", choices=["process", "thread", "none"], default="process",
+                        help="Where shards are searched")
+    parser.add_argument("--shard-by", choices=["hash", "source"], default="hash", help="Shard key")
+    args = parser.parse_args()
+    main(
+        rows=args.rows,
+        dimension=args.dimension,
+        queries=args.queries,
+        k=args.k,
+        batch_size=args.batch_size,
+        shard_counts=args.shards,
+        workers=args.workers,
+        shard_by=args.shard_by
+    )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import argparse
+from typing import List, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.content_formatter import ContentFormatter
+from utils.text_splitter import OffsetTextSplitter
+from loaders.pdf_loader import load_pdf_pages
+
+CATALOG_PDF = "sources/sfbu-2024-2025-university-catalog-8-20-2024.pdf"
+
+def best_time(func: Callable[[], List[Document]], repeat: int) -> float:
+    """Fastest of several runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def check_offsets(docs: List[Document], chunks: List[Document]) -> None:
+    """Fail loudly if a chunk's offsets do not point at its text"""
+    texts = {(doc.metadata["source"], doc.metadata["page"]): doc.page_content for doc in docs}
+    for chunk in chunks:
+        text = texts[(chunk.metadata["source"], chunk.metadata["page"])]
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        if text[start:end] != chunk.page_content:
+            raise AssertionError(f"Chunk offsets ({start}, {end}) do not match its text")
+
+def main(pdf_path: str = CATALOG_PDF, repeat: int = 5, copies: int = 1):
+    """
+    Benchmark OffsetTextSplitter against RecursiveCharacterTextSplitter
+    Args:
+        pdf_path (str): PDF to split
+        repeat (int): Runs per measurement, the fastest is reported
+        copies (int): Times the PDF pages are repeated to enlarge the corpus
+    """
+    docs = ContentFormatter.format_documents(load_pdf_pages(pdf_path, 0, None), in_place=True) * copies
+    megabytes = sum(len(doc.page_content) for doc in docs) / 1e6
+    print(f"{pdf_path}: {len(docs)} pages, {megabytes:.1f} MB")
+
+    splitters = {
+        "recursive (chars)": RecursiveCharacterTextSplitter(
+            chunk_size=1500, chunk_overlap=150, add_start_index=True
+        ),
+        "offset (chars)": OffsetTextSplitter(chunk_size=1500, chunk_overlap=150),
+        "offset (tokens)": OffsetTextSplitter(chunk_size=350, chunk_overlap=35, length_unit="tokens"),
+    }
+    print("-" * 60)
+    print(f"{'splitter':<20}{'ms':>10}{'chunks':>10}{'avg chars':>12}")
+    for name, splitter in splitters.items():
+        chunks = splitter.split_documents(docs)
+        if isinstance(splitter, OffsetTextSplitter):
+            check_offsets(docs, chunks)
+        elapsed = best_time(lambda: splitter.split_documents(docs), repeat)
+        average = sum(len(chunk.page_content) for chunk in chunks) / max(len(chunks), 1)
+        print(f"{name:<20}{elapsed:>10.2f}{len(chunks):>10}{average:>12.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the text splitters")
+    parser.add_argument("--pdf", default=CATALOG_PDF, help="PDF to split")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--copies", type=int, default=1, help="Repeat the pages to enlarge the corpus")
+    args = parser.parse_args()
+    main(pdf_path=args.pdf, repeat=args.repeat, copies=args.copies)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import List, Dict, Any, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements a short-lived process typically starts with
+SCENARIOS = {
+    "import loaders": "import loaders",
+    "import vectorstore": "import vectorstore",
+    "query path": "from vectorstore import VectorSearch, NumpyVectorIndex",
+    "ingest path": "from vectorstore import EmbeddingsStore; from loaders import DocumentLoaderFactory",
+}
+
+# Runs in a fresh interpreter and reports import time, memory and module count
+PROBE = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+baseline = set(sys.modules)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "ms": seconds * 1000,
+    "import_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024,
+    "modules": len(set(sys.modules) - baseline),
+    "heavy": sorted(name for name in ("langchain_openai", "langchain_community.vectorstores", "chromadb",
+                                      "langchain_community.document_loaders", "pypdf", "dotenv")
+                    if name in sys.modules)
+}}))
+"""
+
+def measure(statement: str, repeat: int) -> Dict[str, Any]:
+    """
+    Import cost of a statement in fresh interpreters
+    Args:
+        statement (str): Python statement to time
+        repeat (int): Interpreters started; the fastest run is reported
+    Returns:
+        dict: Time, resident memory added, modules loaded and heavy modules imported
+    """
+    runs: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(root=ROOT, statement=statement)],
+            capture_output=True, text=True, check=True,
+            env=dict(os.environ, ANONYMIZED_TELEMETRY="False")
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["ms"])
+
+def main(repeat: int = 5, output: Optional[str] = None):
+    """
+    Benchmark package import time and memory
+    Args:
+        repeat (int): Interpreters started per scenario
+        output (str, optional): Save the results as JSON
+    """
+    results = {}
+    print(f"{'scenario':<20}{'ms':>10}{'RSS MB':>10}{'modules':>10}  heavy imports")
+    print("-" * 80)
+    for name, statement in SCENARIOS.items():
+        results[name] = measure(statement, repeat)
+        result = results[name]
+        print(f"{name:<20}{result['ms']:>10.1f}{result['import_rss_mb']:>10.1f}"
+              f"{result['modules']:>10}  {', '.join(result['heavy']) or '-'}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark package startup time and import memory")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreters started per scenario")
+    parser.add_argument("--output", default=None, help="Save the results to this JSON file")
+    args = parser.parse_args()
+    main(repeat=args.repeat, output=args.output)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+from typing import List, Dict, Any, Optional, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+from utils.content_formatter import ContentFormatter
+from vectorstore import EmbeddingsStore, VectorSearch, FakeEmbeddings, NumpyVectorIndex
+from vectorstore.ingest_manifest import IngestManifest
+from benchmarks.synthetic import synthetic_documents, synthetic_queries
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def git_commit() -> Optional[str]:
+    """Commit of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Percentiles of latencies given in milliseconds"""
+    return {
+        "count": len(latencies),
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "queries_per_second": float(len(latencies) / (sum(latencies) / 1000))
+    }
+
+class StageTimer:
+    """Time named pipeline stages and record their throughput"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def run(self, name: str, func: Callable[[], Any], items: Callable[[Any], int]) -> Any:
+        """
+        Run a stage
+        Args:
+            name (str): Stage name
+            func (callable): Stage body
+            items (callable): Number of items processed, given the stage result
+        Returns:
+            Result of func
+        """
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        count = items(result)
+        self.stages[name] = {
+            "seconds": seconds,
+            "items": count,
+            "items_per_second": count / seconds if seconds > 0 else float("inf"),
+            "peak_rss_mb": peak_rss_mb()
+        }
+        print(f"{name:<8}{count:>9} items {seconds:>9.3f} s {self.stages[name]['items_per_second']:>12.0f} /s")
+        return result
+
+def write_index(backend: str, directory: str, embedding: FakeEmbeddings, chunks: List[Document],
+                ids: List[str], vectors: List[List[float]]):
+    """Write embedded chunks to a fresh store of the given backend"""
+    if backend == "numpy":
+        vectordb = NumpyVectorIndex(embedding, persist_directory=directory)
+        target = vectordb
+    else:
+        vectordb = Chroma(persist_directory=directory, embedding_function=embedding)
+        target = vectordb._collection
+    for start in range(0, len(chunks), 1000):
+        target.upsert(
+            ids=ids[start:start + 1000],
+            embeddings=vectors[start:start + 1000],
+            metadatas=[chunk.metadata for chunk in chunks[start:start + 1000]],
+            documents=[chunk.page_content for chunk in chunks[start:start + 1000]]
+        )
+    if backend == "numpy":
+        vectordb.save()
+    return vectordb
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[set]:
+    """Row sets of the exact cosine top-k per query"""
+    scores = queries @ vectors.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row[np.isfinite(scores[i, row])].tolist()) for i, row in enumerate(top)]
+
+def recall_at_k(search: VectorSearch, query_vectors: List[List[float]], expected: List[set],
+                ids: List[str], k: int, filter_criteria: Optional[Dict[str, Any]] = None) -> float:
+    """Mean share of the exact top-k found by the store"""
+    row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+    recalls = []
+    for (found, _), exact in zip(search._query(query_vectors, k, filter_criteria), expected):
+        if exact:
+            recalls.append(len(exact.intersection(row_of[chunk_id] for chunk_id in found)) / len(exact))
+    return float(np.mean(recalls)) if recalls else 1.0
+
+def query_parity(search: VectorSearch, vectordb, queries: List[str], k: int) -> Dict[str, bool]:
+    """Whether batched and cached searches return what similarity_search returns"""
+    def key(docs):
+        return [(doc.page_content, sorted(doc.metadata.items())) for doc in docs]
+    expected = [key(vectordb.similarity_search(query, k=k)) for query in queries]
+    return {
+        "search_many": [key(docs) for docs in search.search_many(queries, k)] == expected,
+        "search_many_single": all(
+            key(search.search_many([query], k)[0]) == docs for query, docs in zip(queries, expected)
+        ),
+        "basic_similarity_search": all(
+            key(search.basic_similarity_search(query, k)) == docs for query, docs in zip(queries, expected)
+        )
+    }
+
+def main(
+    documents: int = 2000,
+    words_per_page: int = 300,
+    queries: int = 200,
+    k: int = 5,
+    backend: str = "numpy",
+    dimension: int = 256,
+    pdf: Optional[str] = None,
+    output: str = "benchmark_results.json",
+    query_prefix: str = "query: "
+):
+    """
+    Run the offline benchmark suite and save the results as JSON
+    Args:
+        documents (int): Synthetic pages to generate
+        words_per_page (int): Words per synthetic page
+        queries (int): Queries per latency and recall measurement
+        k (int): Results per query
+        backend (str): "numpy" or "chroma"
+        dimension (int): Fake embedding dimension
+        pdf (str, optional): Load this PDF instead of generating pages
+        output (str): Path of the JSON results
+        query_prefix (str): Prefix the fake model adds to queries, so query and
+            document embeddings differ as with instruction-prefixed models
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    embedding = FakeEmbeddings(dimension, query_prefix=query_prefix)
+    store = EmbeddingsStore(
+        persist_directory=workdir,
+        cache_dir=None,
+        embedding=embedding,
+        backend=backend
+    )
+    timer = StageTimer()
+    try:
+        print(f"Benchmarking {backend} backend in {workdir}")
+        print("-" * 60)
+        if pdf:
+            from loaders.pdf_loader import load_pdf_pages
+            docs = timer.run("load", lambda: load_pdf_pages(pdf, 0, None), len)
+            for doc in docs:
+                doc.metadata.update({"source": pdf, "source_type": "PDF"})
+        else:
+            docs = timer.run(
+                "load", lambda: synthetic_documents(documents, words_per_page), len
+            )
+        docs = timer.run("format", lambda: ContentFormatter.format_documents(docs, in_place=True), len)
+        chunks = timer.run("split", lambda: store.text_splitter.split_documents(docs), len)
+        ids = [
+            IngestManifest.chunk_id(chunk.metadata["source"], chunk.metadata.get("page"), chunk.metadata["start_index"])
+            for chunk in chunks
+        ]
+        vectors = timer.run(
+            "embed", lambda: store.batch_embedder.embed([chunk.page_content for chunk in chunks]), len
+        )
+        vectordb = timer.run(
+            "index", lambda: write_index(backend, workdir, embedding, chunks, ids, vectors), lambda _: len(ids)
+        )
+
+        search = VectorSearch(vectordb)
+        query_texts = synthetic_queries(queries)
+        filter_criteria = {"source_type": "PDF"}
+        latencies: Dict[str, Dict[str, float]] = {}
+        for name, run_query in (
+            ("basic_similarity_search", lambda query: search.basic_similarity_search(query, k)),
+            ("advanced_similarity_search",
+             lambda query: search.advanced_similarity_search(query, k, filter_criteria)),
+        ):
+            for query in query_texts[:10]:
+                run_query(query)
+            timings = []
+            for query in query_texts:
+                start = time.perf_counter()
+                run_query(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            latencies[name] = latency_summary(timings)
+            print(f"{name:<28} p50 {latencies[name]['p50_ms']:.2f} ms  "
+                  f"p95 {latencies[name]['p95_ms']:.2f} ms  p99 {latencies[name]['p99_ms']:.2f} ms")
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query_vectors = [embedding.embed_query(query) for query in query_texts]
+        query_matrix = np.asarray(query_vectors, dtype=np.float32)
+        mask = np.array([chunk.metadata.get("source_type") == "PDF" for chunk in chunks])
+        recall = {
+            "basic_similarity_search": recall_at_k(
+                search, query_vectors, exact_top_k(matrix, query_matrix, k), ids, k
+            ),
+            "advanced_similarity_search": recall_at_k(
+                search, query_vectors, exact_top_k(matrix, query_matrix, k, mask), ids, k, filter_criteria
+            )
+        }
+        print(f"recall@{k}: " + ", ".join(f"{name} {value:.3f}" for name, value in recall.items()))
+        parity = query_parity(search, vectordb, query_texts[:20], k)
+        print("same results as similarity_search: " + ", ".join(
+            f"{name} {'ok' if same else 'FAILED'}" for name, same in parity.items()
+        ))
+
+        results = {
+            "config": {
+                "documents": len(docs),
+                "chunks": len(chunks),
+                "words_per_page": words_per_page,
+                "queries": queries,
+                "k": k,
+                "backend": backend,
+                "dimension": dimension,
+                "pdf": pdf,
+                "query_prefix": query_prefix
+            },
+            "environment": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+            },
+            "stages": timer.stages,
+            "latency": latencies,
+            "recall_at_k": recall,
+            "query_parity": parity,
+            "peak_rss_mb": peak_rss_mb()
+        }
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Peak RSS {results['peak_rss_mb']:.0f} MB, results saved to {output}")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingest and search benchmarks")
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic pages to generate")
+    parser.add_argument("--words-per-page", type=int, default=300, help="Words per synthetic page")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--backend", choices=["numpy", "chroma"], default="numpy", help="Vector store backend")
+    parser.add_argument("--dimension", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--pdf", help="Benchmark on this PDF instead of synthetic pages")
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON results")
+    parser.add_argument("--query-prefix", default="query: ", help="Prefix the fake model adds to queries")
+    args = parser.parse_args()
+    main(
+        documents=args.documents,
+        words_per_page=args.words_per_page,
+        queries=args.queries,
+        k=args.k,
+        backend=args.backend,
+        dimension=args.dimension,
+        pdf=args.pdf,
+        output=args.output,
+        query_prefix=args.query_prefix
+    )
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loaders.url_loader import UrlFetcher, PageCache, load_url
+
+def synthetic_page(number: int) -> str:
+    """Catalog-like page with entities, nested tags, a script and non-ASCII text"""
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><title>Course {number} &amp; Fees</title>'
+        f'<meta name="description" content="Page {number} of the catalog">'
+        f'<script>var page = {number};</script><style>p {{ margin: 0 }}</style></head>'
+        f'<body><h1>MBA-{500 + number}</h1>\n<p>Tuition: <b>$1,{number:03d}</b> per unit &ndash; '
+        f'<a href="/apply">apply <i>now</i></a></p>\n<ul><li>Café</li><li>Größe &lt;10&gt;</li></ul>'
+        + "<p>" + " ".join(f"word{number}-{i}" for i in range(200)) + "</p></body></html>"
+    )
+
+class _PageServer(ThreadingHTTPServer):
+    """Local server with ETags, a fixed delay, switchable failures and a record of requests in flight per host"""
+    daemon_threads = True
+
+    def __init__(self, pages: Dict[str, bytes], delay: float):
+        super().__init__(("127.0.0.1", 0), _PageHandler)
+        self.pages = pages
+        self.delay = delay
+        self.bare_304 = False
+        self.failing = False
+        self.removed: Set[str] = set()
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, int] = {}
+        self.peak: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """Serve the server's pages, answering 304 to a matching If-None-Match"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        host = self.headers.get("Host", "").split(":")[0]
+        with server.lock:
+            server.in_flight[host] = server.in_flight.get(host, 0) + 1
+            server.peak[host] = max(server.peak.get(host, 0), server.in_flight[host])
+        try:
+            time.sleep(server.delay)
+            body = None if self.path in server.removed else server.pages.get(self.path)
+            if server.failing or body is None:
+                status = 503 if server.failing else 404
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            # A shared proxy may answer 304 to requests that carry no validators
+            unconditional = server.bare_304 and "no-cache" not in self.headers.get("Cache-Control", "")
+            if self.headers.get("If-None-Match") == etag or unconditional:
+                status = 304
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            status = 200
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+                server.statuses[status] = server.statuses.get(status, 0) + 1
+
+def _snapshot(docs) -> List[Any]:
+    """Comparable form of loaded documents"""
+    return [(doc.page_content, sorted(doc.metadata.items())) for doc in docs]
+
+def main(pages: int = 40, delay_ms: float = 50.0, max_workers: int = 8, max_per_host: int = 3) -> Dict[str, Any]:
+    """
+    Check and time the URL loader against a local HTTP server
+    Pages are split over two host names of the same server (127.0.0.1 and localhost)
+    so the per-host limit can be observed.
+    Args:
+        pages (int): Pages served
+        delay_ms (float): Server delay per request
+        max_workers (int): Requests in flight in total
+        max_per_host (int): Requests in flight per host
+    Returns:
+        dict: Timings, request counts and check results
+    """
+    server = _PageServer(
+        {f"/page{number}": synthetic_page(number).encode("utf-8") for number in range(pages)},
+        delay_ms / 1000
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    hosts = ["127.0.0.1", "localhost"]
+    urls = [f"http://{hosts[number % 2]}:{port}/page{number}" for number in range(pages)]
+    workdir = tempfile.mkdtemp(prefix="bench_url_")
+    source_file = os.path.join(workdir, "urls.txt")
+    with open(source_file, 'w') as f:
+        f.write("# local test pages\n" + "\n".join(urls) + "\n")
+    cache_dir = os.path.join(workdir, "cache")
+    checks: Dict[str, bool] = {}
+    results: Dict[str, Any] = {}
+
+    def run(name: str, **options) -> List[Any]:
+        server.statuses.clear()
+        server.peak.clear()
+        start = time.perf_counter()
+        docs = load_url(source_file=source_file, **options)
+        results[name] = {
+            "seconds": time.perf_counter() - start,
+            "documents": len(docs),
+            "statuses": dict(server.statuses),
+            "peak_per_host": dict(server.peak)
+        }
+        return _snapshot(docs)
+
+    try:
+        # Parsing matches WebBaseLoader on the same pages
+        try:
+            from langchain_community.document_loaders import WebBaseLoader
+            expected = _snapshot(WebBaseLoader(urls[:4]).load())
+            fetched = _snapshot(UrlFetcher(cache_dir=None).fetch_all(urls[:4]))
+            checks["same text and metadata as WebBaseLoader"] = expected == fetched
+        except ImportError as e:
+            print(f"Skipping WebBaseLoader comparison: {e}")
+
+        run("sequential", max_workers=1, max_per_host=1, cache_dir=None)
+        cold = run("cold", max_workers=max_workers, max_per_host=max_per_host, cache_dir=cache_dir)
+        checks[f"at most {max_per_host} requests in flight per host"] = (
+            max(results["cold"]["peak_per_host"].values()) <= max_per_host
+        )
+        checks["every page loaded"] = len(cold) == pages
+
+        warm = run("revalidated", max_workers=max_workers, max_per_host=max_per_host, cache_dir=cache_dir)
+        checks["second run answered with 304"] = results["revalidated"]["statuses"] == {304: pages}
+        checks["304 gives identical documents"] = warm == cold
+
+        server.bare_304 = True
+        bare = run("bare 304", max_workers=max_workers, max_per_host=max_per_host,
+                   cache_dir=os.path.join(workdir, "empty_cache"))
+        server.bare_304 = False
+        checks["304 without a cached copy is fetched in full"] = bare == cold
+
+        server.failing = True
+        failing = run("server failing", max_workers=max_workers, max_per_host=max_per_host, cache_dir=cache_dir)
+        server.failing = False
+        checks["cached pages served while the server answers 503"] = (
+            failing == cold and results["server failing"]["statuses"] == {503: pages}
+        )
+
+        server.removed.add("/page0")
+        gone = run("page removed", max_workers=max_workers, max_per_host=max_per_host, cache_dir=cache_dir)
+        checks["404 drops the page and its cached copy"] = (
+            gone == cold[1:] and PageCache(cache_dir).get(urls[0]) is None
+        )
+
+        server.shutdown()
+        server.server_close()
+        offline = run("server stopped", max_workers=max_workers, max_per_host=max_per_host, cache_dir=cache_dir)
+        checks["cached pages served with the server stopped"] = offline == cold[1:]
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{pages} pages on 2 hosts, {delay_ms:.0f} ms per request, "
+          f"max_workers={max_workers}, max_per_host={max_per_host}")
+    print("-" * 78)
+    print(f"{'run':<16}{'seconds':>9}{'docs':>6}  {'statuses':<22}peak in flight per host")
+    for name, result in results.items():
+        print(f"{name:<16}{result['seconds']:>9.2f}{result['documents']:>6}  "
+              f"{str(result['statuses']):<22}{result['peak_per_host']}")
+    print("-" * 78)
+    for name, passed in checks.items():
+        print(f"{'ok' if passed else 'FAILED':<8}{name}")
+    return {"results": results, "checks": checks}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the URL loader against a local HTTP server")
+    parser.add_argument("--pages", type=int, default=40, help="Pages served")
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="Server delay per request")
+    parser.add_argument("--max-workers", type=int, default=8, help="Requests in flight in total")
+    parser.add_argument("--max-per-host", type=int, default=3, help="Requests in flight per host")
+    args = parser.parse_args()
+    outcome = main(
+        pages=args.pages,
+        delay_ms=args.delay_ms,
+        max_workers=args.max_workers,
+        max_per_host=args.max_per_host
+    )
+    sys.exit(0 if all(outcome["checks"].values()) else 1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import random
+from typing import List
+from langchain.schema import Document
+
+SOURCE_TYPES = ["PDF", "URL", "YouTube"]
+
+def _vocabulary(topics: int, words_per_topic: int) -> List[List[str]]:
+    """Disjoint word lists, one per topic"""
+    return [[f"t{topic}w{word}" for word in range(words_per_topic)] for topic in range(topics)]
+
+def synthetic_documents(
+    count: int,
+    words_per_page: int = 300,
+    topics: int = 50,
+    pages_per_source: int = 100,
+    seed: int = 0
+) -> List[Document]:
+    """
+    Generate catalog-like pages whose words cluster by topic
+    Each page mixes words of one topic with shared filler words and line breaks,
+    so searches for topic words have meaningful nearest neighbours.
+    Args:
+        count (int): Number of pages
+        words_per_page (int): Words per page
+        topics (int): Number of topics
+        pages_per_source (int): Pages per synthetic source file
+        seed (int): Random seed
+    Returns:
+        List[Document]: Pages with source, source_type and page metadata
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(topics, 200)
+    filler = ["the", "university", "program", "course", "student", "credit", "policy", "fee"]
+    docs = []
+    for number in range(count):
+        topic = vocabulary[rng.randrange(topics)]
+        words = [
+            rng.choice(topic) if rng.random() < 0.7 else rng.choice(filler)
+            for _ in range(words_per_page)
+        ]
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        source_number = number // pages_per_source
+        docs.append(Document(
+            page_content="  \n".join(lines),
+            metadata={
+                "source": f"synthetic/source-{source_number}.pdf",
+                "source_type": SOURCE_TYPES[source_number % len(SOURCE_TYPES)],
+                "page": number % pages_per_source
+            }
+        ))
+    return docs
+
+def synthetic_queries(count: int, words: int = 6, topics: int = 50, seed: int = 1) -> List[str]:
+    """
+    Generate queries drawn from the topic vocabularies of synthetic_documents
+    Args:
+        count (int): Number of queries
+        words (int): Words per query
+        topics (int): Number of topics, as passed to synthetic_documents
+        seed (int): Random seed
+    Returns:
+        List[str]: Query texts
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(topics, 200)
+    queries = []
+    for _ in range(count):
+        topic = vocabulary[rng.randrange(topics)]
+        queries.append(" ".join(rng.choice(topic) for _ in range(words)))
+    return queries
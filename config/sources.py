@@ -20,9 +20,10 @@ class SourceConfig:
         ])
 
     def validate(self) -> bool:
-        """Validate source configuration"""
-        valid_types = {"PDF", "URL", "YouTube"}
+        """Validate source configuration against the registered loader types"""
         try:
+            from loaders.loader_factory import DocumentLoaderFactory
+            valid_types = set(DocumentLoaderFactory.source_types())
             if not self.sources:
                 return False
             for source in self.sources:
@@ -2,9 +2,12 @@
 # coding: utf-8
 
 import os
+import argparse
+from typing import Optional
 from config.sources import SourceConfig
 from loaders.loader_factory import DocumentLoaderFactory
 from vectorstore import EmbeddingsStore, VectorSearch
+from utils.metrics import metrics
 
 def test_pdf_search(search: VectorSearch):
     """Test PDF-specific search"""
@@ -105,38 +108,82 @@ def test_edge_cases(search: VectorSearch):
         ("The MBA program has prerequisites", "There are requirements for the MBA"),
         ("The campus is in Fremont", "The university is located somewhere else")
     ]
-    for s1, s2 in pairs:
-        similarity = store.compare_sentences(s1, s2)
+    # One batched embedding call for all pairs, scored pair by pair
+    scores = store.compare_pairs([s1 for s1, _ in pairs], [s2 for _, s2 in pairs])
+    if scores is None:
+        print("Could not compare the sentences")
+        return
+    for (s1, s2), similarity in zip(pairs, scores):
         print(f"\nSentence 1: '{s1}'")
         print(f"Sentence 2: '{s2}'")
         print(f"Similarity Score: {similarity:.4f}")
 
-def main():
+def main(
+    batch_size: Optional[int] = None,
+    metrics_path: Optional[str] = None,
+    profile_dir: Optional[str] = None
+):
+    """
+    Build the vector store and run the search tests
+    Args:
+        batch_size (int, optional): Stream documents through ingestion in batches of
+            this size instead of loading everything into memory first
+        metrics_path (str, optional): Record per-stage metrics and save them here as
+            JSON, with a Prometheus text copy next to it
+        profile_dir (str, optional): Save cProfile stats of loading and ingestion here
+    """
+    if metrics_path or profile_dir:
+        metrics.enable(profile_dir)
+    try:
+        run_demo(batch_size)
+    finally:
+        if metrics_path:
+            metrics.to_json(metrics_path)
+            with open(os.path.splitext(metrics_path)[0] + ".prom", 'w') as f:
+                f.write(metrics.to_prometheus())
+            print(f"\nMetrics saved to {metrics_path}")
+
+def run_demo(batch_size: Optional[int] = None):
+    """
+    Build the vector store and run the search tests
+    Args:
+        batch_size (int, optional): Stream documents through ingestion in batches of this size
+    """
     # Initialize source configuration
     config = SourceConfig.default_config()
     if not config.validate():
         print("Invalid source configuration")
         return
         
-    # Initialize document loader
-    loader = DocumentLoaderFactory()
-    
-    # Load all documents
-    print("\nLoading documents...")
-    documents = loader.load_documents(config.sources, verbose=True)
-    if not documents:
-        print("No documents loaded")
-        return
-    
-    print(f"Loaded {len(documents)} documents")
+    # Initialize document loader (sources load in parallel)
+    loader = DocumentLoaderFactory(max_workers=4)
     
     # Initialize embeddings store
     print("\nInitializing embeddings store...")
     store = EmbeddingsStore()
     
-    # Create vector store
-    print("Creating vector store...")
-    vectordb = store.process_documents(documents)
+    # Local files whose modification time and size match the last ingest are not loaded
+    unchanged = store.unchanged_sources(loader.local_sources(config.sources))
+    
+    if batch_size:
+        # Stream load -> format -> split -> embed -> write in bounded batches
+        print(f"\nStreaming documents in batches of {batch_size}...")
+        batches = loader.iter_documents(config.sources, batch_size=batch_size, verbose=True, skip=unchanged)
+        vectordb = store.process_document_stream(batches, verbose=True, unchanged=unchanged)
+    else:
+        # Load all documents
+        print("\nLoading documents...")
+        documents = loader.load_documents(config.sources, verbose=True, skip=unchanged)
+        if not documents and not unchanged:
+            print("No documents loaded")
+            return
+        
+        print(f"Loaded {len(documents)} documents")
+        
+        # Create vector store
+        print("Creating vector store...")
+        vectordb = store.process_documents(documents, unchanged=unchanged)
+    
     if not vectordb:
         print("Failed to create vector store")
         return
@@ -152,4 +199,22 @@ def main():
     test_edge_cases(search)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Vector store demo")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Stream ingestion in batches of this many documents"
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Record per-stage metrics and save them to this JSON file"
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Save cProfile stats of loading and ingestion to this directory"
+    )
+    args = parser.parse_args()
+    main(batch_size=args.batch_size, metrics_path=args.metrics, profile_dir=args.profile)
@@ -1,10 +1,25 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from typing import List
-from .loader_factory import DocumentLoaderFactory
-from .pdf_loader import load_pdf
-from .youtube_loader import load_youtube
-from .url_loader import load_url
+import importlib
+from typing import Any
 
-__all__ = ['DocumentLoaderFactory', 'load_pdf', 'load_youtube', 'load_url'] 
\ No newline at end of file
+# Public name -> defining module, imported on first attribute access
+_EXPORTS = {
+    'DocumentLoaderFactory': '.loader_factory',
+    'load_pdf': '.pdf_loader',
+    'load_youtube': '.youtube_loader',
+    'load_url': '.url_loader',
+}
+
+__all__ = ['DocumentLoaderFactory', 'load_pdf', 'load_youtube', 'load_url']
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
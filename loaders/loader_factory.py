@@ -1,72 +1,410 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from typing import List, Dict
+import importlib
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import List, Dict, Optional, Union, Iterable, Iterator, Callable, Tuple, Collection
 from langchain.schema import Document
-from .pdf_loader import load_pdf
-from .url_loader import load_url
-from .youtube_loader import load_youtube
 from utils.content_formatter import ContentFormatter
+from utils.metrics import metrics
+
+LoaderTarget = Union[str, Callable[..., Iterable[Document]]]
+
+@dataclass
+class LoaderSpec:
+    """Loader of one source type, imported on first use"""
+    load: LoaderTarget
+    keyword: Optional[str] = None
+    iterate: Optional[LoaderTarget] = None
+    # Documents depend only on the local file at the source path, so an unchanged
+    # file does not need to be loaded again
+    local_file: bool = False
+
+    @staticmethod
+    def resolve(target: LoaderTarget) -> Callable[..., Iterable[Document]]:
+        """
+        Import a loader given as "module:function"
+        Args:
+            target: Callable, or dotted path relative to the loaders package
+        Returns:
+            Callable loader
+        """
+        if callable(target):
+            return target
+        module_name, _, attribute = target.partition(":")
+        module = importlib.import_module(module_name, package=__package__)
+        return getattr(module, attribute)
+
+    def call(self, target: LoaderTarget, source_path: str) -> Iterable[Document]:
+        """Call a loader with the source path, by keyword if the loader needs one"""
+        loader = self.resolve(target)
+        if self.keyword:
+            return loader(**{self.keyword: source_path})
+        return loader(source_path)
 
 class DocumentLoaderFactory:
     """Factory for creating document loaders"""
-    
-    def __init__(self):
+
+    # Source type -> loader; modules are imported when a source of that type is loaded
+    _registry: Dict[str, LoaderSpec] = {
+        "PDF": LoaderSpec(".pdf_loader:load_pdf", iterate=".pdf_loader:iter_pdf_pages", local_file=True),
+        "URL": LoaderSpec(".url_loader:load_url", keyword="source_file"),
+        "YouTube": LoaderSpec(".youtube_loader:load_youtube", keyword="source_file"),
+    }
+
+    def __init__(self, max_workers: int = 1, pdf_pages_per_task: int = 50):
+        """
+        Initialize the loader factory
+        Args:
+            max_workers (int): Number of sources loaded concurrently, 1 loads sequentially
+            pdf_pages_per_task (int): Pages of a PDF parsed per worker process in parallel mode
+        """
         self.formatter = ContentFormatter()
-    
-    def load_documents(self, sources: List[Dict[str, str]], verbose: bool = True) -> List[Document]:
+        self.max_workers = max_workers
+        self.pdf_pages_per_task = pdf_pages_per_task
+
+    @classmethod
+    def register(
+        cls,
+        source_type: str,
+        load: LoaderTarget,
+        keyword: Optional[str] = None,
+        iterate: Optional[LoaderTarget] = None,
+        local_file: bool = False
+    ) -> None:
+        """
+        Register or replace the loader of a source type
+        Args:
+            source_type (str): Key used in source configurations, e.g. "PDF"
+            load: Callable or "module:function" returning the documents of a source
+            keyword (str, optional): Pass the source path as this keyword argument
+                instead of positionally
+            iterate: Optional callable or "module:function" yielding documents lazily,
+                used by iter_documents
+            local_file (bool): Whether the documents depend only on the file at the source
+                path, which lets unchanged files be skipped without loading them
+        """
+        cls._registry[source_type] = LoaderSpec(load, keyword, iterate, local_file)
+
+    @classmethod
+    def source_types(cls) -> List[str]:
+        """
+        Get the supported source types
+        Returns:
+            List[str]: Registered source types
+        """
+        return list(cls._registry)
+
+    @classmethod
+    def local_sources(cls, sources: List[Dict[str, str]]) -> List[str]:
+        """
+        Get the paths of sources whose documents depend only on the local file
+        Args:
+            sources: List of source configurations
+        Returns:
+            List[str]: Source paths that can be skipped when the file is unchanged
+        """
+        paths = []
+        for source in sources:
+            source_type = list(source.keys())[0]
+            spec = cls._registry.get(source_type)
+            if spec is not None and spec.local_file:
+                paths.append(source[source_type])
+        return paths
+
+    @classmethod
+    def _load_source(cls, source_type: str, source_path: str) -> Optional[List[Document]]:
+        """
+        Load raw documents for a single source
+        Args:
+            source_type (str): Type of the source
+            source_path (str): Path of the source
+        Returns:
+            List of Document objects, or None for unsupported source types
+        """
+        spec = cls._registry.get(source_type)
+        if spec is None:
+            return None
+        with metrics.timer("loader_seconds", source_type=source_type):
+            return list(spec.call(spec.load, source_path))
+
+    @classmethod
+    def _iter_source(cls, source_type: str, source_path: str) -> Optional[Iterable[Document]]:
+        """
+        Lazily load raw documents for a single source
+        Loaders registered with an iterator (PDFs, page by page) stream; the others
+        return their full, small lists.
+        Args:
+            source_type (str): Type of the source
+            source_path (str): Path of the source
+        Returns:
+            Iterable of Document objects, or None for unsupported source types
+        """
+        spec = cls._registry.get(source_type)
+        if spec is not None and spec.iterate is not None:
+            return cls._timed_pages(spec.call(spec.iterate, source_path), source_type)
+        return cls._load_source(source_type, source_path)
+
+    @staticmethod
+    def _timed_pages(pages: Iterable[Document], source_type: str) -> Iterator[Document]:
+        """
+        Time the reading of each page of a lazily loaded source
+        Args:
+            pages (Iterable[Document]): Lazily loaded documents
+            source_type (str): Type of the source, used as metric label
+        Returns:
+            Iterator[Document]: The same documents
+        """
+        pages = iter(pages)
+        while True:
+            with metrics.timer("loader_page_seconds", source_type=source_type):
+                doc = next(pages, None)
+            if doc is None:
+                return
+            yield doc
+
+    @staticmethod
+    def _collect_pdf(futures: List[Future], source_path: str) -> List[Document]:
+        """
+        Join the page ranges of a PDF loaded in parallel and cache their text
+        Args:
+            futures (list): Futures of consecutive page ranges
+            source_path (str): Path of the PDF
+        Returns:
+            List of Document objects in page order
+        """
+        from .pdf_loader import save_pdf_text
+        try:
+            docs = []
+            with metrics.timer("loader_seconds", source_type="PDF"):
+                for future in futures:
+                    docs.extend(future.result())
+            if docs:
+                save_pdf_text(source_path, docs)
+            return docs
+        except Exception as e:
+            metrics.increment("errors_total", operation="loader", source_type="PDF")
+            print(f"Error loading PDF: {e}")
+            return []
+
+    def _submit_all(
+        self,
+        sources: List[Dict[str, str]],
+        threads: ThreadPoolExecutor,
+        processes: Optional[ProcessPoolExecutor],
+        skip: Collection[str] = ()
+    ) -> List[Union[Future, List[Future], None]]:
+        """
+        Submit every source to the worker pools
+        Args:
+            sources: List of source configurations
+            threads: Pool for I/O-bound loaders
+            processes: Pool for PDF parsing
+            skip: Source paths not to load
+        Returns:
+            One future (or list of page-range futures for PDFs) per source, None for
+            skipped sources; repeated sources share the future of their first occurrence
+        """
+        from .pdf_loader import count_pdf_pages, load_pdf_pages, has_cached_text
+        submitted = []
+        first: Dict[Tuple[str, str], Union[Future, List[Future]]] = {}
+        for source in sources:
+            source_type = list(source.keys())[0]
+            source_path = source[source_type]
+            if source_path in skip:
+                submitted.append(None)
+                continue
+            if (source_type, source_path) in first:
+                submitted.append(first[(source_type, source_path)])
+                continue
+
+            # Cached PDF text is read directly; only uncached PDFs are parsed on the process pool
+            if source_type == "PDF" and processes is not None and not has_cached_text(source_path):
+                try:
+                    page_count = count_pdf_pages(source_path)
+                except Exception as e:
+                    print(f"Error loading PDF: {e}")
+                    submitted.append([])
+                    continue
+                submitted.append([
+                    processes.submit(
+                        load_pdf_pages,
+                        source_path,
+                        start,
+                        start + self.pdf_pages_per_task
+                    )
+                    for start in range(0, page_count, self.pdf_pages_per_task)
+                ])
+            else:
+                submitted.append(threads.submit(self._load_source, source_type, source_path))
+            first[(source_type, source_path)] = submitted[-1]
+        return submitted
+
+    @metrics.profiled("load_documents")
+    def load_documents(
+        self,
+        sources: List[Dict[str, str]],
+        verbose: bool = True,
+        skip: Collection[str] = ()
+    ) -> List[Document]:
         """
         Load documents from multiple sources
+        With max_workers > 1, URL and YouTube sources load on a thread pool and PDFs
+        are parsed per page range on a process pool; results keep the source order.
+        A source listed more than once is loaded once and its documents copied.
         Args:
             sources: List of source configurations
             verbose: Whether to print loading details
+            skip: Source paths not to load, e.g. EmbeddingsStore.unchanged_sources
         Returns:
             List of Document objects
         """
         documents = []
-        
+
         if verbose:
             print("\nLoading documents from sources:")
             print("=" * 50)
-        
+
+        threads = processes = None
+        submitted: List[Union[Future, List[Future], None]] = [None] * len(sources)
+        if self.max_workers > 1:
+            threads = ThreadPoolExecutor(max_workers=self.max_workers)
+            if any(list(source.keys())[0] == "PDF" for source in sources):
+                # Spawn, not fork: the thread pool may already be running URL/YouTube loads
+                processes = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            submitted = self._submit_all(sources, threads, processes, skip)
+
+        loaded: Dict[Tuple[str, str], List[Document]] = {}
+        try:
+            for source, pending in zip(sources, submitted):
+                source_type = list(source.keys())[0]
+                source_path = source[source_type]
+
+                try:
+                    if source_path in skip:
+                        if verbose:
+                            print(f"\nSkipping unchanged {source_type}: {source_path}")
+                        continue
+
+                    if verbose:
+                        print(f"\nLoading {source_type} from: {source_path}")
+
+                    if (source_type, source_path) in loaded:
+                        docs = [
+                            Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+                            for doc in loaded[(source_type, source_path)]
+                        ]
+                        documents.extend(docs)
+                        if verbose:
+                            print(f"\nReused {len(docs)} documents loaded earlier in this run")
+                        continue
+
+                    if isinstance(pending, list):
+                        docs = self._collect_pdf(pending, source_path)
+                    elif pending is not None:
+                        docs = pending.result()
+                    else:
+                        docs = self._load_source(source_type, source_path)
+
+                    if docs is None:
+                        print(f"Unsupported source type: {source_type}")
+                        continue
+
+                    if docs:
+                        metrics.increment("loader_documents_total", len(docs), source_type=source_type)
+                        # Format documents and add metadata
+                        docs = self.formatter.format_documents(docs, in_place=True)
+                        for doc in docs:
+                            doc.metadata["source_type"] = source_type
+                            doc.metadata["source"] = source_path
+
+                        documents.extend(docs)
+                        loaded[(source_type, source_path)] = docs
+
+                        if verbose:
+                            print(f"\nSuccessfully loaded {len(docs)} documents")
+                            if docs:
+                                # Print sample document
+                                self.formatter.print_document_info(docs[0])
+
+                except Exception as e:
+                    metrics.increment("errors_total", operation="loader", source_type=source_type)
+                    print(f"Error loading {source_type} from {source_path}: {e}")
+                    continue
+        finally:
+            if threads is not None:
+                threads.shutdown()
+            if processes is not None:
+                processes.shutdown()
+
+        if verbose:
+            self.formatter.print_documents_summary(documents)
+
+        return documents
+
+    def iter_documents(
+        self,
+        sources: List[Dict[str, str]],
+        batch_size: int = 64,
+        verbose: bool = True,
+        skip: Collection[str] = ()
+    ) -> Iterator[List[Document]]:
+        """
+        Stream formatted documents from multiple sources in fixed-size batches
+        Only one batch is held in memory at a time, however large the sources are.
+        Args:
+            sources: List of source configurations
+            batch_size: Number of documents per batch
+            verbose: Whether to print loading progress
+            skip: Source paths not to load, e.g. EmbeddingsStore.unchanged_sources
+        Returns:
+            Iterator over batches of Document objects
+        """
+        batch: List[Document] = []
+        total = 0
+
         for source in sources:
             source_type = list(source.keys())[0]
             source_path = source[source_type]
-            
+            loaded = 0
+            if source_path in skip:
+                if verbose:
+                    print(f"\nSkipping unchanged {source_type}: {source_path}")
+                continue
+
             try:
                 if verbose:
                     print(f"\nLoading {source_type} from: {source_path}")
-                
-                if source_type == "PDF":
-                    docs = load_pdf(source_path)
-                elif source_type == "URL":
-                    docs = load_url(source_file=source_path)
-                elif source_type == "YouTube":
-                    docs = load_youtube(source_file=source_path)
-                else:
+
+                docs = self._iter_source(source_type, source_path)
+                if docs is None:
                     print(f"Unsupported source type: {source_type}")
                     continue
-                    
-                if docs:
-                    # Format documents and add metadata
-                    docs = self.formatter.format_documents(docs)
-                    for doc in docs:
-                        doc.metadata["source_type"] = source_type
-                        doc.metadata["source"] = source_path
-                    
-                    documents.extend(docs)
-                    
-                    if verbose:
-                        print(f"\nSuccessfully loaded {len(docs)} documents")
-                        if docs:
-                            # Print sample document
-                            self.formatter.print_document_info(docs[0])
-                    
+
+                # Format documents and add metadata as they arrive
+                for doc in self.formatter.iter_format_documents(docs, in_place=True):
+                    doc.metadata["source_type"] = source_type
+                    doc.metadata["source"] = source_path
+                    batch.append(doc)
+                    loaded += 1
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+
             except Exception as e:
+                metrics.increment("errors_total", operation="loader", source_type=source_type)
                 print(f"Error loading {source_type} from {source_path}: {e}")
                 continue
-        
-        if verbose:
-            self.formatter.print_documents_summary(documents)
-            
-        return documents
\ No newline at end of file
+            finally:
+                metrics.increment("loader_documents_total", loaded, source_type=source_type)
+                total += loaded
+                if verbose:
+                    print(f"Loaded and formatted {loaded} documents ({total} total)")
+
+        if batch:
+            yield batch
@@ -2,27 +2,373 @@
 # coding: utf-8
 
 import os
-from typing import List, Optional
-from dotenv import load_dotenv, find_dotenv
-from langchain_community.document_loaders import PyPDFLoader
+import mmap
+import json
+import shutil
+import struct
+import hashlib
+import threading
+import numpy as np
+from typing import List, Optional, Iterator, Dict, Any, Tuple
 from langchain.schema import Document
+from utils.metrics import metrics
 
-_ = load_dotenv(find_dotenv())
+PDF_CACHE_DIR = "docs/pdf_cache/"
+_MAGIC = b"PDFTXT01"
 
-def load_pdf(pdf_path: str) -> List[Document]:
+class PdfTextCache:
+    """Extracted PDF text on disk, keyed by the PDF's content hash
+
+    File layout: magic, uint32 header length, JSON header (page count, extractor,
+    per-page metadata), page count + 1 little-endian uint64 offsets, UTF-8 page texts.
+    """
+
+    _hashes: Dict[Tuple[str, int, int], str] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, directory: str = PDF_CACHE_DIR):
+        """
+        Initialize the cache
+        Args:
+            directory (str): Directory holding one file per PDF content hash
+        """
+        self.directory = directory
+
+    @staticmethod
+    def extractor() -> str:
+        """Name and version of the text extractor; a new version invalidates the cache"""
+        from importlib.metadata import version
+        return f"pypdf {version('pypdf')}"
+
+    @classmethod
+    def content_hash(cls, pdf_path: str) -> str:
+        """
+        Hash the bytes of a PDF, remembering it per path, size and modification time
+        Args:
+            pdf_path (str): Path to the PDF file
+        Returns:
+            str: SHA-256 hex digest
+        """
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        with cls._lock:
+            if key in cls._hashes:
+                return cls._hashes[key]
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with cls._lock:
+            cls._hashes[key] = digest.hexdigest()
+        return cls._hashes[key]
+
+    def path(self, pdf_path: str) -> str:
+        """Cache file of a PDF"""
+        return os.path.join(self.directory, self.content_hash(pdf_path) + ".pages")
+
+    def open(self, pdf_path: str) -> Optional['CachedPdfText']:
+        """
+        Memory-map the cached text of a PDF
+        Args:
+            pdf_path (str): Path to the PDF file
+        Returns:
+            CachedPdfText: Mapped pages, or None if not cached or cached by another extractor
+        """
+        try:
+            cached = CachedPdfText(self.path(pdf_path))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable PDF text cache entry: {e}")
+            return None
+        if cached.header.get("extractor") != self.extractor():
+            cached.close()
+            return None
+        return cached
+
+    def writer(self, pdf_path: str) -> 'PdfTextWriter':
+        """
+        Start writing the pages of a PDF one at a time
+        Args:
+            pdf_path (str): Path to the PDF file
+        Returns:
+            PdfTextWriter: Writer; commit publishes the cache file, abort discards it
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        return PdfTextWriter(self.path(pdf_path), self.extractor())
+
+    def save(self, pdf_path: str, docs: List[Document]) -> None:
+        """
+        Store the pages of a PDF
+        Args:
+            pdf_path (str): Path to the PDF file
+            docs (List[Document]): Every page, in order
+        """
+        writer = self.writer(pdf_path)
+        try:
+            for doc in docs:
+                writer.add(doc)
+            writer.commit()
+        finally:
+            writer.abort()
+
+class PdfTextWriter:
+    """Incremental writer of a PDF text cache file
+
+    Page texts are spilled to a temporary file as they arrive; only offsets and
+    per-page metadata stay in memory until commit writes the final file.
+    """
+
+    def __init__(self, path: str, extractor: str):
+        """
+        Open the temporary files
+        Args:
+            path (str): Cache file to publish on commit
+            extractor (str): Extractor name stored in the header
+        """
+        self.path = path
+        self.extractor = extractor
+        self._temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._texts_path = self._temporary + ".texts"
+        self._texts = open(self._texts_path, 'wb')
+        self._offsets = [0]
+        self._metadata: List[Dict[str, Any]] = []
+
+    def add(self, doc: Document) -> None:
+        """
+        Append the next page
+        Args:
+            doc (Document): Page in document order
+        """
+        text = doc.page_content.encode("utf-8")
+        self._texts.write(text)
+        self._offsets.append(self._offsets[-1] + len(text))
+        self._metadata.append({key: value for key, value in doc.metadata.items() if key != "source"})
+
+    def commit(self) -> None:
+        """Write the header and offsets, copy the page texts after them and publish the file"""
+        self._texts.close()
+        header = json.dumps({
+            "pages": len(self._metadata),
+            "extractor": self.extractor,
+            "metadata": self._metadata
+        }).encode("utf-8")
+        with open(self._temporary, 'wb') as f:
+            f.write(_MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(np.asarray(self._offsets, dtype="<u8").tobytes())
+            with open(self._texts_path, 'rb') as texts:
+                shutil.copyfileobj(texts, f, 1 << 20)
+        os.replace(self._temporary, self.path)
+
+    def abort(self) -> None:
+        """Remove the temporary files; safe to call after commit"""
+        self._texts.close()
+        for path in (self._texts_path, self._temporary):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class CachedPdfText:
+    """Memory-mapped pages of a PDF text cache file"""
+
+    def __init__(self, path: str):
+        """
+        Map a cache file
+        Args:
+            path (str): Cache file written by PdfTextCache.save
+        """
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a PDF text cache file: {path}")
+        position = len(_MAGIC)
+        (header_length,) = struct.unpack_from("<I", self._map, position)
+        position += 4
+        self.header: Dict[str, Any] = json.loads(self._map[position:position + header_length])
+        position += header_length
+        count = self.header["pages"]
+        self._offsets = np.frombuffer(self._map, dtype="<u8", count=count + 1, offset=position)
+        self._text_start = position + 8 * (count + 1)
+
+    def __len__(self) -> int:
+        return self.header["pages"]
+
+    def page_text(self, number: int) -> str:
+        """Text of a page, decoded from the mapped file"""
+        start = self._text_start + int(self._offsets[number])
+        end = self._text_start + int(self._offsets[number + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def iter_documents(self, source: str, start: int = 0, end: Optional[int] = None) -> Iterator[Document]:
+        """
+        Build the Documents of a page range one at a time
+        Args:
+            source (str): Value of the source metadata
+            start (int): First page index (inclusive)
+            end (int, optional): Last page index (exclusive), defaults to the page count
+        Returns:
+            Iterator[Document]: Documents in page order
+        """
+        end = len(self) if end is None else min(end, len(self))
+        for number in range(start, end):
+            metadata = {"source": source}
+            metadata.update(self.header["metadata"][number])
+            yield Document(page_content=self.page_text(number), metadata=metadata)
+
+    def close(self) -> None:
+        """Unmap the file"""
+        self._offsets = None
+        self._map.close()
+
+def load_pdf(pdf_path: str, cache_dir: Optional[str] = PDF_CACHE_DIR) -> List[Document]:
     """
     Load and process a PDF document
+    Text extracted by an earlier run is read from the PDF text cache.
     Args:
         pdf_path (str): Path to the PDF file
+        cache_dir (str, optional): Directory of the PDF text cache, None disables it
     Returns:
         List[Document]: List of Document objects containing page content
     """
     try:
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
-            
-        loader = PyPDFLoader(pdf_path)
-        return loader.load()
+        return list(iter_pdf_pages(pdf_path, cache_dir=cache_dir))
     except Exception as e:
         print(f"Error loading PDF: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def has_cached_text(pdf_path: str, cache_dir: Optional[str] = PDF_CACHE_DIR) -> bool:
+    """
+    Check whether the text of a PDF is cached
+    Args:
+        pdf_path (str): Path to the PDF file
+        cache_dir (str, optional): Directory of the PDF text cache
+    Returns:
+        bool: True if loading will not run pypdf
+    """
+    if not cache_dir or not os.path.exists(pdf_path):
+        return False
+    cached = PdfTextCache(cache_dir).open(pdf_path)
+    if cached is None:
+        return False
+    cached.close()
+    return True
+
+def save_pdf_text(pdf_path: str, docs: List[Document], cache_dir: Optional[str] = PDF_CACHE_DIR) -> None:
+    """
+    Store pages parsed elsewhere, e.g. in page ranges on a process pool, in the PDF text cache
+    Args:
+        pdf_path (str): Path to the PDF file
+        docs (List[Document]): Every page, in order
+        cache_dir (str, optional): Directory of the PDF text cache, None disables it
+    """
+    if not cache_dir:
+        return
+    try:
+        PdfTextCache(cache_dir).save(pdf_path, docs)
+    except Exception as e:
+        print(f"Warning: Could not cache PDF text: {e}")
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """
+    Count the pages of a PDF document
+    Args:
+        pdf_path (str): Path to the PDF file
+    Returns:
+        int: Number of pages
+    """
+    import pypdf
+
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+    return len(pypdf.PdfReader(pdf_path).pages)
+
+def iter_pdf_pages(
+    pdf_path: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    cache_dir: Optional[str] = PDF_CACHE_DIR
+) -> Iterator[Document]:
+    """
+    Lazily load the pages of a PDF document, one Document at a time
+    Produces the same Documents as PyPDFLoader for those pages. Cached text is
+    read from a memory-mapped file; otherwise pages are extracted with pypdf and
+    a full pass over the document fills the cache.
+    Args:
+        pdf_path (str): Path to the PDF file
+        start (int): First page index (inclusive)
+        end (int, optional): Last page index (exclusive), defaults to the page count
+        cache_dir (str, optional): Directory of the PDF text cache, None disables it
+    Returns:
+        Iterator[Document]: Documents in page order
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+
+    cached = PdfTextCache(cache_dir).open(pdf_path) if cache_dir else None
+    if cached is not None:
+        metrics.increment("pdf_text_cache_total", result="hit")
+        try:
+            yield from cached.iter_documents(pdf_path, start, end)
+        finally:
+            cached.close()
+        return
+
+    import pypdf
+    if cache_dir:
+        metrics.increment("pdf_text_cache_total", result="miss")
+    reader = pypdf.PdfReader(pdf_path)
+    count = len(reader.pages)
+    end = count if end is None else min(end, count)
+    # Only a pass over every page can be cached; pages are written as they are yielded
+    writer = None
+    if cache_dir and start == 0 and end == count:
+        try:
+            writer = PdfTextCache(cache_dir).writer(pdf_path)
+        except Exception as e:
+            print(f"Warning: Could not cache PDF text: {e}")
+    try:
+        for page_number in range(start, end):
+            doc = Document(
+                page_content=reader.pages[page_number].extract_text(),
+                metadata={"source": pdf_path, "page": page_number}
+            )
+            if writer is not None:
+                # Written before yielding, callers may format the Document in place
+                try:
+                    writer.add(doc)
+                except Exception as e:
+                    print(f"Warning: Could not cache PDF text: {e}")
+                    writer.abort()
+                    writer = None
+            yield doc
+        if writer is not None:
+            try:
+                writer.commit()
+            except Exception as e:
+                print(f"Warning: Could not cache PDF text: {e}")
+    finally:
+        # Also runs when the caller stops early, leaving no partial cache file
+        if writer is not None:
+            writer.abort()
+
+def load_pdf_pages(
+    pdf_path: str,
+    start: int,
+    end: Optional[int],
+    cache_dir: Optional[str] = None
+) -> List[Document]:
+    """
+    Load a range of pages from a PDF document
+    Ranges can be parsed in separate processes and concatenated; the caller
+    stores the joined pages with save_pdf_text.
+    Args:
+        pdf_path (str): Path to the PDF file
+        start (int): First page index (inclusive)
+        end (int, optional): Last page index (exclusive), None for the page count
+        cache_dir (str, optional): Directory of the PDF text cache, None parses with pypdf
+    Returns:
+        List[Document]: List of Document objects containing page content
+    """
+    return list(iter_pdf_pages(pdf_path, start, end, cache_dir=cache_dir))
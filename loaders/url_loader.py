@@ -2,19 +2,276 @@
 # coding: utf-8
 
 import os
-from typing import List, Optional
-from dotenv import load_dotenv, find_dotenv
-from langchain_community.document_loaders import WebBaseLoader
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple
+from urllib.parse import urlsplit
 from langchain.schema import Document
+from utils.env import load_environment
+from utils.metrics import metrics
 
-_ = load_dotenv(find_dotenv())
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
 
-def load_url(url: Optional[str] = None, source_file: Optional[str] = None) -> List[Document]:
+# Bumped when parse_html changes, so pages parsed the old way are fetched again
+PAGE_CACHE_VERSION = 2
+
+def parse_html(html: str, url: str) -> Document:
     """
-    Load and process content from a URL
+    Turn an HTML page into a Document the way WebBaseLoader does
+    Args:
+        html (str): Page markup
+        url (str): Page URL, stored as the source
+    Returns:
+        Document: Page text with source, title, description and language metadata
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if page := soup.find("html"):
+        metadata["language"] = page.get("lang", "No language found.")
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
+class PageCache:
+    """Parsed pages on disk with the validators needed to revalidate them"""
+
+    def __init__(self, directory: str = "docs/url_cache/"):
+        """
+        Initialize the cache
+        Args:
+            directory (str): Directory holding one JSON file per URL
+        """
+        self.directory = directory
+
+    def _path(self, url: str) -> str:
+        """File of a URL"""
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cache entry of a URL
+        Args:
+            url (str): Page URL
+        Returns:
+            dict: etag, last_modified and the parsed document, or None if not cached
+        """
+        try:
+            with open(self._path(url), 'r') as f:
+                entry = json.load(f)
+            return entry if entry.get("version") == PAGE_CACHE_VERSION else None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable page cache entry: {e}")
+            return None
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], doc: Document) -> None:
+        """
+        Store a parsed page
+        Args:
+            url (str): Page URL
+            etag (str, optional): ETag response header
+            last_modified (str, optional): Last-Modified response header
+            doc (Document): Parsed page
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url)
+        # Unique temporary name, pages are written from several threads
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({
+                "version": PAGE_CACHE_VERSION,
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "page_content": doc.page_content,
+                "metadata": doc.metadata
+            }, f)
+        os.replace(temporary, path)
+
+    def delete(self, url: str) -> None:
+        """
+        Remove the cache entry of a URL
+        Args:
+            url (str): Page URL
+        """
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+
+class UrlFetcher:
+    """Fetch pages concurrently over one pooled session, revalidating cached copies"""
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_per_host: int = 4,
+        cache_dir: Optional[str] = "docs/url_cache/",
+        timeout: float = 30.0,
+        session=None
+    ):
+        """
+        Initialize the fetcher
+        Args:
+            max_workers (int): Requests in flight in total
+            max_per_host (int): Requests in flight per host
+            cache_dir (str, optional): Directory for cached pages, None disables the cache
+            timeout (float): Seconds to wait for a server
+            session (requests.Session, optional): Session to use, defaults to a pooled one
+        """
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.cache = PageCache(cache_dir) if cache_dir else None
+        self.timeout = timeout
+        self._session = session
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Shared session whose connection pool covers max_workers connections per host"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            load_environment()
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = os.environ.get("USER_AGENT", DEFAULT_USER_AGENT)
+            self._session = session
+        return self._session
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        """Semaphore bounding the requests in flight to the host of a URL"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    @staticmethod
+    def _transient(error: Exception) -> bool:
+        """Whether a failed request may succeed later: no connection, a timeout, 5xx or 429"""
+        import requests
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        response = getattr(error, "response", None)
+        return response is not None and (response.status_code >= 500 or response.status_code == 429)
+
+    def fetch(self, url: str) -> Tuple[Optional[Document], str]:
+        """
+        Fetch and parse a page, or reuse the cached copy if the server reports it unchanged
+        The cached copy is also served while the server is unreachable or failing; a
+        page answered with 404 or 410 is dropped from the cache.
+        Args:
+            url (str): Page URL
+        Returns:
+            tuple: Document (None on failure) and the outcome: "downloaded",
+                "not_modified", "stale" (cached copy served after a transient error) or "error"
+        """
+        entry = self.cache.get(url) if self.cache else None
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with self._host_limit(url), metrics.timer("url_fetch_seconds"):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code == 304 and not entry:
+                    # Nothing to revalidate (e.g. a proxy answered); ask for the full page
+                    response = self.session.get(url, headers={"Cache-Control": "no-cache"}, timeout=self.timeout)
+            if response.status_code == 304:
+                if not entry:
+                    raise ValueError("304 Not Modified without a cached copy")
+                return Document(page_content=entry["page_content"], metadata=entry["metadata"]), "not_modified"
+            response.raise_for_status()
+            # Decode like WebBaseLoader, which trusts the detected encoding over the headers
+            response.encoding = response.apparent_encoding
+            doc = parse_html(response.text, url)
+        except Exception as e:
+            if entry and self._transient(e):
+                print(f"Warning: Using cached copy of {url}: {e}")
+                return Document(page_content=entry["page_content"], metadata=entry["metadata"]), "stale"
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if self.cache and status in (404, 410):
+                # Removed or moved: the page must leave the index, not live on from the cache
+                self.cache.delete(url)
+            print(f"Error loading URL {url}: {e}")
+            return None, "error"
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.cache and (etag or last_modified):
+            try:
+                self.cache.put(url, etag, last_modified, doc)
+            except Exception as e:
+                print(f"Warning: Could not cache {url}: {e}")
+        return doc, "downloaded"
+
+    def fetch_all(self, urls: List[str], verbose: bool = False) -> List[Document]:
+        """
+        Fetch pages concurrently
+        Args:
+            urls (List[str]): Page URLs
+            verbose (bool): Whether to print how many pages were downloaded or reused
+        Returns:
+            List[Document]: Pages in URL order, skipping those that failed
+        """
+        _ = self.session  # create the shared session before the workers start
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls)))) as executor:
+            results = list(executor.map(self.fetch, urls))
+        outcomes: Dict[str, int] = {}
+        for _, outcome in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            metrics.increment("url_fetch_total", outcome=outcome)
+        if verbose:
+            print(", ".join(f"{count} {outcome.replace('_', ' ')}" for outcome, count in outcomes.items()))
+        return [doc for doc, _ in results if doc is not None]
+
+def read_urls(source_file: str) -> List[str]:
+    """
+    Read URLs from a file, one per line
+    Args:
+        source_file (str): Path of the file; blank lines and lines starting with # are skipped
+    Returns:
+        List[str]: URLs in file order, without repeats
+    """
+    with open(source_file, 'r') as f:
+        lines = [line.strip() for line in f]
+    return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+def load_url(
+    url: Optional[str] = None,
+    source_file: Optional[str] = None,
+    max_workers: int = 8,
+    max_per_host: int = 4,
+    cache_dir: Optional[str] = "docs/url_cache/",
+    fetcher: Optional[UrlFetcher] = None
+) -> List[Document]:
+    """
+    Load and process content from one or more URLs
+    Pages are fetched concurrently over a pooled session. Cached pages are
+    revalidated with ETag / Last-Modified, so unchanged pages are neither
+    downloaded nor parsed again.
     Args:
         url (str, optional): Direct URL to load
-        source_file (str, optional): Path to file containing URL
+        source_file (str, optional): Path to file containing URLs, one per line
+        max_workers (int): Requests in flight in total
+        max_per_host (int): Requests in flight per host
+        cache_dir (str, optional): Directory for cached pages, None disables the cache
+        fetcher (UrlFetcher, optional): Fetcher to reuse across calls
     Returns:
         List[Document]: List of Document objects containing web content
     """
@@ -22,14 +279,15 @@ def load_url(url: Optional[str] = None, source_file: Optional[str] = None) -> Li
         if source_file:
             if not os.path.exists(source_file):
                 raise FileNotFoundError(f"Source file not found: {source_file}")
-            with open(source_file, 'r') as f:
-                url = f.read().strip()
-                
-        if not url:
+            urls = read_urls(source_file)
+        else:
+            urls = [url] if url else []
+
+        if not urls:
             raise ValueError("No URL provided")
-            
-        loader = WebBaseLoader(url)
-        return loader.load()
+
+        fetcher = fetcher or UrlFetcher(max_workers, max_per_host, cache_dir)
+        return fetcher.fetch_all(urls, verbose=len(urls) > 1)
     except Exception as e:
         print(f"Error loading URL: {e}")
-        return []
\ No newline at end of file
+        return []
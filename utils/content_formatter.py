@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 from langchain.schema import Document
+from .metrics import metrics
 
 class ContentFormatter:
     """Format and validate document content"""
@@ -16,37 +17,67 @@ class ContentFormatter:
         Returns:
             str: Formatted text content
         """
-        # Remove excessive whitespace
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
-        lines = [line for line in lines if line]
-        return '\n'.join(lines)
+        # Strip every line and drop empty ones in one lazy pipeline; the only
+        # intermediate list is the one from split. A single re.sub over the page
+        # gives the same output but runs 5-10x slower, since every space between
+        # words starts a match attempt (see benchmarks/bench_formatter.py)
+        return '\n'.join(filter(None, map(str.strip, text.split('\n'))))
     
     @staticmethod
-    def format_document(doc: Document) -> Document:
+    def format_document(doc: Document, in_place: bool = False) -> Document:
         """
         Format a single document
         Args:
             doc (Document): Document to format
+            in_place (bool): Update doc itself instead of building a new Document
         Returns:
             Document: Formatted document
         """
-        formatted_content = ContentFormatter.format_content(doc.page_content)
+        with metrics.timer("format_seconds"):
+            formatted_content = ContentFormatter.format_content(doc.page_content)
+        if in_place:
+            doc.page_content = formatted_content
+            return doc
         return Document(
             page_content=formatted_content,
             metadata=doc.metadata
         )
     
     @staticmethod
-    def format_documents(docs: List[Document]) -> List[Document]:
+    def format_documents(docs: List[Document], in_place: bool = False) -> List[Document]:
         """
         Format a list of documents
         Args:
             docs (List[Document]): Documents to format
+            in_place (bool): Update the documents themselves instead of copying them
         Returns:
             List[Document]: Formatted documents
         """
-        return [ContentFormatter.format_document(doc) for doc in docs]
+        metrics.increment("format_documents_total", len(docs))
+        with metrics.timer("format_batch_seconds"):
+            if in_place:
+                format_content = ContentFormatter.format_content
+                for doc in docs:
+                    doc.page_content = format_content(doc.page_content)
+                return docs
+            return [
+                Document(page_content=ContentFormatter.format_content(doc.page_content), metadata=doc.metadata)
+                for doc in docs
+            ]
+    
+    @staticmethod
+    def iter_format_documents(docs: Iterable[Document], in_place: bool = False) -> Iterator[Document]:
+        """
+        Lazily format a stream of documents
+        Args:
+            docs (Iterable[Document]): Documents to format
+            in_place (bool): Update the documents themselves instead of copying them
+        Returns:
+            Iterator[Document]: Formatted documents, one at a time
+        """
+        for doc in docs:
+            metrics.increment("format_documents_total")
+            yield ContentFormatter.format_document(doc, in_place)
     
     @staticmethod
     def print_document_info(doc: Document, max_content_length: int = 200) -> None:
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+_loaded = False
+
+def load_environment() -> None:
+    """
+    Load variables from the nearest .env file
+    Called by the components that need API keys right before first use, so that
+    importing the packages stays cheap; later calls do nothing.
+    """
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv())
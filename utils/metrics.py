@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import json
+import time
+import threading
+import functools
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Tuple, List, Callable
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+# Upper bounds of the buckets for batch sizes and token counts
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10_000, 20_000, 50_000, 100_000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class _Histogram:
+    """Bucketed distribution of observed values"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        """
+        Create an empty histogram
+        Args:
+            buckets (tuple): Sorted bucket upper bounds; larger values go to +Inf
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to its bucket"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class _NoOpTimer:
+    """Timer returned while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_OP_TIMER = _NoOpTimer()
+
+class _Timer:
+    """Context manager observing its duration in a latency histogram"""
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            self.registry.increment("errors_total", operation=self.name, error=exc_type.__name__)
+        return False
+
+class MetricsRegistry:
+    """Counters, timers and histograms with JSON and Prometheus export"""
+
+    def __init__(self, enabled: bool = False, profile_dir: Optional[str] = None):
+        """
+        Initialize the registry
+        Args:
+            enabled (bool): Record metrics; when False every call returns immediately
+            profile_dir (str, optional): Directory for cProfile captures, None disables profiling
+        """
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._profiles = 0
+
+    def enable(self, profile_dir: Optional[str] = None) -> None:
+        """
+        Start recording
+        Args:
+            profile_dir (str, optional): Also capture cProfile stats of profiled operations here
+        """
+        self.enabled = True
+        if profile_dir:
+            self.profile_dir = profile_dir
+
+    def disable(self) -> None:
+        """Stop recording and profiling"""
+        self.enabled = False
+        self.profile_dir = None
+
+    def reset(self) -> None:
+        """Drop all recorded values"""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        """Hashable, order-independent form of a label set"""
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Add to a counter
+        Args:
+            name (str): Counter name, e.g. "loader_documents_total"
+            value (float): Amount to add
+            **labels: Label values, e.g. source_type="PDF"
+        """
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels) -> None:
+        """
+        Record a value in a histogram
+        Args:
+            name (str): Histogram name, e.g. "embedding_batch_size"
+            value (float): Observed value
+            buckets (tuple): Bucket upper bounds, fixed by the first observation of a series
+            **labels: Label values
+        """
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """
+        Time a block of code into a latency histogram
+        Exceptions leaving the block are counted in errors_total.
+        Args:
+            name (str): Histogram name, e.g. "search_seconds"
+            **labels: Label values
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NO_OP_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """
+        Decorator timing every call of a function
+        Args:
+            name (str): Histogram name
+            **labels: Label values
+        Returns:
+            Decorator
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def profiled(self, name: str) -> Callable:
+        """
+        Decorator capturing cProfile stats of each call while a profile directory is set
+        Stats are written to <profile_dir>/<name>-<n>.prof for pstats or snakeviz.
+        Args:
+            name (str): Operation name used in the file name
+        Returns:
+            Decorator
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.profile_dir:
+                    return func(*args, **kwargs)
+                import cProfile
+                profiler = cProfile.Profile()
+                try:
+                    return profiler.runcall(func, *args, **kwargs)
+                finally:
+                    with self._lock:
+                        self._profiles += 1
+                        number = self._profiles
+                    os.makedirs(self.profile_dir, exist_ok=True)
+                    profiler.dump_stats(os.path.join(self.profile_dir, f"{name}-{number}.prof"))
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get all recorded values
+        Returns:
+            dict: Counters and histograms (count, sum, mean, bucket-estimated p50/p95/p99)
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "p50": histogram.quantile(0.50),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": dict(zip(
+                            [str(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts
+                        ))
+                    }
+                    for key, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"timestamp": time.time(), "counters": counters, "histograms": histograms}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Export a snapshot as JSON
+        Args:
+            path (str, optional): Also write it to this file
+        Returns:
+            str: JSON text
+        """
+        text = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    @staticmethod
+    def _prometheus_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        """Render a label set, escaping backslashes, quotes and newlines"""
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = [
+            (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in pairs
+        ]
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    def to_prometheus(self, prefix: str = "") -> str:
+        """
+        Export in the Prometheus text exposition format
+        Args:
+            prefix (str): Prepended to every metric name
+        Returns:
+            str: Exposition text
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = re.sub(r'[^a-zA-Z0-9_:]', '_', prefix + name)
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{self._prometheus_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                metric = re.sub(r'[^a-zA-Z0-9_:]', '_', prefix + name)
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{metric}_bucket{self._prometheus_labels(key, ('le', le))} {cumulative}")
+                    lines.append(f"{metric}_sum{self._prometheus_labels(key)} {histogram.sum}")
+                    lines.append(f"{metric}_count{self._prometheus_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+# Shared registry; set METRICS_ENABLED=1 (and METRICS_PROFILE_DIR) to record from startup
+metrics = MetricsRegistry(
+    enabled=os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes"),
+    profile_dir=os.environ.get("METRICS_PROFILE_DIR") or None
+)
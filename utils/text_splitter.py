@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import re
+from bisect import bisect_left
+from typing import List, Optional, Sequence, Tuple
+from langchain.schema import Document
+from .metrics import metrics
+
+_WHITESPACE = re.compile(r'\s')
+
+class OffsetTextSplitter:
+    """Split text into overlapping chunks described by offsets into the original text"""
+
+    def __init__(
+        self,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 150,
+        length_unit: str = "chars",
+        separators: Sequence[str] = ("\n\n", "\n", " "),
+        encoding_name: str = "cl100k_base"
+    ):
+        """
+        Initialize the splitter
+        Args:
+            chunk_size (int): Maximum chunk length in length_unit
+            chunk_overlap (int): Length shared by consecutive chunks, in length_unit
+            length_unit (str): "chars" or "tokens" to measure with tiktoken
+            separators (Sequence[str]): Preferred break points, best first; chunks are
+                cut mid-word only when none occurs in the window
+            encoding_name (str): tiktoken encoding used when length_unit is "tokens"
+        """
+        if length_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unsupported length unit: {length_unit}")
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.separators = tuple(separators)
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _token_starts(self, text: str) -> List[int]:
+        """
+        Character offset at which each token of the text starts
+        Args:
+            text (str): Text to tokenize
+        Returns:
+            List[int]: Non-decreasing offsets, estimated as one token per 4 characters
+                if tiktoken is unavailable
+        """
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                print(f"Warning: tiktoken unavailable, estimating token counts: {e}")
+        if self._encoding is None:
+            return list(range(0, len(text), 4))
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return self._encoding.decode_with_offsets(tokens)[1]
+
+    def _window_end(self, start: int, token_starts: Optional[List[int]], length: int) -> int:
+        """End offset of the longest window starting at start that fits chunk_size"""
+        if token_starts is None:
+            return min(start + self.chunk_size, length)
+        index = bisect_left(token_starts, start) + self.chunk_size
+        end = token_starts[index] if index < len(token_starts) else length
+        return max(end, start + 1)
+
+    def _overlap_start(self, text: str, start: int, end: int, token_starts: Optional[List[int]]) -> int:
+        """Start of the next chunk: chunk_overlap back from end, moved to a word start"""
+        if self.chunk_overlap <= 0:
+            return end
+        if token_starts is None:
+            target = end - self.chunk_overlap
+        else:
+            target = token_starts[max(bisect_left(token_starts, end) - self.chunk_overlap, 0)]
+        target = max(target, start + 1)
+        if text[target - 1].isspace():
+            return target
+        match = _WHITESPACE.search(text, target, end)
+        return match.end() if match else end
+
+    def split_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Compute chunk boundaries without copying the text
+        Args:
+            text (str): Text to split
+        Returns:
+            List[Tuple[int, int]]: (start, end) offsets of each chunk, with surrounding
+                whitespace excluded
+        """
+        length = len(text)
+        token_starts = self._token_starts(text) if self.length_unit == "tokens" else None
+        chunks: List[Tuple[int, int]] = []
+        start, previous_end = 0, 0
+        while True:
+            while start < length and text[start].isspace():
+                start += 1
+            if start >= length:
+                break
+
+            limit = self._window_end(start, token_starts, length)
+            end = limit
+            if limit < length:
+                # Break at the last separator of the window, preferring the best
+                # separator that still leaves the chunk at least a quarter full
+                lowest = max(start + (limit - start) // 4, previous_end + 1)
+                for separator in self.separators:
+                    position = text.rfind(separator, lowest, limit)
+                    if position > start:
+                        end = position
+                        break
+
+            chunk_end = end
+            while chunk_end > start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            # Skip a chunk that adds nothing beyond the overlap with the previous one
+            if chunk_end > start and (not chunks or chunk_end > chunks[-1][1]):
+                chunks.append((start, chunk_end))
+            if end >= length:
+                break
+            previous_end = end
+            start = self._overlap_start(text, start, end, token_starts)
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks
+        Args:
+            text (str): Text to split
+        Returns:
+            List[str]: Chunk texts
+        """
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Split documents into chunks
+        Args:
+            documents (List[Document]): Documents to split
+        Returns:
+            List[Document]: Chunks carrying the document metadata plus start_index and
+                end_index, the chunk offsets in the document text
+        """
+        chunks = []
+        with metrics.timer("split_seconds", unit=self.length_unit):
+            for doc in documents:
+                text = doc.page_content
+                for start, end in self.split_offsets(text):
+                    metadata = dict(doc.metadata)
+                    metadata["start_index"] = start
+                    metadata["end_index"] = end
+                    chunks.append(Document(page_content=text[start:end], metadata=metadata))
+        metrics.increment("split_documents_total", len(documents))
+        metrics.increment("split_chunks_total", len(chunks))
+        return chunks
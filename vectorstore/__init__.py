@@ -1,4 +1,50 @@
-from .embeddings_store import EmbeddingsStore
-from .vector_search import VectorSearch
+import importlib
+from typing import Any
 
-__all__ = ['EmbeddingsStore', 'VectorSearch'] 
\ No newline at end of file
+# Public name -> defining module, imported on first attribute access so that
+# query-only processes never load the OpenAI or Chroma clients
+_EXPORTS = {
+    'EmbeddingsStore': '.embeddings_store',
+    'VectorSearch': '.vector_search',
+    'CachedEmbeddings': '.embedding_cache',
+    'BatchEmbedder': '.batch_embedder',
+    'FakeEmbeddings': '.fake_embeddings',
+    'SearchCache': '.search_cache',
+    'NumpyVectorIndex': '.numpy_index',
+    'ShardedVectorIndex': '.sharded_store',
+    'IVFIndex': '.ivf_index',
+    'CompressedVectorIndex': '.quantization',
+    'compression_report': '.quantization',
+    'MetadataIndex': '.metadata_index',
+    'BM25Index': '.bm25_index',
+    'SearchService': '.search_service',
+    'QueryBatcher': '.search_service',
+}
+
+__all__ = [
+    'EmbeddingsStore',
+    'VectorSearch',
+    'CachedEmbeddings',
+    'BatchEmbedder',
+    'FakeEmbeddings',
+    'SearchCache',
+    'NumpyVectorIndex',
+    'ShardedVectorIndex',
+    'IVFIndex',
+    'CompressedVectorIndex',
+    'compression_report',
+    'MetadataIndex',
+    'BM25Index',
+    'SearchService',
+    'QueryBatcher'
+]
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
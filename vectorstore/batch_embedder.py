@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional, Callable
+from langchain.schema.embeddings import Embeddings
+from utils.metrics import metrics, SIZE_BUCKETS
+
+class BatchEmbedder:
+    """Embed texts in token-budgeted batches with several requests in flight"""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        max_tokens_per_batch: int = 50_000,
+        max_texts_per_batch: int = 1000,
+        max_workers: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        encoding_name: str = "cl100k_base"
+    ):
+        """
+        Initialize the batch embedder
+        Args:
+            embedding (Embeddings): Embedding model to call
+            max_tokens_per_batch (int): Token budget of a single request
+            max_texts_per_batch (int): Maximum number of texts in a single request
+            max_workers (int): Number of requests in flight
+            max_retries (int): Retries per batch after a rate-limit error
+            base_delay (float): Initial backoff delay in seconds
+            max_delay (float): Upper bound of the backoff delay in seconds
+            encoding_name (str): tiktoken encoding used to count tokens
+        """
+        self.embedding = embedding
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_texts_per_batch = max_texts_per_batch
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens of a text
+        Args:
+            text (str): Text to measure
+        Returns:
+            int: Token count, estimated from length if tiktoken is unavailable
+        """
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                print(f"Warning: tiktoken unavailable, estimating token counts: {e}")
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Pack texts into request batches by token count
+        Args:
+            texts (List[str]): Texts to embed
+        Returns:
+            List[List[int]]: Batches of indices into texts, in input order
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (
+                current_tokens + tokens > self.max_tokens_per_batch
+                or len(current) >= self.max_texts_per_batch
+            ):
+                batches.append(current)
+                metrics.observe("embedding_batch_tokens", current_tokens, SIZE_BUCKETS)
+                current = []
+                current_tokens = 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+            metrics.observe("embedding_batch_tokens", current_tokens, SIZE_BUCKETS)
+        return batches
+
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """
+        Check whether an error signals rate limiting
+        Args:
+            error (Exception): Error raised by the embedding model
+        Returns:
+            bool: True for HTTP 429 responses and provider rate-limit exceptions
+        """
+        if getattr(error, "status_code", None) == 429:
+            return True
+        if getattr(getattr(error, "response", None), "status_code", None) == 429:
+            return True
+        if type(error).__name__ == "RateLimitError":
+            return True
+        # Not a bare "429", which also turns up in token counts, request IDs and ports
+        message = str(error).lower()
+        return "rate limit" in message or "too many requests" in message
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, backing off on rate-limit errors"""
+        metrics.observe("embedding_batch_size", len(texts), SIZE_BUCKETS)
+        attempt = 0
+        while True:
+            try:
+                with metrics.timer("embedding_request_seconds"):
+                    vectors = self.embedding.embed_documents(texts)
+                metrics.increment("embedding_texts_total", len(texts))
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_rate_limit_error(e):
+                    raise
+                metrics.increment("embedding_retries_total")
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                time.sleep(delay * (0.5 + random.random() / 2))
+                attempt += 1
+
+    def embed(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None
+    ) -> Optional[List[List[float]]]:
+        """
+        Embed texts concurrently
+        Args:
+            texts (List[str]): Texts to embed
+            on_batch (callable, optional): Called with (indices, vectors) in the calling
+                thread as each batch completes; when given, vectors are not collected
+        Returns:
+            List[List[float]]: One embedding per text, or None when on_batch is given
+        """
+        results: Optional[List[Optional[List[float]]]] = None if on_batch else [None] * len(texts)
+        pending_batches = deque(self.make_batches(texts))
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending_batches or in_flight:
+                # Keep a bounded number of batches in flight
+                while pending_batches and len(in_flight) < self.max_workers:
+                    indices = pending_batches.popleft()
+                    future = executor.submit(self._embed_batch, [texts[i] for i in indices])
+                    in_flight[future] = indices
+
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices = in_flight.pop(future)
+                    vectors = future.result()
+                    if on_batch:
+                        on_batch(indices, vectors)
+                    else:
+                        for index, vector in zip(indices, vectors):
+                            results[index] = vector
+
+        return results
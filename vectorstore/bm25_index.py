@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import json
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+
+INDEX_FILES = ["terms.json", "offsets.npy", "rows.npy", "tfs.npy", "lengths.npy", "ids.npy"]
+
+class BM25Index:
+    """BM25 lexical index over chunk texts with array-backed postings"""
+
+    def __init__(self, directory: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index
+        Args:
+            directory (str, optional): Directory the index is saved to
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+        """
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._df: List[int] = []
+        # Compacted postings: rows and term frequencies of term t are
+        # _rows[_offsets[t]:_offsets[t + 1]] and _tfs[...] in the same range
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        # Postings added since the last compaction, per term ID
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._lengths: List[int] = []
+        self._alive: List[bool] = []
+        self._total_length = 0
+        self._norm: Optional[np.ndarray] = None
+        self._alive_mask: Optional[np.ndarray] = None
+        self.changed = False
+        # Bumped whenever row numbers or liveness change, invalidating row masks
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Split text into lowercase word tokens
+        Args:
+            text (str): Text to tokenize
+        Returns:
+            List[str]: Tokens, so "MBA-501" gives ["mba", "501"]
+        """
+        return re.findall(r'\w+', text.lower())
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """
+        Index chunk texts, replacing chunks that are already indexed
+        Args:
+            ids (List[str]): Chunk IDs
+            texts (List[str]): Chunk texts
+        """
+        self.delete(ids)
+        for chunk_id, text in zip(ids, texts):
+            row = len(self._ids)
+            tokens = self.tokenize(text)
+            for term, tf in Counter(tokens).items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = self._terms[term] = len(self._df)
+                    self._df.append(0)
+                self._df[term_id] += 1
+                rows, tfs = self._pending.setdefault(term_id, ([], []))
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+            self._ids.append(chunk_id)
+            self._row_of[chunk_id] = row
+            self._lengths.append(len(tokens))
+            self._alive.append(True)
+            self._total_length += len(tokens)
+        self._norm = None
+        self.changed = True
+        self.version += 1
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Remove chunks from the index
+        Document frequencies keep counting deleted chunks until the next compaction.
+        Args:
+            ids (List[str]): Chunk IDs
+        """
+        for chunk_id in ids:
+            row = self._row_of.pop(chunk_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            self._total_length -= self._lengths[row]
+            self._norm = None
+            self.changed = True
+            self.version += 1
+
+    def compact(self) -> None:
+        """Merge pending postings into the arrays and drop deleted chunks"""
+        alive = np.array(self._alive, dtype=bool)
+        if not self._pending and alive.all():
+            return
+        new_row = np.cumsum(alive) - 1
+
+        # Gather (term, row, tf) triples from the compacted arrays and the pending lists
+        terms = [np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets))]
+        rows = [np.asarray(self._rows, dtype=np.int64)]
+        tfs = [np.asarray(self._tfs)]
+        for term_id, (pending_rows, pending_tfs) in self._pending.items():
+            terms.append(np.full(len(pending_rows), term_id, dtype=np.int64))
+            rows.append(np.asarray(pending_rows, dtype=np.int64))
+            tfs.append(np.asarray(pending_tfs, dtype=np.uint16))
+        terms, rows, tfs = np.concatenate(terms), np.concatenate(rows), np.concatenate(tfs)
+
+        keep = alive[rows] if len(rows) else np.zeros(0, dtype=bool)
+        terms, rows, tfs = terms[keep], new_row[rows[keep]], tfs[keep]
+        order = np.lexsort((rows, terms))
+        counts = np.bincount(terms, minlength=len(self._df))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._rows = rows[order].astype(np.int32)
+        self._tfs = tfs[order].astype(np.uint16)
+        self._df = counts.tolist()
+        self._pending = {}
+
+        self._ids = [chunk_id for chunk_id, live in zip(self._ids, self._alive) if live]
+        self._lengths = [length for length, live in zip(self._lengths, self._alive) if live]
+        self._alive = [True] * len(self._ids)
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._norm = None
+        self.version += 1
+
+    def row_mask(self, ids: Iterable[str]) -> np.ndarray:
+        """
+        Build a row mask for a set of chunk IDs, reusable until the index version changes
+        Args:
+            ids (Iterable[str]): Chunk IDs
+        Returns:
+            np.ndarray: Boolean mask over the rows of the index
+        """
+        mask = np.zeros(len(self._ids), dtype=bool)
+        rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+        mask[np.asarray(rows, dtype=np.int64)] = True
+        return mask
+
+    def _postings(self, term_id: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Compacted and pending postings of a term"""
+        postings = []
+        if term_id < len(self._offsets) - 1:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            if end > start:
+                postings.append((self._rows[start:end], self._tfs[start:end]))
+        pending = self._pending.get(term_id)
+        if pending:
+            postings.append((np.asarray(pending[0]), np.asarray(pending[1])))
+        return postings
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        allowed_ids: Optional[Set[str]] = None,
+        allowed_rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank chunks by BM25 score
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            allowed_ids (set, optional): Only return these chunk IDs
+            allowed_rows (np.ndarray, optional): Row mask from row_mask, cheaper than
+                allowed_ids when the same filter is applied to many queries
+        Returns:
+            list: (chunk ID, score) pairs, best first
+        """
+        if not self._row_of or k <= 0:
+            return []
+        if self._norm is None:
+            # Per-row length normalization and live mask, recomputed only after writes
+            average = self._total_length / len(self._row_of) or 1.0
+            lengths = np.asarray(self._lengths, dtype=np.float32)
+            self._norm = self.k1 * (1 - self.b + self.b * lengths / average)
+            self._alive_mask = np.asarray(self._alive, dtype=bool)
+
+        count = len(self._row_of)
+        rows, weights = [], []
+        for term in set(self.tokenize(query)):
+            term_id = self._terms.get(term)
+            if term_id is None:
+                continue
+            df = self._df[term_id]
+            idf = np.log(1 + (max(count - df, 0) + 0.5) / (df + 0.5))
+            for term_rows, tfs in self._postings(term_id):
+                tfs = tfs.astype(np.float32)
+                rows.append(term_rows)
+                weights.append(idf * tfs * (self.k1 + 1) / (tfs + self._norm[term_rows]))
+        if not rows:
+            return []
+
+        # Sum scores over the touched rows only, independent of the index size
+        candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        alive = self._alive_mask[candidates]
+        if allowed_ids is not None:
+            allowed_rows = self.row_mask(allowed_ids)
+        if allowed_rows is not None:
+            alive &= allowed_rows[candidates]
+        candidates, scores = candidates[alive], scores[alive]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self._ids[row], float(scores[i])) for i, row in zip(order, candidates[order])]
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """
+        Compact the index and write it atomically, file by file
+        Args:
+            directory (str, optional): Target directory, defaults to self.directory
+        """
+        directory = directory or self.directory
+        if not directory:
+            raise ValueError("No directory given for BM25Index")
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+
+        def write(name: str, writer) -> None:
+            path = os.path.join(directory, name)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                writer(f)
+            os.replace(tmp_path, path)
+
+        write("offsets.npy", lambda f: np.save(f, self._offsets))
+        write("rows.npy", lambda f: np.save(f, self._rows))
+        write("tfs.npy", lambda f: np.save(f, self._tfs))
+        write("lengths.npy", lambda f: np.save(f, np.asarray(self._lengths, dtype=np.int32)))
+        write("ids.npy", lambda f: np.save(f, np.asarray(self._ids, dtype=str)))
+        write("terms.json", lambda f: f.write(json.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "terms": list(self._terms)
+        }).encode("utf-8")))
+        self.changed = False
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'BM25Index':
+        """
+        Load a saved index, or return an empty one if nothing was saved yet
+        Args:
+            directory (str): Directory of the index
+            mmap (bool): Memory-map the posting arrays instead of reading them
+        Returns:
+            BM25Index: Loaded index
+        """
+        if not all(os.path.exists(os.path.join(directory, name)) for name in INDEX_FILES):
+            return cls(directory)
+        with open(os.path.join(directory, "terms.json"), 'r') as f:
+            meta = json.load(f)
+        index = cls(directory, k1=meta["k1"], b=meta["b"])
+        mode = 'r' if mmap else None
+        index._terms = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        index._offsets = np.load(os.path.join(directory, "offsets.npy"))
+        index._rows = np.load(os.path.join(directory, "rows.npy"), mmap_mode=mode)
+        index._tfs = np.load(os.path.join(directory, "tfs.npy"), mmap_mode=mode)
+        index._df = np.diff(index._offsets).tolist()
+        index._ids = np.load(os.path.join(directory, "ids.npy")).tolist()
+        index._row_of = {chunk_id: row for row, chunk_id in enumerate(index._ids)}
+        index._lengths = np.load(os.path.join(directory, "lengths.npy")).tolist()
+        index._alive = [True] * len(index._ids)
+        index._total_length = sum(index._lengths)
+        return index
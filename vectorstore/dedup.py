@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import json
+import zlib
+import numpy as np
+from typing import List, Dict, Optional, Set, Tuple
+
+# Mersenne prime for the MinHash permutations; 32-bit hashes times a 31-bit
+# coefficient stay below 2**64
+_PRIME = (1 << 31) - 1
+
+class NearDuplicateFilter:
+    """Find near-duplicate chunks with MinHash signatures and LSH banding"""
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 5,
+        directory: Optional[str] = None,
+        seed: int = 1,
+        scope: str = "source"
+    ):
+        """
+        Initialize the filter, loading saved signatures from directory if present
+        Args:
+            threshold (float): Estimated Jaccard similarity of word shingles at which
+                a chunk counts as a duplicate of an earlier one
+            num_perm (int): MinHash permutations per signature
+            bands (int): LSH bands; num_perm must be a multiple of it
+            shingle_size (int): Words per shingle
+            directory (str, optional): Where the signatures of kept chunks are saved
+            seed (int): Seed of the permutations
+            scope (str): "source" to match chunks only against chunks of the same source,
+                so every source stays findable by metadata filters, or "global" to also
+                drop chunks that repeat content of other sources
+        """
+        if scope not in ("source", "global"):
+            raise ValueError(f"Unsupported dedup scope: {scope}")
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.directory = directory
+        self.seed = seed
+        self.scope = scope
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+        # Kept chunks: ID -> (source, signature), plus one bucket table per band
+        self._entries: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        # Dropped chunks: ID -> (ID of the kept copy, source)
+        self._dropped: Dict[str, Tuple[str, str]] = {}
+        self.removed = 0
+        self.changed = False
+        if directory:
+            self._load()
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Compute the MinHash signature of a text
+        Args:
+            text (str): Chunk text
+        Returns:
+            np.ndarray: num_perm uint32 values, or None for text without words
+        """
+        words = re.findall(r'\w+', text.lower())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+            for i in range(len(words) - size + 1)
+        }
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % _PRIME
+        permuted = (hashes[:, None] * self._a + self._b) % _PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Bucket key of each band of a signature"""
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _add(self, chunk_id: str, source: str, signature: np.ndarray) -> None:
+        """Index a kept chunk"""
+        self._discard(chunk_id)
+        self._entries[chunk_id] = (source, signature)
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, set()).add(chunk_id)
+
+    def _discard(self, chunk_id: str) -> None:
+        """Remove a kept chunk from the buckets"""
+        entry = self._entries.pop(chunk_id, None)
+        if entry is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(entry[1])):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del buckets[key]
+
+    def begin_source(self, source: str) -> None:
+        """
+        Forget the chunks of a source that is about to be re-ingested, so its new
+        chunks are not matched against its own previous version
+        Args:
+            source (str): Source path
+        """
+        for chunk_id in [cid for cid, (src, _) in self._entries.items() if src == source]:
+            self._discard(chunk_id)
+        for chunk_id in [cid for cid, (_, src) in self._dropped.items() if src == source]:
+            del self._dropped[chunk_id]
+        self.changed = True
+
+    def check(self, chunk_id: str, source: str, text: str) -> Optional[str]:
+        """
+        Check a chunk against the kept chunks and keep it if it is new
+        Args:
+            chunk_id (str): Chunk ID
+            source (str): Source path of the chunk
+            text (str): Chunk text
+        Returns:
+            str: ID of the kept chunk it duplicates, or None if it was kept
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        self.changed = True
+        candidates: Set[str] = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+        candidates.discard(chunk_id)
+        if self.scope == "source":
+            candidates = {candidate for candidate in candidates if self._entries[candidate][0] == source}
+
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            score = float(np.mean(self._entries[candidate][1] == signature))
+            if score > best_score:
+                best_id, best_score = candidate, score
+        if best_id is not None and best_score >= self.threshold:
+            self._discard(chunk_id)
+            self._dropped[chunk_id] = (best_id, source)
+            self.removed += 1
+            return best_id
+
+        self._dropped.pop(chunk_id, None)
+        self._add(chunk_id, source, signature)
+        return None
+
+    def retain(self, chunk_ids: Set[str]) -> Set[str]:
+        """
+        Drop signatures of chunks that are no longer stored
+        Args:
+            chunk_ids (Set[str]): IDs of all chunks in the store
+        Returns:
+            Set[str]: Sources with dropped duplicates whose kept copy is gone;
+                they must be re-ingested to restore that content
+        """
+        for chunk_id in [cid for cid in self._entries if cid not in chunk_ids]:
+            self._discard(chunk_id)
+            self.changed = True
+        orphaned = set()
+        for chunk_id, (kept_id, source) in list(self._dropped.items()):
+            if kept_id not in self._entries:
+                orphaned.add(source)
+                del self._dropped[chunk_id]
+                self.changed = True
+        return orphaned
+
+    def _settings(self) -> Dict[str, int]:
+        """Parameters a saved signature set must match"""
+        return {"num_perm": self.num_perm, "shingle_size": self.shingle_size, "seed": self.seed}
+
+    def save(self) -> None:
+        """Save the signatures of kept chunks and the dropped duplicates"""
+        if not self.directory or not self.changed:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        ids = list(self._entries)
+        signatures = np.array(
+            [self._entries[chunk_id][1] for chunk_id in ids], dtype=np.uint32
+        ).reshape(len(ids), self.num_perm)
+        tmp_path = os.path.join(self.directory, "signatures.tmp.npy")
+        np.save(tmp_path, signatures)
+        os.replace(tmp_path, os.path.join(self.directory, "signatures.npy"))
+        tmp_path = os.path.join(self.directory, "entries.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "settings": self._settings(),
+                "ids": ids,
+                "sources": [self._entries[chunk_id][0] for chunk_id in ids],
+                "dropped": self._dropped
+            }, f)
+        os.replace(tmp_path, os.path.join(self.directory, "entries.json"))
+        self.changed = False
+
+    def _load(self) -> None:
+        """Load saved signatures; mismatched settings start an empty filter"""
+        meta_path = os.path.join(self.directory, "entries.json")
+        signatures_path = os.path.join(self.directory, "signatures.npy")
+        if not os.path.exists(meta_path) or not os.path.exists(signatures_path):
+            return
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get("settings") != self._settings():
+            print("Warning: near-duplicate signatures were built with other settings, starting over")
+            return
+        signatures = np.load(signatures_path)
+        for chunk_id, source, signature in zip(meta["ids"], meta["sources"], signatures):
+            self._add(chunk_id, source, signature)
+        self._dropped = {
+            chunk_id: (kept_id, source) for chunk_id, (kept_id, source) in meta["dropped"].items()
+        }
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Callable
+from langchain.schema.embeddings import Embeddings
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed, content-addressed cache in front of an embedding model"""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        cache_dir: str = 'docs/embedding_cache/',
+        max_entries: int = 200_000,
+        model_name: Optional[str] = None
+    ):
+        """
+        Initialize the embedding cache
+        Args:
+            embedding (Embeddings): Underlying embedding model
+            cache_dir (str): Directory holding the cache database
+            max_entries (int): Maximum number of cached vectors before LRU eviction
+            model_name (str, optional): Model name mixed into cache keys
+        """
+        self.embedding = embedding
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.model_name = model_name or getattr(embedding, "model", None) or type(embedding).__name__
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, "embeddings.sqlite3"),
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        row = self._conn.execute("SELECT MAX(last_access), COUNT(*) FROM embeddings").fetchone()
+        self._clock = row[0] or 0
+        # Entry count, kept up to date by _store so eviction never scans the table
+        self._entries = row[1]
+
+    def cache_key(self, text: str, kind: str = "document") -> str:
+        """
+        Build the cache key for a text
+        Queries get their own keys, since some models embed queries and documents
+        differently (e.g. with an instruction prefix for queries). Document keys
+        are unchanged, so existing caches stay valid.
+        Args:
+            text (str): Text to embed
+            kind (str): "document" or "query"
+        Returns:
+            str: SHA-256 hex digest of the model name, kind and text
+        """
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\x00")
+        if kind != "document":
+            digest.update(kind.encode("utf-8"))
+            digest.update(b"\x00")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _count(self, hits: int, misses: int) -> None:
+        """Update the hit and miss counters, which are shared by embedding threads"""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _existing(self, keys: List[str]) -> int:
+        """Number of keys already stored; called with the lock held"""
+        existing = 0
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing += self._conn.execute(
+                f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})",
+                chunk
+            ).fetchone()[0]
+        return existing
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors and mark them as recently used"""
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._clock += 1
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(self._clock, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """Write new vectors and evict least recently used entries"""
+        if not items:
+            return
+        with self._lock:
+            self._clock += 1
+            # Another thread may have stored the same text since the lookup
+            self._entries += len(items) - self._existing(list(items))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), self._clock)
+                    for key, vector in items.items()
+                ]
+            )
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+                self._entries -= overflow
+            self._conn.commit()
+
+    def _embed(
+        self,
+        texts: List[str],
+        kind: str,
+        embed: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Look texts up under one kind of key, embedding each missing text once"""
+        keys = [self.cache_key(text, kind=kind) for text in texts]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+
+        # Embed each missing text once, even if it repeats in the input
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self._count(len(texts) - len(missing), len(missing))
+
+        if missing:
+            vectors = embed(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [list(cached[key]) for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, calling the underlying model only for cache misses
+        Args:
+            texts (List[str]): Texts to embed
+        Returns:
+            List[List[float]]: One embedding per input text
+        """
+        return self._embed(texts, "document", self.embedding.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of queries with query semantics, looking them up in one pass
+        Args:
+            texts (List[str]): Query texts
+        Returns:
+            List[List[float]]: One embedding per query, as embed_query would return
+        """
+        return self._embed(
+            texts,
+            "query",
+            lambda missing: [self.embedding.embed_query(text) for text in missing]
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, using the cache when possible
+        Args:
+            text (str): Query text
+        Returns:
+            List[float]: Query embedding
+        """
+        return self.embed_queries([text])[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics
+        Returns:
+            dict: Hit, miss and eviction counters plus the current entry count
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": self._entries,
+                "max_entries": self.max_entries
+            }
+
+    def clear(self) -> None:
+        """Remove every cached vector"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
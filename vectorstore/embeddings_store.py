@@ -2,63 +2,472 @@
 # coding: utf-8
 
 import os
+import hashlib
 import numpy as np
-from typing import Optional, List
-from dotenv import load_dotenv, find_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Tuple, Any, Iterable, Union, Set, Collection, TYPE_CHECKING
 from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from utils.text_splitter import OffsetTextSplitter
+from utils.metrics import metrics
+from utils.env import load_environment
+from .batch_embedder import BatchEmbedder
+from .embedding_cache import CachedEmbeddings
+from .ingest_manifest import IngestManifest
+from .dedup import NearDuplicateFilter
+from .bm25_index import BM25Index
+from .numpy_index import NumpyVectorIndex
+from .sharded_store import ShardedVectorIndex
+from .similarity import normalize_rows, cosine_matrix
 
-# Load environment variables
-_ = load_dotenv(find_dotenv())
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+VectorStore = Union['Chroma', NumpyVectorIndex, ShardedVectorIndex]
+
+# Backends kept in process, written directly and saved after each ingest
+_IN_PROCESS = (NumpyVectorIndex, ShardedVectorIndex)
+
+@dataclass
+class _SourceState:
+    """Running ingest state of one source"""
+    digest: Any = field(default_factory=hashlib.sha1)
+    chunks: Dict[str, str] = field(default_factory=dict)
+    position: int = 0
+    changed: bool = False
+    duplicates: int = 0
+
+@dataclass
+class _IngestSession:
+    """Stores written together during one ingest run"""
+    vectordb: VectorStore
+    manifest: IngestManifest
+    dedup: Optional[NearDuplicateFilter] = None
+    lexical: Optional[BM25Index] = None
 
 class EmbeddingsStore:
-    def __init__(self, persist_directory: str = 'docs/chroma/'):
+    def __init__(
+        self,
+        persist_directory: str = 'docs/chroma/',
+        cache_dir: Optional[str] = 'docs/embedding_cache/',
+        cache_size: int = 200_000,
+        embedding: Optional[Embeddings] = None,
+        max_workers: int = 4,
+        max_tokens_per_batch: int = 50_000,
+        backend: str = "chroma",
+        num_shards: int = 4,
+        shard_by: str = "hash",
+        dedup_threshold: Optional[float] = 0.85,
+        dedup_scope: str = "source",
+        lexical_index: bool = True,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 150,
+        chunk_unit: str = "chars"
+    ):
         """
         Initialize the embeddings store
         Args:
             persist_directory (str): Directory to persist the vector store
+            cache_dir (str, optional): Directory for the embedding cache, None disables it
+            cache_size (int): Maximum number of cached embeddings
+            embedding (Embeddings, optional): Embedding model, defaults to OpenAIEmbeddings
+            max_workers (int): Number of embedding requests in flight
+            max_tokens_per_batch (int): Token budget of a single embedding request
+            backend (str): "chroma", "numpy" for the in-process NumpyVectorIndex, or
+                "sharded" for a ShardedVectorIndex of NumpyVectorIndex shards
+            num_shards (int): Number of shards of a new sharded store
+            shard_by (str): Shard key of a new sharded store, "hash" or "source"
+            dedup_threshold (float, optional): Similarity at which a chunk is dropped as a
+                near-duplicate of an already stored chunk, None disables the check
+            dedup_scope (str): "source" compares chunks within their own source only, so
+                source filters still find every source; "global" also drops content
+                repeated across sources
+            lexical_index (bool): Maintain a BM25 index of the chunks for hybrid search
+            chunk_size (int): Maximum chunk length in chunk_unit
+            chunk_overlap (int): Overlap between consecutive chunks in chunk_unit
+            chunk_unit (str): "chars", or "tokens" to size chunks with tiktoken
         """
+        if backend not in ("chroma", "numpy", "sharded"):
+            raise ValueError(f"Unsupported vector store backend: {backend}")
         try:
-            import chromadb
+            # The OpenAI and Chroma clients are imported only when used
+            if backend == "chroma":
+                import chromadb
             self.persist_directory = persist_directory
-            self.embedding = OpenAIEmbeddings()
-            self.text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1500,
-                chunk_overlap=150
+            self.backend = backend
+            self.num_shards = num_shards
+            self.shard_by = shard_by
+            self.dedup_threshold = dedup_threshold
+            self.dedup_scope = dedup_scope
+            self.lexical_index = lexical_index
+            if embedding is None:
+                load_environment()
+                from langchain_openai import OpenAIEmbeddings
+                embedding = OpenAIEmbeddings()
+            self.embedding = embedding
+            if cache_dir:
+                self.embedding = CachedEmbeddings(
+                    self.embedding,
+                    cache_dir=cache_dir,
+                    max_entries=cache_size
+                )
+            self.text_splitter = OffsetTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_unit=chunk_unit
+            )
+            self.batch_embedder = BatchEmbedder(
+                self.embedding,
+                max_tokens_per_batch=max_tokens_per_batch,
+                max_workers=max_workers
             )
         except ImportError:
             raise ImportError(
                 "Could not import chromadb. Please install it with `pip install chromadb`"
             )
         
-    def process_documents(self, documents: List[Document]) -> Optional[Chroma]:
+    def unchanged_sources(self, sources: Iterable[str]) -> Set[str]:
+        """
+        Find source files that can be skipped without loading them
+        Args:
+            sources (Iterable[str]): Paths of sources whose documents depend only on the
+                local file, e.g. DocumentLoaderFactory.local_sources
+        Returns:
+            set: Sources whose modification time and size match the last ingest
+        """
+        manifest = IngestManifest(self.persist_directory)
+        return {source for source in sources if manifest.is_fresh(source)}
+
+    @metrics.profiled("process_documents")
+    @metrics.timed("ingest_seconds", mode="documents")
+    def process_documents(
+        self,
+        documents: List[Document],
+        prune: bool = True,
+        unchanged: Collection[str] = ()
+    ) -> Optional[VectorStore]:
         """
         Process documents and create embeddings
+        Unchanged sources are skipped, near-duplicate chunks are dropped before
+        embedding, changed chunks are upserted by deterministic ID and chunks that
+        no longer exist are deleted.
         Args:
             documents (list): List of Document objects
+            prune (bool): Delete chunks of sources that are no longer present
+            unchanged (Collection[str]): Sources skipped by the loader as unchanged,
+                kept as they are instead of being pruned
         Returns:
-            Chroma: Vector store with embedded documents
+            Vector store with embedded documents (Chroma, NumpyVectorIndex or ShardedVectorIndex)
         """
         try:
-            # Create persist directory if it doesn't exist
-            os.makedirs(self.persist_directory, exist_ok=True)
+            session = self._open_store()
+            manifest, dedup = session.manifest, session.dedup
             
-            # Split documents into chunks
-            splits = self.text_splitter.split_documents(documents)
+            # Group documents by source, keeping load order
+            grouped: Dict[str, List[Document]] = {}
+            for doc in documents:
+                grouped.setdefault(doc.metadata.get("source", ""), []).append(doc)
             
-            # Create vector store
-            vectordb = Chroma.from_documents(
-                documents=splits,
-                embedding=self.embedding,
-                persist_directory=self.persist_directory
-            )
+            # Duplicates of chunks from sources about to be pruned must be ingested now
+            orphaned = set()
+            if dedup and prune:
+                kept = set()
+                for source in list(grouped) + list(unchanged):
+                    kept.update(manifest.chunks(source))
+                orphaned = dedup.retain(kept)
             
-            return vectordb
+            states: Dict[str, Optional[_SourceState]] = dict.fromkeys(unchanged)
+            for source, docs in grouped.items():
+                if source not in orphaned and manifest.is_unchanged(source, IngestManifest.content_hash(docs)):
+                    states[source] = None
+                    continue
+                states[source] = _SourceState()
+                self._ingest_source_batch(session, source, docs, states[source])
+            
+            self._finish_ingest(session, states, prune)
+            duplicates = sum(state.duplicates for state in states.values() if state)
+            if duplicates:
+                print(f"Dropped {duplicates} near-duplicate chunks before embedding")
+            return session.vectordb
         except Exception as e:
+            metrics.increment("errors_total", operation="ingest")
             print(f"Error processing documents: {e}")
             return None
+    
+    @metrics.profiled("process_document_stream")
+    @metrics.timed("ingest_seconds", mode="stream")
+    def process_document_stream(
+        self,
+        batches: Iterable[List[Document]],
+        prune: bool = True,
+        verbose: bool = True,
+        unchanged: Collection[str] = ()
+    ) -> Optional[VectorStore]:
+        """
+        Split, embed and write documents batch by batch
+        Only the current batch and its chunks are held in memory. Unchanged chunks
+        are not re-embedded, and stale chunks are deleted once the stream ends.
+        Args:
+            batches (Iterable[List[Document]]): Batches of documents, e.g. from
+                DocumentLoaderFactory.iter_documents
+            prune (bool): Delete chunks of sources that did not appear in the stream
+            verbose (bool): Whether to print per-stage progress
+            unchanged (Collection[str]): Sources skipped by the loader as unchanged,
+                kept as they are instead of being pruned
+        Returns:
+            Vector store with embedded documents (Chroma, NumpyVectorIndex or ShardedVectorIndex)
+        """
+        try:
+            session = self._open_store()
+            manifest, dedup = session.manifest, session.dedup
+            states: Dict[str, Optional[_SourceState]] = dict.fromkeys(unchanged)
+            totals = {"documents": 0, "chunks": 0, "embedded": 0, "duplicates": 0}
+            
+            for number, batch in enumerate(batches, 1):
+                grouped: Dict[str, List[Document]] = {}
+                for doc in batch:
+                    grouped.setdefault(doc.metadata.get("source", ""), []).append(doc)
+                
+                chunk_count = embedded = duplicates = 0
+                for source, docs in grouped.items():
+                    state = states.get(source)
+                    if state is None:
+                        state = states[source] = _SourceState()
+                    dropped = state.duplicates
+                    chunks, written = self._ingest_source_batch(session, source, docs, state)
+                    chunk_count += chunks
+                    embedded += written
+                    duplicates += state.duplicates - dropped
+                
+                totals["documents"] += len(batch)
+                totals["chunks"] += chunk_count
+                totals["embedded"] += embedded
+                totals["duplicates"] += duplicates
+                if verbose:
+                    print(
+                        f"Batch {number}: {len(batch)} documents -> {chunk_count} chunks, "
+                        f"{embedded} embedded and written, {duplicates} near-duplicates dropped"
+                    )
+            
+            self._finish_ingest(session, states, prune)
+            if verbose:
+                print(
+                    f"Ingested {totals['documents']} documents: {totals['chunks']} chunks, "
+                    f"{totals['embedded']} embedded and written, "
+                    f"{totals['duplicates']} near-duplicates dropped"
+                )
+            return session.vectordb
+        except Exception as e:
+            metrics.increment("errors_total", operation="ingest")
+            print(f"Error processing document stream: {e}")
+            return None
+    
+    def _open_store(self) -> _IngestSession:
+        """
+        Open the persisted vector store with its ingest manifest, near-duplicate
+        filter and lexical index
+        Returns:
+            _IngestSession: Stores of the configured backend and options
+        """
+        # Create persist directory if it doesn't exist
+        os.makedirs(self.persist_directory, exist_ok=True)
+        if self.backend == "numpy":
+            vectordb = NumpyVectorIndex.load(self.persist_directory, self.embedding)
+        elif self.backend == "sharded":
+            vectordb = ShardedVectorIndex.load(
+                self.persist_directory,
+                self.embedding,
+                num_shards=self.num_shards,
+                shard_by=self.shard_by
+            )
+        else:
+            from langchain_community.vectorstores import Chroma
+            vectordb = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embedding
+            )
+        dedup = None
+        if self.dedup_threshold is not None:
+            dedup = NearDuplicateFilter(
+                threshold=self.dedup_threshold,
+                scope=self.dedup_scope,
+                directory=os.path.join(self.persist_directory, "dedup")
+            )
+        manifest = IngestManifest(self.persist_directory)
+        lexical = self._open_lexical(vectordb, manifest) if self.lexical_index else None
+        return _IngestSession(vectordb, manifest, dedup, lexical)
+    
+    def _open_lexical(self, vectordb: VectorStore, manifest: IngestManifest) -> BM25Index:
+        """
+        Load the BM25 index, rebuilding it from the stored chunks if it is missing
+        or out of step with the manifest
+        Args:
+            vectordb: Vector store holding the chunks
+            manifest (IngestManifest): Manifest of the previous ingest
+        Returns:
+            BM25Index: Lexical index of the stored chunks
+        """
+        lexical = BM25Index.load(os.path.join(self.persist_directory, "bm25"))
+        expected = sum(len(manifest.chunks(source)) for source in manifest.sources)
+        if len(lexical) == expected:
+            return lexical
+        
+        lexical = BM25Index(os.path.join(self.persist_directory, "bm25"))
+        if isinstance(vectordb, NumpyVectorIndex):
+            rows = np.flatnonzero(vectordb.alive)
+            ids = [vectordb.ids[row] for row in rows]
+            texts = [doc.page_content for doc in vectordb.get_documents(ids)]
+        elif isinstance(vectordb, ShardedVectorIndex):
+            ids = vectordb.chunk_ids()
+            texts = [doc.page_content for doc in vectordb.get_documents(ids)]
+        else:
+            stored = vectordb._collection.get(include=["documents"])
+            ids, texts = stored["ids"], stored["documents"]
+        print(f"Rebuilding lexical index from {len(ids)} stored chunks")
+        lexical.add(ids, texts)
+        return lexical
+    
+    def _ingest_source_batch(
+        self,
+        session: _IngestSession,
+        source: str,
+        docs: List[Document],
+        state: '_SourceState'
+    ) -> Tuple[int, int]:
+        """
+        Split documents of one source, drop near-duplicate chunks and write the
+        chunks whose text changed
+        Args:
+            session (_IngestSession): Stores to write to
+            source (str): Source path
+            docs (List[Document]): Next documents of the source
+            state (_SourceState): Running state of the source
+        Returns:
+            tuple: Number of chunks kept and number embedded and written
+        """
+        previous = session.manifest.chunks(source)
+        dedup = session.dedup
+        if dedup and state.position == 0:
+            dedup.begin_source(source)
+        splits: List[Document] = []
+        ids: List[str] = []
+        chunk_count = 0
+        
+        for doc in docs:
+            IngestManifest.update_digest(state.digest, doc)
+            page = doc.metadata.get("page", state.position)
+            state.position += 1
+            for split in self.text_splitter.split_documents([doc]):
+                chunk_id = IngestManifest.chunk_id(source, page, split.metadata.get("start_index", 0))
+                # Sources listed twice produce the same IDs; keep the first copy
+                if chunk_id in state.chunks:
+                    continue
+                # Near-duplicates of a kept chunk are never embedded or recorded
+                if dedup and dedup.check(chunk_id, source, split.page_content):
+                    state.duplicates += 1
+                    metrics.increment("dedup_chunks_dropped_total")
+                    continue
+                chunk_count += 1
+                text_hash = IngestManifest.text_hash(split.page_content)
+                state.chunks[chunk_id] = text_hash
+                # Only re-embed chunks whose text changed
+                if previous.get(chunk_id) != text_hash:
+                    splits.append(split)
+                    ids.append(chunk_id)
+        
+        metrics.increment("store_chunks_skipped_total", chunk_count - len(splits))
+        if splits:
+            self._write_chunks(session, splits, ids)
+            state.changed = True
+        return chunk_count, len(splits)
+    
+    def _finish_ingest(
+        self,
+        session: _IngestSession,
+        states: Dict[str, Optional['_SourceState']],
+        prune: bool
+    ) -> None:
+        """
+        Delete stale chunks and save the manifest and the derived indexes
+        Args:
+            session (_IngestSession): Stores to update
+            states (dict): Running state per source, None for skipped sources
+            prune (bool): Delete chunks of sources missing from states
+        """
+        vectordb, manifest, dedup, lexical = (
+            session.vectordb, session.manifest, session.dedup, session.lexical
+        )
+        changed = False
+        for source, state in states.items():
+            if state is None:
+                # Content matched (or the file was not touched); remember the file's stat
+                manifest.refresh_stat(source)
+                continue
+            digest = state.digest.hexdigest()
+            stale = [chunk_id for chunk_id in manifest.chunks(source) if chunk_id not in state.chunks]
+            if stale:
+                vectordb.delete(ids=stale)
+                metrics.increment("store_chunks_deleted_total", len(stale), backend=self.backend)
+                if lexical is not None:
+                    lexical.delete(stale)
+            if stale or state.changed or not manifest.is_unchanged(source, digest):
+                manifest.update(source, digest, state.chunks)
+                changed = True
+            else:
+                manifest.refresh_stat(source)
+        
+        if prune:
+            for source in list(manifest.sources):
+                if source not in states:
+                    removed = manifest.remove(source)
+                    if removed:
+                        vectordb.delete(ids=removed)
+                        metrics.increment("store_chunks_deleted_total", len(removed), backend=self.backend)
+                        if lexical is not None:
+                            lexical.delete(removed)
+                    changed = True
+        
+        if dedup:
+            stored = set()
+            for source in manifest.sources:
+                stored.update(manifest.chunks(source))
+            # A dropped duplicate whose kept copy was deleted comes back on the next ingest
+            for source in dedup.retain(stored):
+                manifest.invalidate(source)
+            dedup.save()
+        
+        if lexical is not None and lexical.changed:
+            lexical.save()
+        if changed and isinstance(vectordb, _IN_PROCESS):
+            vectordb.save()
+        manifest.save(changed)
+    
+    def _write_chunks(self, session: _IngestSession, splits: List[Document], ids: List[str]) -> None:
+        """
+        Embed chunks in concurrent batches and upsert each batch as it completes
+        Args:
+            session (_IngestSession): Stores to write to
+            splits (List[Document]): Chunks to embed
+            ids (List[str]): Chunk IDs
+        """
+        # The in-process indexes take the same upsert arguments as a Chroma collection
+        vectordb = session.vectordb
+        target = vectordb if isinstance(vectordb, _IN_PROCESS) else vectordb._collection
+        
+        def write_batch(indices: List[int], vectors: List[List[float]]) -> None:
+            with metrics.timer("store_write_seconds", backend=self.backend):
+                target.upsert(
+                    ids=[ids[i] for i in indices],
+                    embeddings=vectors,
+                    metadatas=[splits[i].metadata for i in indices],
+                    documents=[splits[i].page_content for i in indices]
+                )
+            metrics.increment("store_chunks_written_total", len(indices), backend=self.backend)
+            if session.lexical is not None:
+                with metrics.timer("lexical_index_seconds"):
+                    session.lexical.add([ids[i] for i in indices], [splits[i].page_content for i in indices])
+        
+        self.batch_embedder.embed([split.page_content for split in splits], on_batch=write_batch)
             
     def compare_sentences(self, sentence1: str, sentence2: str) -> Optional[float]:
         """
@@ -66,15 +475,115 @@ class EmbeddingsStore:
         Args:
             sentence1 (str): First sentence
             sentence2 (str): Second sentence
+        Both sentences are embedded with embed_query, as before batching was added.
         Returns:
-            float: Similarity score between 0 and 1
+            float: Cosine similarity of the two sentences
         """
         try:
-            embedding1 = self.embedding.embed_query(sentence1)
-            embedding2 = self.embedding.embed_query(sentence2)
-            
-            similarity = np.dot(embedding1, embedding2)
-            return similarity
+            vectors = self._embed_unique([sentence1, sentence2], query=True)
+            return float(vectors[0] @ vectors[1])
         except Exception as e:
             print(f"Error comparing sentences: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def compare_pairs(self, texts_a: List[str], texts_b: List[str]) -> Optional[np.ndarray]:
+        """
+        Compare aligned pairs of texts, texts_a[i] with texts_b[i]
+        All unique texts are embedded once in batches, as documents; only the pairs
+        are scored, without building the full matrix.
+        Args:
+            texts_a (List[str]): First text of each pair
+            texts_b (List[str]): Second text of each pair
+        Returns:
+            np.ndarray: Cosine similarity per pair
+        """
+        try:
+            if len(texts_a) != len(texts_b):
+                raise ValueError(f"Got {len(texts_a)} and {len(texts_b)} texts to pair")
+            vectors = self._embed_unique(list(texts_a) + list(texts_b))
+            return np.einsum("ij,ij->i", vectors[:len(texts_a)], vectors[len(texts_a):])
+        except Exception as e:
+            print(f"Error comparing text pairs: {e}")
+            return None
+
+    def compare_many(
+        self,
+        texts_a: List[str],
+        texts_b: List[str],
+        top_n: Optional[int] = None,
+        block_size: int = 1024
+    ) -> Optional[Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Compare every text of one list with every text of another
+        All unique texts are embedded once in batches, as documents, then scored in
+        blocks of rows. Use compare_pairs for aligned pairs.
+        Args:
+            texts_a (List[str]): Texts for the rows
+            texts_b (List[str]): Texts for the columns
+            top_n (int, optional): Keep only the n most similar texts_b per row
+            block_size (int): Rows scored at a time
+        Returns:
+            np.ndarray: Cosine matrix of shape (len(texts_a), len(texts_b)), or with
+                top_n a tuple of (indices into texts_b, scores), best first
+        """
+        try:
+            vectors = self._embed_unique(list(texts_a) + list(texts_b))
+            return cosine_matrix(
+                vectors[:len(texts_a)],
+                vectors[len(texts_a):],
+                top_n=top_n,
+                block_size=block_size
+            )
+        except Exception as e:
+            print(f"Error comparing texts: {e}")
+            return None
+
+    def similarity_matrix(
+        self,
+        texts: List[str],
+        top_n: Optional[int] = None,
+        block_size: int = 1024
+    ) -> Optional[Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Compare every text of a list with every other
+        Args:
+            texts (List[str]): Texts to compare
+            top_n (int, optional): Keep only the n most similar other texts per row
+            block_size (int): Rows scored at a time
+        Returns:
+            np.ndarray: Symmetric cosine matrix, or with top_n a tuple of
+                (indices into texts, scores) that skips each text itself
+        """
+        try:
+            vectors = self._embed_unique(texts)
+            return cosine_matrix(
+                vectors,
+                vectors,
+                top_n=top_n,
+                block_size=block_size,
+                exclude_diagonal=top_n is not None
+            )
+        except Exception as e:
+            print(f"Error building similarity matrix: {e}")
+            return None
+
+    def _embed_unique(self, texts: List[str], query: bool = False) -> np.ndarray:
+        """
+        Embed texts in batches, embedding repeated texts once
+        Args:
+            texts (List[str]): Texts to embed
+            query (bool): Embed with query semantics (embed_query) instead of as documents
+        Returns:
+            np.ndarray: Unit-length embedding per text, in input order
+        """
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return np.zeros((0, 0), dtype=np.float32)
+        if not query:
+            vectors = normalize_rows(self.batch_embedder.embed(unique))
+        elif hasattr(self.embedding, "embed_queries"):
+            vectors = normalize_rows(self.embedding.embed_queries(unique))
+        else:
+            vectors = normalize_rows([self.embedding.embed_query(text) for text in unique])
+        position = {text: i for i, text in enumerate(unique)}
+        return vectors[[position[text] for text in texts]]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import re
+import time
+import zlib
+import threading
+import numpy as np
+from typing import List, Dict
+from langchain.schema.embeddings import Embeddings
+
+class FakeRateLimitError(Exception):
+    """Rate-limit error raised by FakeEmbeddings"""
+    status_code = 429
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic local embedding model for offline testing and benchmarks"""
+
+    def __init__(
+        self,
+        size: int = 256,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        query_prefix: str = ""
+    ):
+        """
+        Initialize the fake embedding model
+        Args:
+            size (int): Embedding dimension
+            latency (float): Seconds each call sleeps to mimic a remote endpoint
+            rate_limit_every (int): Raise a rate-limit error on every n-th call, 0 disables
+            query_prefix (str): Text prepended to queries, like instruction-prefixed models
+        """
+        self.size = size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.query_prefix = query_prefix
+        self.model = f"fake-{size}"
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+        # Token vectors of this instance, dropped when it reaches max_cached_tokens
+        self._token_vectors: Dict[str, np.ndarray] = {}
+        self.max_cached_tokens = 65536
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        """Pseudo-random vector of a token, seeded by its CRC"""
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")))
+            vector = rng.standard_normal(self.size).astype(np.float32)
+            if len(self._token_vectors) >= self.max_cached_tokens:
+                self._token_vectors.clear()
+            self._token_vectors[token] = vector
+        return vector
+
+    def _vector(self, text: str) -> List[float]:
+        """Bag-of-words embedding, so texts sharing words end up close together"""
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def _call(self, count: int) -> None:
+        """Account for a request, sleeping and failing as configured"""
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise FakeRateLimitError("Rate limit reached (fake endpoint)")
+        with self._lock:
+            self.texts_embedded += count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents
+        Args:
+            texts (List[str]): Texts to embed
+        Returns:
+            List[List[float]]: One embedding per text
+        """
+        self._call(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query
+        Args:
+            text (str): Query text
+        Returns:
+            List[float]: Query embedding
+        """
+        self._call(1)
+        return self._vector(self.query_prefix + text)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import hashlib
+from typing import List, Dict, Any, Optional
+from langchain.schema import Document
+
+MANIFEST_FILE = "ingest_manifest.json"
+
+class IngestManifest:
+    """Track ingested sources, their content hashes and the chunk IDs they produced"""
+
+    def __init__(self, persist_directory: str):
+        """
+        Load the manifest stored in a vector store directory
+        Args:
+            persist_directory (str): Directory of the vector store
+        """
+        self.path = os.path.join(persist_directory, MANIFEST_FILE)
+        self.generation = 0
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.generation = data.get("generation", 0)
+            self.sources = data.get("sources", {})
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """
+        Hash a piece of text
+        Args:
+            text (str): Text to hash
+        Returns:
+            str: SHA-1 hex digest
+        """
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def update_digest(digest: Any, doc: Document) -> None:
+        """
+        Feed one document into a running source content hash
+        Args:
+            digest: hashlib object accumulating the source hash
+            doc (Document): Next document of the source
+        """
+        digest.update(str(doc.metadata.get("page", "")).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\x00")
+
+    @staticmethod
+    def content_hash(docs: List[Document]) -> str:
+        """
+        Hash the content of all documents loaded from one source
+        Args:
+            docs (List[Document]): Documents of a single source, in load order
+        Returns:
+            str: SHA-1 hex digest over page contents and pages
+        """
+        digest = hashlib.sha1()
+        for doc in docs:
+            IngestManifest.update_digest(digest, doc)
+        return digest.hexdigest()
+
+    @staticmethod
+    def chunk_id(source: str, page: Any, start_index: Any) -> str:
+        """
+        Build a deterministic chunk ID
+        Args:
+            source (str): Source path
+            page: Page number, or document position within the source
+            start_index: Character offset of the chunk within the page
+        Returns:
+            str: Stable chunk ID
+        """
+        key = f"{source}|{page}|{start_index}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def source_stat(source: str) -> Optional[Dict[str, int]]:
+        """
+        Get the modification time and size of a source file
+        Args:
+            source (str): Source path
+        Returns:
+            dict: mtime_ns and size, or None if the source is not a local file
+        """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def is_fresh(self, source: str) -> bool:
+        """
+        Check whether a source file is unchanged since it was ingested, without loading it
+        Args:
+            source (str): Source path
+        Returns:
+            bool: True if the file has the recorded modification time and size and the
+                source was not invalidated
+        """
+        entry = self.sources.get(source)
+        if entry is None or entry.get("hash") is None:
+            return False
+        stat = self.source_stat(source)
+        return stat is not None and all(entry.get(key) == value for key, value in stat.items())
+
+    def refresh_stat(self, source: str) -> None:
+        """
+        Record the current modification time and size of a source whose content is unchanged
+        Args:
+            source (str): Source path
+        """
+        entry = self.sources.get(source)
+        stat = self.source_stat(source)
+        if entry is not None and stat is not None:
+            entry.pop("mtime", None)
+            entry.update(stat)
+
+    def is_unchanged(self, source: str, digest: str) -> bool:
+        """
+        Check whether a source was already ingested with the same content
+        Args:
+            source (str): Source path
+            digest (str): Content hash of the freshly loaded documents
+        Returns:
+            bool: True if the stored hash matches
+        """
+        entry = self.sources.get(source)
+        return entry is not None and entry.get("hash") == digest
+
+    def chunks(self, source: str) -> Dict[str, str]:
+        """
+        Get the chunks recorded for a source
+        Args:
+            source (str): Source path
+        Returns:
+            dict: Mapping of chunk ID to chunk text hash
+        """
+        return self.sources.get(source, {}).get("chunks", {})
+
+    def update(self, source: str, digest: str, chunks: Dict[str, str]) -> None:
+        """
+        Record the current state of a source
+        Args:
+            source (str): Source path
+            digest (str): Content hash of the source
+            chunks (dict): Mapping of chunk ID to chunk text hash
+        """
+        self.sources[source] = dict(
+            {"hash": digest, "chunks": chunks},
+            **(self.source_stat(source) or {})
+        )
+
+    def invalidate(self, source: str) -> None:
+        """
+        Force a source to be re-ingested next time, keeping its chunk records
+        Args:
+            source (str): Source path
+        """
+        if source in self.sources:
+            self.sources[source]["hash"] = None
+
+    def remove(self, source: str) -> List[str]:
+        """
+        Forget a source
+        Args:
+            source (str): Source path
+        Returns:
+            List[str]: Chunk IDs that belonged to the source
+        """
+        entry = self.sources.pop(source, {})
+        return list(entry.get("chunks", {}).keys())
+
+    def save(self, changed: bool = True) -> None:
+        """
+        Write the manifest atomically
+        Args:
+            changed (bool): Whether the store was modified, which bumps the generation
+        """
+        if changed:
+            self.generation += 1
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"generation": self.generation, "sources": self.sources}, f)
+        os.replace(tmp_path, self.path)
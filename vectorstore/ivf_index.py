@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from .numpy_index import NumpyVectorIndex
+
+class IVFIndex:
+    """Approximate nearest neighbour search with an inverted file over k-means lists"""
+
+    def __init__(self, base: NumpyVectorIndex, nlist: Optional[int] = None, nprobe: int = 8):
+        """
+        Initialize the IVF index
+        Args:
+            base (NumpyVectorIndex): Index holding the vectors, documents and metadata
+            nlist (int, optional): Number of k-means lists, defaults to 4 * sqrt(rows)
+            nprobe (int): Lists scanned per query; higher is slower with better recall
+        """
+        self.base = base
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_threshold = 2048
+        self.centroids: Optional[np.ndarray] = None
+        self.list_rows = np.zeros(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.built_size = 0
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used for queries"""
+        return self.base.embeddings
+
+    @property
+    def persist_directory(self) -> Optional[str]:
+        """Directory of the underlying index"""
+        return self.base.persist_directory
+
+    @property
+    def index_directory(self) -> Optional[str]:
+        """Directory the IVF lists are saved to"""
+        if not self.base.persist_directory:
+            return None
+        return os.path.join(self.base.persist_directory, "ivf")
+
+    def build(self, n_iter: int = 10, sample_size: int = 50_000, seed: int = 0) -> 'IVFIndex':
+        """
+        Train k-means centroids and assign every row to its nearest list
+        Args:
+            n_iter (int): k-means iterations
+            sample_size (int): Rows used to train the centroids
+            seed (int): Random seed
+        Returns:
+            IVFIndex: self
+        """
+        rng = np.random.default_rng(seed)
+        vectors = self.base.vectors
+        live = np.flatnonzero(self.base.alive)
+        self.built_size = len(vectors)
+        if len(live) == 0:
+            self.centroids = None
+            self.list_rows = np.zeros(0, dtype=np.int64)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            return self
+
+        nlist = self.nlist or int(4 * np.sqrt(len(live)))
+        nlist = max(1, min(nlist, len(live)))
+        sample = live if len(live) <= sample_size else rng.choice(live, sample_size, replace=False)
+        training = np.asarray(vectors[sample])
+
+        # Spherical k-means: centroids stay unit length so scores are cosine similarities
+        centroids = training[rng.choice(len(training), nlist, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self._nearest(training, centroids)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums[~empty] = np.add.reduceat(
+                training[np.argsort(assignment, kind="stable")], starts[~empty], axis=0
+            )
+            if empty.any():
+                sums[empty] = training[rng.choice(len(training), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        assignment = self._nearest(np.asarray(vectors[live]), centroids)
+        order = np.argsort(assignment, kind="stable")
+        self.centroids = centroids.astype(np.float32)
+        self.list_rows = live[order].astype(np.int64)
+        self.list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self.list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+        return self
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Index of the most similar centroid for each vector"""
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), 4096):
+            block = vectors[start:start + 4096] @ centroids.T
+            assignment[start:start + 4096] = np.argmax(block, axis=1)
+        return assignment
+
+    def search_rows(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Approximate top-k search for a batch of query vectors
+        Rows added after build are always scanned exactly; selective filters fall
+        back to an exact scan of the matching rows.
+        Args:
+            vectors (np.ndarray): Query embeddings, one per row
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+            nprobe (int, optional): Lists scanned per query, defaults to self.nprobe
+        Returns:
+            list: (row indices, cosine scores) per query, best first
+        """
+        if self.centroids is None:
+            return self.base.search_rows(vectors, k, filter)
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        mask = self.base.filter_mask(filter)
+        if filter and mask.sum() <= self.exact_threshold:
+            return self.base.search_rows(queries, k, filter)
+
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+        base_vectors = self.base.vectors
+        tail = np.arange(self.built_size, len(base_vectors))
+        centroid_scores = queries @ self.centroids.T
+        results = []
+        for query, scores in zip(queries, centroid_scores):
+            probed = np.argpartition(-scores, nprobe - 1)[:nprobe]
+            candidates = np.concatenate(
+                [self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed] + [tail]
+            )
+            candidates = candidates[mask[candidates]]
+            candidate_scores = base_vectors[candidates] @ query
+            if len(candidates) > k:
+                top = np.argpartition(-candidate_scores, k - 1)[:k]
+                candidates, candidate_scores = candidates[top], candidate_scores[top]
+            order = np.argsort(-candidate_scores, kind="stable")
+            results.append((candidates[order], candidate_scores[order]))
+        return results
+
+    def query_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[List[str], List[Document]]]:
+        """
+        Search with precomputed query embeddings
+        Args:
+            vectors (list): Query embeddings
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (chunk IDs, Document objects) per query
+        """
+        return [
+            ([self.base.ids[row] for row in rows], [self.base._document(row) for row in rows])
+            for rows, _ in self.search_rows(np.asarray(vectors), k, filter)
+        ]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch documents by chunk ID
+        Args:
+            ids (List[str]): Chunk IDs
+        Returns:
+            List[Document]: Documents of the IDs that exist, in the given order
+        """
+        return self.base.get_documents(ids)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search for a query
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            List[Document]: Most similar documents found, best first
+        """
+        vector = self.embeddings.embed_query(query)
+        return self.query_by_vectors([vector], k, filter)[0][1]
+
+    def evaluate(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        nprobes: Optional[List[int]] = None
+    ) -> List[Dict[str, float]]:
+        """
+        Measure recall@k against exact search and per-query latency for several nprobe values
+        Args:
+            queries (np.ndarray): Query embeddings, one per row
+            k (int): Number of results per query
+            nprobes (list, optional): nprobe values to try
+        Returns:
+            list: One dict per nprobe with recall, mean and p95 latency in milliseconds
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        exact = [set(rows.tolist()) for rows, _ in self.base.search_rows(queries, k)]
+        exact_latency = []
+        for query in queries:
+            start = time.perf_counter()
+            self.base.search_rows(query, k)
+            exact_latency.append((time.perf_counter() - start) * 1000)
+
+        report = []
+        for nprobe in nprobes or [1, 2, 4, 8, 16, 32]:
+            recalls = []
+            latencies = []
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                rows, _ = self.search_rows(query, k, nprobe=nprobe)[0]
+                latencies.append((time.perf_counter() - start) * 1000)
+                if expected:
+                    recalls.append(len(expected.intersection(rows.tolist())) / len(expected))
+            report.append({
+                "nprobe": nprobe,
+                "recall_at_k": float(np.mean(recalls)) if recalls else 1.0,
+                "mean_latency_ms": float(np.mean(latencies)),
+                "p95_latency_ms": float(np.percentile(latencies, 95)),
+                "exact_mean_latency_ms": float(np.mean(exact_latency))
+            })
+        return report
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """
+        Persist centroids and inverted lists
+        Args:
+            directory (str, optional): Target directory, defaults to <persist_directory>/ivf
+        """
+        directory = directory or self.index_directory
+        if not directory:
+            raise ValueError("No directory given for IVFIndex")
+        os.makedirs(directory, exist_ok=True)
+        if self.centroids is not None:
+            np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "list_rows.npy"), self.list_rows)
+        np.save(os.path.join(directory, "list_offsets.npy"), self.list_offsets)
+        with open(os.path.join(directory, "ivf.json"), 'w') as f:
+            json.dump({
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "built_size": self.built_size,
+                "fingerprint": self.base.fingerprint(self.built_size)
+            }, f)
+
+    @classmethod
+    def load(
+        cls,
+        base: NumpyVectorIndex,
+        directory: Optional[str] = None,
+        nprobe: Optional[int] = None
+    ) -> 'IVFIndex':
+        """
+        Load persisted lists, building and saving them if missing or if the base
+        index was rewritten since
+        Args:
+            base (NumpyVectorIndex): Index the lists were built over
+            directory (str, optional): Directory of the lists, defaults to <persist_directory>/ivf
+            nprobe (int, optional): Override the saved nprobe
+        Returns:
+            IVFIndex: Loaded or rebuilt index
+        """
+        index = cls(base)
+        directory = directory or index.index_directory
+        meta_path = os.path.join(directory, "ivf.json") if directory else None
+        if not meta_path or not os.path.exists(meta_path):
+            index.build()
+            if directory:
+                index.save(directory)
+        else:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            index.nlist = meta["nlist"]
+            index.nprobe = meta["nprobe"]
+            built_size = meta["built_size"]
+            if built_size > len(base.ids) or base.fingerprint(built_size) != meta["fingerprint"]:
+                print("Warning: IVF lists are stale, rebuilding")
+                index.build()
+                index.save(directory)
+            else:
+                centroids_path = os.path.join(directory, "centroids.npy")
+                index.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+                index.list_rows = np.load(os.path.join(directory, "list_rows.npy"))
+                index.list_offsets = np.load(os.path.join(directory, "list_offsets.npy"))
+                index.built_size = built_size
+        if nprobe:
+            index.nprobe = nprobe
+        return index
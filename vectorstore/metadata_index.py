@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numbers
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+OPERATORS = {"$eq", "$ne", "$in", "$nin"} | RANGE_OPERATORS
+
+class MetadataIndex:
+    """Sorted-postings index over the metadata columns of a NumpyVectorIndex"""
+
+    def __init__(self, base):
+        """
+        Initialize the metadata index
+        Filters use the Chroma "where" syntax: {"field": value}, {"field": {"$op": value}}
+        with $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, and nested {"$and": [...]} or
+        {"$or": [...]}. Several fields in one dict are combined with AND.
+        Args:
+            base (NumpyVectorIndex): Index whose columns are indexed
+        """
+        self.base = base
+        self._version: Optional[int] = None
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def _refresh(self) -> None:
+        """Rebuild the postings if the base index changed"""
+        if self._version == self.base.version:
+            return
+        size = len(self.base.ids)
+        self._postings = {}
+        for key, column in self.base._columns.items():
+            values = np.asarray(column.values[:size])
+            valid = ~np.isnan(values) if column.kind == "number" else values >= 0
+            valid_rows = np.flatnonzero(valid)
+            order = valid_rows[np.argsort(values[valid_rows], kind="stable")]
+            # Sorted values with the row of each, plus all rows that have the field
+            self._postings[key] = (values[order], order, valid_rows)
+        self._version = self.base.version
+
+    def _value_range(self, key: str, low: Any, high: Any, low_inclusive: bool, high_inclusive: bool) -> np.ndarray:
+        """Sorted rows whose value lies in a range of the sorted postings"""
+        sorted_values, order, _ = self._postings[key]
+        start = 0 if low is None else np.searchsorted(
+            sorted_values, low, side="left" if low_inclusive else "right"
+        )
+        end = len(sorted_values) if high is None else np.searchsorted(
+            sorted_values, high, side="right" if high_inclusive else "left"
+        )
+        return np.sort(order[start:end]) if end > start else np.zeros(0, dtype=np.int64)
+
+    def _equal(self, key: str, value: Any) -> np.ndarray:
+        """Sorted rows whose field equals a value"""
+        column = self.base._columns[key]
+        if column.kind == "number":
+            # numbers.Number covers numpy integer and float scalars as well
+            if isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Number):
+                return np.zeros(0, dtype=np.int64)
+            return self._value_range(key, value, value, True, True)
+        code = column.lookup(value)
+        if code < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self._value_range(key, code, code, True, True)
+
+    def _field(self, key: str, condition: Any) -> np.ndarray:
+        """Evaluate the condition on a single field"""
+        if key not in self.base._columns:
+            return np.zeros(0, dtype=np.int64)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        result: Optional[np.ndarray] = None
+        low = high = None
+        low_inclusive = high_inclusive = True
+        for operator, value in condition.items():
+            if operator == "$eq":
+                rows = self._equal(key, value)
+            elif operator == "$ne":
+                rows = np.setdiff1d(self._postings[key][2], self._equal(key, value), assume_unique=True)
+            elif operator in ("$in", "$nin"):
+                matched = np.zeros(0, dtype=np.int64)
+                for item in value:
+                    matched = np.union1d(matched, self._equal(key, item))
+                rows = matched if operator == "$in" else np.setdiff1d(
+                    self._postings[key][2], matched, assume_unique=True
+                )
+            elif operator in RANGE_OPERATORS:
+                if self.base._columns[key].kind != "number":
+                    raise ValueError(f"Range filter {operator} needs a numeric field, got {key}")
+                if operator in ("$gt", "$gte"):
+                    low, low_inclusive = value, operator == "$gte"
+                else:
+                    high, high_inclusive = value, operator == "$lte"
+                continue
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+        if low is not None or high is not None:
+            rows = self._value_range(key, low, high, low_inclusive, high_inclusive)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result if result is not None else np.zeros(0, dtype=np.int64)
+
+    def _evaluate(self, node: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a filter node to sorted rows"""
+        parts: List[np.ndarray] = []
+        for key, condition in node.items():
+            if key == "$and":
+                rows = self._evaluate(condition[0]) if condition else None
+                for child in condition[1:]:
+                    rows = np.intersect1d(rows, self._evaluate(child), assume_unique=True)
+                parts.append(rows if rows is not None else np.arange(len(self.base.ids)))
+            elif key == "$or":
+                rows = np.zeros(0, dtype=np.int64)
+                for child in condition:
+                    rows = np.union1d(rows, self._evaluate(child))
+                parts.append(rows)
+            else:
+                parts.append(self._field(key, condition))
+
+        if not parts:
+            return np.arange(len(self.base.ids))
+        result = parts[0]
+        for rows in parts[1:]:
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def rows(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Find the live rows matching a filter
+        Args:
+            filter (dict, optional): Metadata filter
+        Returns:
+            np.ndarray: Sorted row indices
+        """
+        alive = self.base.alive
+        if not filter:
+            return np.flatnonzero(alive)
+        self._refresh()
+        rows = self._evaluate(filter).astype(np.int64)
+        return rows[alive[rows]]
+
+    def mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Find the live rows matching a filter
+        Args:
+            filter (dict, optional): Metadata filter
+        Returns:
+            np.ndarray: Boolean mask over all rows
+        """
+        if not filter:
+            return self.base.alive.copy()
+        mask = np.zeros(len(self.base.ids), dtype=bool)
+        mask[self.rows(filter)] = True
+        return mask
+
+    @staticmethod
+    def validate(filter: Optional[Dict[str, Any]]) -> None:
+        """
+        Check the structure of a filter without evaluating it
+        Args:
+            filter (dict, optional): Metadata filter
+        Raises:
+            ValueError: If the filter uses an unknown operator or a malformed clause
+        """
+        if filter is None:
+            return
+        if not isinstance(filter, dict):
+            raise ValueError(f"Filter must be an object, got {type(filter).__name__}")
+        for key, condition in filter.items():
+            if key in ("$and", "$or"):
+                if not isinstance(condition, list):
+                    raise ValueError(f"{key} needs a list of filters")
+                for child in condition:
+                    MetadataIndex.validate(child)
+                continue
+            if not isinstance(key, str) or key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator: {key}")
+            if not isinstance(condition, dict):
+                continue
+            for operator, value in condition.items():
+                if operator not in OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if operator in ("$in", "$nin") and not isinstance(value, list):
+                    raise ValueError(f"{operator} needs a list of values")
+                if operator in RANGE_OPERATORS and (
+                    isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Number)
+                ):
+                    raise ValueError(f"Range filter {operator} needs a number, got {value!r}")
+
+    @staticmethod
+    def _chroma_value(value: Any) -> Any:
+        """Convert numpy scalars, which Chroma does not accept, to Python values"""
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (list, tuple)):
+            return [MetadataIndex._chroma_value(item) for item in value]
+        return value
+
+    @staticmethod
+    def to_chroma_where(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Rewrite a filter for Chroma, which needs an explicit $and for several fields
+        and rejects $and / $or lists with fewer than two clauses
+        Args:
+            filter (dict, optional): Metadata filter
+        Returns:
+            dict: Equivalent Chroma "where" clause, or None for no filter
+        """
+        if not filter:
+            return None
+        clauses = []
+        for key, condition in filter.items():
+            if key in ("$and", "$or"):
+                children = [MetadataIndex.to_chroma_where(child) for child in condition]
+                if key == "$or" and None in children:
+                    # One branch matches every row
+                    continue
+                children = [child for child in children if child is not None]
+                if len(children) == 1:
+                    clauses.append(children[0])
+                elif children or key == "$or":
+                    # An empty $and matches every row; an empty $or matches none
+                    clauses.append({key: children})
+            elif isinstance(condition, dict):
+                clauses.extend(
+                    {key: {operator: MetadataIndex._chroma_value(value)}}
+                    for operator, value in condition.items()
+                )
+            else:
+                clauses.append({key: MetadataIndex._chroma_value(condition)})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,565 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import hashlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from .metadata_index import MetadataIndex
+
+INDEX_FILES = {
+    "vectors": "vectors.npy",
+    "ids": "ids.npy",
+    "texts": "texts.bin",
+    "offsets": "text_offsets.npy",
+    "columns": "columns.json"
+}
+
+class _TextBlob:
+    """Read-only sequence of texts stored as one UTF-8 buffer plus offsets"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+class _Column:
+    """One metadata field stored as a typed array"""
+
+    def __init__(self, kind: str, capacity: int):
+        """
+        Create an empty column; existing rows read as missing
+        Args:
+            kind (str): "number" for int/float values, "category" for everything else
+            capacity (int): Allocated rows
+        """
+        self.kind = kind
+        self.integer = True
+        self.categories: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+        if kind == "number":
+            self.values = np.full(capacity, np.nan, dtype=np.float64)
+        else:
+            self.values = np.full(capacity, -1, dtype=np.int32)
+
+    @staticmethod
+    def kind_of(value: Any) -> str:
+        """Column kind suited to a metadata value"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return "number"
+        return "category"
+
+    def code(self, value: Any) -> int:
+        """Category code of a value, adding it if new"""
+        key = (type(value).__name__, value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def lookup(self, value: Any) -> int:
+        """Category code of a value, or -2 if the value never occurs"""
+        return self.codes.get((type(value).__name__, value), -2)
+
+    def set(self, row: int, value: Any) -> None:
+        """Store a value, converting a number column to categories if needed"""
+        if value is None:
+            return
+        if self.kind == "number" and self.kind_of(value) != "number":
+            self.to_category()
+        if self.kind == "number":
+            self.values[row] = value
+            if isinstance(value, float):
+                self.integer = False
+        else:
+            self.values[row] = self.code(value)
+
+    def get(self, row: int) -> Any:
+        """Stored value of a row, or None when missing"""
+        value = self.values[row]
+        if self.kind == "number":
+            if np.isnan(value):
+                return None
+            return int(value) if self.integer else float(value)
+        return self.categories[value] if value >= 0 else None
+
+    def to_category(self) -> None:
+        """Convert a number column to a category column"""
+        numbers = self.values
+        self.kind = "category"
+        self.values = np.full(len(numbers), -1, dtype=np.int32)
+        for row in np.flatnonzero(~np.isnan(numbers)):
+            value = int(numbers[row]) if self.integer else float(numbers[row])
+            self.values[row] = self.code(value)
+
+    def resize(self, capacity: int) -> None:
+        """Grow the backing array"""
+        fill = np.nan if self.kind == "number" else -1
+        grown = np.full(capacity, fill, dtype=self.values.dtype)
+        grown[:len(self.values)] = self.values
+        self.values = grown
+
+    def describe(self) -> Dict[str, Any]:
+        """JSON-serializable description of the column"""
+        return {"kind": self.kind, "integer": self.integer, "categories": self.categories}
+
+    @classmethod
+    def restore(cls, description: Dict[str, Any], values: np.ndarray) -> '_Column':
+        """Rebuild a column from its description and stored values"""
+        column = cls.__new__(cls)
+        column.kind = description["kind"]
+        column.integer = description["integer"]
+        column.categories = description["categories"]
+        column.codes = {
+            (type(value).__name__, value): code for code, value in enumerate(column.categories)
+        }
+        column.values = values
+        return column
+
+class NumpyVectorIndex:
+    """Exact in-process vector index over a contiguous float32 matrix"""
+
+    def __init__(self, embedding_function: Embeddings, persist_directory: Optional[str] = None):
+        """
+        Initialize an empty index
+        Args:
+            embedding_function (Embeddings): Model used to embed queries
+            persist_directory (str, optional): Directory the index is saved to
+        """
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self._vectors: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._texts: Any = []
+        self._columns: Dict[str, _Column] = {}
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._writable = True
+        self.version = 0
+        self.prefilter_threshold = 0.25
+        self.metadata_index = MetadataIndex(self)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used for queries"""
+        return self.embedding_function
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension, 0 while the index is empty"""
+        return 0 if self._vectors is None else self._vectors.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Normalized embeddings of all rows, including deleted ones"""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[:self._size]
+
+    @property
+    def alive(self) -> np.ndarray:
+        """Mask of rows that have not been deleted"""
+        return self._alive[:self._size]
+
+    @property
+    def ids(self) -> List[str]:
+        """Chunk ID of every row, including deleted ones"""
+        return self._ids
+
+    def fingerprint(self, size: Optional[int] = None) -> str:
+        """
+        Hash the chunk IDs of the first rows
+        Indexes derived from row positions use it to detect a rewritten layout.
+        Args:
+            size (int, optional): Number of rows to include, defaults to all
+        Returns:
+            str: SHA-1 hex digest
+        """
+        digest = hashlib.sha1()
+        for chunk_id in self._ids[:size]:
+            digest.update(chunk_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _ensure_writable(self) -> None:
+        """Copy memory-mapped data into growable in-memory arrays"""
+        if self._writable:
+            return
+        self._vectors = np.array(self._vectors)
+        self._alive = np.array(self._alive)
+        self._texts = [self._texts[row] for row in range(len(self._texts))]
+        for column in self._columns.values():
+            column.values = np.array(column.values)
+        self._writable = True
+
+    def _reserve(self, rows: int, dimension: int) -> None:
+        """Make room for more rows, doubling capacity as needed"""
+        if self._vectors is None or self._size == 0:
+            self._vectors = np.zeros((max(rows, 1024), dimension), dtype=np.float32)
+            self._alive = np.zeros(len(self._vectors), dtype=bool)
+            for column in self._columns.values():
+                column.resize(len(self._vectors))
+            return
+        if dimension != self._vectors.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {dimension} does not match index dimension {self._vectors.shape[1]}"
+            )
+        needed = self._size + rows
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors))
+        vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+        for column in self._columns.values():
+            column.resize(capacity)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        documents: Optional[List[str]] = None
+    ) -> None:
+        """
+        Insert or replace rows
+        Args:
+            ids (List[str]): Chunk IDs
+            embeddings (list): Embeddings, normalized on insert
+            metadatas (list, optional): Metadata per chunk
+            documents (list, optional): Text per chunk
+        """
+        if not ids:
+            return
+        self._ensure_writable()
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        self.delete(ids)
+        self._reserve(len(ids), matrix.shape[1])
+
+        start = self._size
+        self._vectors[start:start + len(ids)] = matrix
+        self._alive[start:start + len(ids)] = True
+        for offset, chunk_id in enumerate(ids):
+            row = start + offset
+            self._rows[chunk_id] = row
+            self._ids.append(chunk_id)
+            self._texts.append(documents[offset] if documents else "")
+            metadata = metadatas[offset] if metadatas else None
+            for key, value in (metadata or {}).items():
+                column = self._columns.get(key)
+                if column is None:
+                    column = self._columns[key] = _Column(_Column.kind_of(value), len(self._vectors))
+                column.set(row, value)
+        self._size += len(ids)
+        self.version += 1
+
+        # An ID repeated within one call keeps only its last row
+        if len(set(ids)) != len(ids):
+            for offset, chunk_id in enumerate(ids):
+                if self._rows[chunk_id] != start + offset:
+                    self._alive[start + offset] = False
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> None:
+        """
+        Embed and insert documents
+        Args:
+            documents (List[Document]): Chunks to add
+            ids (List[str]): Chunk IDs
+        """
+        texts = [doc.page_content for doc in documents]
+        self.upsert(
+            ids,
+            self.embedding_function.embed_documents(texts),
+            [doc.metadata for doc in documents],
+            texts
+        )
+
+    def delete(self, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Delete rows by chunk ID
+        Args:
+            ids (list): Chunk IDs to delete; unknown IDs are ignored
+        """
+        rows = [self._rows.pop(chunk_id) for chunk_id in ids or [] if chunk_id in self._rows]
+        if rows:
+            self._ensure_writable()
+            self._alive[rows] = False
+            self.version += 1
+
+    def _metadata(self, row: int) -> Dict[str, Any]:
+        """Metadata of a row rebuilt from the columns"""
+        metadata = {}
+        for key, column in self._columns.items():
+            value = column.get(row)
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    def _document(self, row: int) -> Document:
+        """Document of a row"""
+        return Document(page_content=self._texts[row], metadata=self._metadata(row))
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch documents by chunk ID
+        Args:
+            ids (List[str]): Chunk IDs
+        Returns:
+            List[Document]: Documents of the IDs that exist, in the given order
+        """
+        return [self._document(self._rows[chunk_id]) for chunk_id in ids if chunk_id in self._rows]
+
+    def filter_mask(self, filter: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        Evaluate a metadata filter
+        Args:
+            filter (dict, optional): Filter such as {"source_type": "PDF"}, see MetadataIndex
+        Returns:
+            np.ndarray: Boolean mask over all rows, True for live rows that match
+        """
+        return self.metadata_index.mask(filter)
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Rows of the k highest finite scores, best first"""
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > k:
+            part = np.argpartition(scores[candidates], -k)[-k:]
+            candidates = candidates[part]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def search_rows(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Exact top-k search for a batch of query vectors
+        Args:
+            vectors (np.ndarray): Query embeddings, one per row
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (row indices, cosine scores) per query, best first
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        if self._size == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+
+        results = []
+        if filter:
+            matched = self.metadata_index.rows(filter)
+            if len(matched) <= self.prefilter_threshold * max(len(self), 1):
+                # Selective filter: score only the matching rows
+                candidates = self.vectors[matched]
+                for start in range(0, len(queries), 256):
+                    scores = queries[start:start + 256] @ candidates.T
+                    for row_scores in scores:
+                        top = self._top_k(row_scores, k)
+                        results.append((matched[top], row_scores[top]))
+                return results
+            mask = np.zeros(self._size, dtype=bool)
+            mask[matched] = True
+        else:
+            mask = self.alive
+
+        # Broad or no filter: score every row and mask out the rest
+        for start in range(0, len(queries), 256):
+            scores = queries[start:start + 256] @ self.vectors.T
+            scores[:, ~mask] = -np.inf
+            for row_scores in scores:
+                rows = self._top_k(row_scores, k)
+                results.append((rows, row_scores[rows]))
+        return results
+
+    def query_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[List[str], List[Document]]]:
+        """
+        Search with precomputed query embeddings
+        Args:
+            vectors (list): Query embeddings
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (chunk IDs, Document objects) per query
+        """
+        return [
+            ([self._ids[row] for row in rows], [self._document(row) for row in rows])
+            for rows, _ in self.search_rows(np.asarray(vectors), k, filter)
+        ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for a query and return cosine similarity scores
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (Document, score) pairs, best first
+        """
+        vector = self.embedding_function.embed_query(query)
+        rows, scores = self.search_rows(np.asarray([vector]), k, filter)[0]
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search for a query
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            List[Document]: Most similar documents, best first
+        """
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def save(self, persist_directory: Optional[str] = None) -> None:
+        """
+        Write the index in a compacted, memory-mappable layout
+        Args:
+            persist_directory (str, optional): Target directory, defaults to the index directory
+        """
+        directory = persist_directory or self.persist_directory
+        if not directory:
+            raise ValueError("No persist_directory given for NumpyVectorIndex")
+        os.makedirs(directory, exist_ok=True)
+
+        live = np.flatnonzero(self.alive)
+        texts = [self._texts[row].encode("utf-8") for row in live]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        if texts:
+            offsets[1:] = np.cumsum([len(text) for text in texts])
+        vectors = self.vectors[live] if len(live) else np.zeros((0, self.dimension), dtype=np.float32)
+
+        def write(name: str, writer) -> None:
+            path = os.path.join(directory, name)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                writer(f)
+            os.replace(tmp_path, path)
+
+        write(INDEX_FILES["vectors"], lambda f: np.save(f, np.ascontiguousarray(vectors)))
+        write(INDEX_FILES["ids"], lambda f: np.save(f, np.array([self._ids[row] for row in live], dtype=str)))
+        write(INDEX_FILES["texts"], lambda f: f.write(b"".join(texts)))
+        write(INDEX_FILES["offsets"], lambda f: np.save(f, offsets))
+        described = {}
+        for position, (key, column) in enumerate(self._columns.items()):
+            file_name = f"column_{position}.npy"
+            write(file_name, lambda f, column=column: np.save(f, column.values[:self._size][live]))
+            described[key] = dict(column.describe(), file=file_name)
+        write(INDEX_FILES["columns"], lambda f: f.write(json.dumps(described).encode("utf-8")))
+
+    @classmethod
+    def load(
+        cls,
+        persist_directory: str,
+        embedding_function: Embeddings,
+        mmap: bool = True
+    ) -> 'NumpyVectorIndex':
+        """
+        Load a saved index, or create an empty one if none exists
+        Args:
+            persist_directory (str): Directory the index was saved to
+            embedding_function (Embeddings): Model used to embed queries
+            mmap (bool): Memory-map vectors, texts and columns instead of reading them
+        Returns:
+            NumpyVectorIndex: Loaded index
+        """
+        index = cls(embedding_function, persist_directory)
+        vectors_path = os.path.join(persist_directory, INDEX_FILES["vectors"])
+        if not os.path.exists(vectors_path):
+            return index
+
+        mode = "r" if mmap else None
+        vectors = np.load(vectors_path, mmap_mode=mode)
+        ids = np.load(os.path.join(persist_directory, INDEX_FILES["ids"])).tolist()
+        offsets = np.load(os.path.join(persist_directory, INDEX_FILES["offsets"]))
+        texts_path = os.path.join(persist_directory, INDEX_FILES["texts"])
+        if os.path.getsize(texts_path) and mmap:
+            blob = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(texts_path, dtype=np.uint8)
+        with open(os.path.join(persist_directory, INDEX_FILES["columns"]), 'r') as f:
+            described = json.load(f)
+
+        index._vectors = vectors
+        index._size = len(ids)
+        index._alive = np.ones(len(ids), dtype=bool)
+        index._ids = ids
+        index._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        index._texts = _TextBlob(blob, offsets)
+        index._columns = {
+            key: _Column.restore(
+                description,
+                np.load(os.path.join(persist_directory, description["file"]), mmap_mode=mode)
+            )
+            for key, description in described.items()
+        }
+        index._writable = False
+        return index
+
+    @classmethod
+    def from_chroma(
+        cls,
+        vectordb,
+        persist_directory: Optional[str] = None,
+        batch_size: int = 5000
+    ) -> 'NumpyVectorIndex':
+        """
+        Copy the embeddings of an existing Chroma store without re-embedding
+        Args:
+            vectordb: Chroma vector store
+            persist_directory (str, optional): Directory to save the new index to
+            batch_size (int): Rows read from Chroma per request
+        Returns:
+            NumpyVectorIndex: Index holding the same chunks
+        """
+        index = cls(vectordb.embeddings, persist_directory)
+        collection = vectordb._collection
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            index.upsert(batch["ids"], batch["embeddings"], batch["metadatas"], batch["documents"])
+        if persist_directory:
+            index.save()
+        return index
@@ -0,0 +1,556 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import mmap
+import time
+import threading
+import weakref
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from .numpy_index import NumpyVectorIndex
+
+class Float16Codec:
+    """Store vectors as float16"""
+
+    name = "float16"
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Nothing to train"""
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Convert vectors to float16 codes"""
+        return np.asarray(vectors, dtype=np.float16)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Inner products between queries and encoded vectors"""
+        return queries @ codes.astype(np.float32).T
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to decode"""
+        return {}
+
+    def restore(self, state: Dict[str, np.ndarray]) -> None:
+        """Load arrays saved by state()"""
+
+class Int8Codec:
+    """Per-dimension scalar quantization to 8 bits"""
+
+    name = "int8"
+
+    def __init__(self):
+        self.minimum: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Learn the value range of every dimension"""
+        self.minimum = vectors.min(axis=0).astype(np.float32)
+        spread = vectors.max(axis=0) - self.minimum
+        self.scale = (np.where(spread == 0, 1, spread) / 255).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize vectors to uint8 codes"""
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimum) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Inner products against the dequantized vectors
+        q . (minimum + scale * c) = q . minimum + (q * scale) . c
+        """
+        return (queries @ self.minimum)[:, None] + (queries * self.scale) @ codes.astype(np.float32).T
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to decode"""
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def restore(self, state: Dict[str, np.ndarray]) -> None:
+        """Load arrays saved by state()"""
+        self.minimum = state["minimum"]
+        self.scale = state["scale"]
+
+class PQCodec:
+    """Product quantization: one byte per subspace, scored with lookup tables"""
+
+    name = "pq"
+
+    def __init__(self, subspaces: int = 32, n_iter: int = 15, seed: int = 0):
+        """
+        Initialize the codec
+        Args:
+            subspaces (int): Number of subvectors (bytes per vector)
+            n_iter (int): k-means iterations per subspace
+            seed (int): Random seed
+        """
+        self.subspaces = subspaces
+        self.n_iter = n_iter
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None
+        self.bounds: List[Tuple[int, int]] = []
+        # Trained centroids per subspace; fewer than 256 when trained on fewer vectors
+        self.clusters = 256
+
+    def _split(self, dimension: int) -> List[Tuple[int, int]]:
+        """Column ranges of the subspaces"""
+        edges = np.linspace(0, dimension, min(self.subspaces, dimension) + 1).astype(int)
+        return list(zip(edges[:-1], edges[1:]))
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Train up to 256 centroids per subspace with k-means"""
+        rng = np.random.default_rng(self.seed)
+        self.bounds = self._split(vectors.shape[1])
+        width = max(end - start for start, end in self.bounds)
+        clusters = self.clusters = min(256, len(vectors))
+        self.codebooks = np.zeros((len(self.bounds), 256, width), dtype=np.float32)
+        for position, (start, end) in enumerate(self.bounds):
+            sub = np.asarray(vectors[:, start:end], dtype=np.float32)
+            centroids = sub[rng.choice(len(sub), clusters, replace=False)].copy()
+            for _ in range(self.n_iter):
+                assignment = self._assign(sub, centroids)
+                counts = np.bincount(assignment, minlength=clusters)
+                filled = counts > 0
+                starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                sums = np.add.reduceat(
+                    sub[np.argsort(assignment, kind="stable")], starts[filled], axis=0
+                )
+                centroids[filled] = sums / counts[filled, None]
+            self.codebooks[position, :clusters, :end - start] = centroids
+
+    @staticmethod
+    def _assign(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid by Euclidean distance"""
+        distances = (
+            (centroids ** 2).sum(axis=1)[None, :]
+            - 2 * sub @ centroids.T
+        )
+        return np.argmin(distances, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors as one centroid index per subspace"""
+        codes = np.zeros((len(vectors), len(self.bounds)), dtype=np.uint8)
+        for position, (start, end) in enumerate(self.bounds):
+            # Untrained codebook rows are zero-filled and must never be assigned
+            centroids = self.codebooks[position, :self.clusters, :end - start]
+            for row in range(0, len(vectors), 8192):
+                sub = np.asarray(vectors[row:row + 8192, start:end], dtype=np.float32)
+                codes[row:row + 8192, position] = self._assign(sub, centroids)
+        return codes
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation: sum of per-subspace lookup table entries"""
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for position, (start, end) in enumerate(self.bounds):
+            table = queries[:, start:end] @ self.codebooks[position, :, :end - start].T
+            scores += table[:, codes[:, position]]
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to decode"""
+        return {
+            "codebooks": self.codebooks,
+            "bounds": np.array(self.bounds, dtype=np.int64),
+            "clusters": np.array(self.clusters, dtype=np.int64)
+        }
+
+    def restore(self, state: Dict[str, np.ndarray]) -> None:
+        """Load arrays saved by state()"""
+        self.codebooks = state["codebooks"]
+        self.bounds = [tuple(bound) for bound in state["bounds"].tolist()]
+        self.clusters = int(state["clusters"]) if "clusters" in state else self.codebooks.shape[1]
+
+CODECS = {"float16": Float16Codec, "int8": Int8Codec, "pq": PQCodec}
+
+def _drop_pages(vectors: np.ndarray) -> None:
+    """Let the OS unmap the pages of a memory-mapped array after a full scan"""
+    mapping = getattr(vectors, "_mmap", None)
+    if mapping is not None and hasattr(mapping, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        try:
+            mapping.madvise(mmap.MADV_DONTNEED)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not release memory-mapped vectors: {e}")
+
+class _RowReader:
+    """Rows of a saved vector file read with positional reads instead of a mapping
+
+    Faulting scattered rows of a memory map can page in far more than the rows
+    read. Reads go through the page cache, which the OS can reclaim, and leave
+    the process's resident memory alone.
+    """
+
+    def __init__(self, vectors: np.memmap):
+        """
+        Open the file behind a memory-mapped matrix
+        Args:
+            vectors (np.memmap): Matrix loaded with np.load(..., mmap_mode="r")
+        """
+        self.vectors = vectors
+        self.dtype = vectors.dtype
+        self.offset = vectors.offset
+        self.row_bytes = vectors.shape[1] * vectors.dtype.itemsize
+        self._file = open(vectors.filename, 'rb', buffering=0)
+        self._lock = threading.Lock()
+        weakref.finalize(self, self._file.close)
+
+    def read(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Read rows, in the given order
+        Args:
+            rows (np.ndarray): Row indices, sorted for sequential reads
+        Returns:
+            np.ndarray: One vector per row
+        """
+        chunks = []
+        for row in rows.tolist():
+            position = self.offset + row * self.row_bytes
+            if hasattr(os, "pread"):
+                chunks.append(os.pread(self._file.fileno(), self.row_bytes, position))
+            else:
+                with self._lock:
+                    self._file.seek(position)
+                    chunks.append(self._file.read(self.row_bytes))
+        return np.frombuffer(b"".join(chunks), dtype=self.dtype).reshape(len(rows), -1)
+
+class CompressedVectorIndex:
+    """Search a NumpyVectorIndex through compressed vectors, optionally re-ranking exactly
+
+    Only the codes need to be resident. Exact vectors stay out of process memory
+    when the base index is loaded with mmap=True: with exact="file" re-ranking reads
+    the shortlisted rows from the saved vector file, with exact="none" they are
+    never read.
+    """
+
+    def __init__(self, base: NumpyVectorIndex, mode: str = "int8", rerank: int = 0, exact: str = "file"):
+        """
+        Initialize the compressed index
+        Args:
+            base (NumpyVectorIndex): Index holding the exact vectors, documents and metadata
+            mode (str): "float16", "int8" or "pq"
+            rerank (int): Candidates re-scored with exact vectors, 0 disables re-ranking
+            exact (str): "file" to re-rank with rows read from the base index's saved
+                vectors (its in-memory vectors if it has unsaved changes), "none" to
+                never read exact vectors (requires rerank=0)
+        """
+        if mode not in CODECS:
+            raise ValueError(f"Unsupported compression mode: {mode}")
+        if exact not in ("file", "none"):
+            raise ValueError(f"Unsupported exact vector mode: {exact}")
+        if exact == "none" and rerank:
+            raise ValueError("Re-ranking needs exact vectors; use exact=\"file\" or rerank=0")
+        self.base = base
+        self.mode = mode
+        self.rerank = rerank
+        self.exact = exact
+        self.codec = CODECS[mode]()
+        self.codes: Optional[np.ndarray] = None
+        self.built_size = 0
+        self._reader: Optional[_RowReader] = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used for queries"""
+        return self.base.embeddings
+
+    @property
+    def persist_directory(self) -> Optional[str]:
+        """Directory of the underlying index"""
+        return self.base.persist_directory
+
+    @property
+    def index_directory(self) -> Optional[str]:
+        """Directory the codes are saved to"""
+        if not self.base.persist_directory:
+            return None
+        return os.path.join(self.base.persist_directory, f"compressed_{self.mode}")
+
+    def build(self, sample_size: int = 50_000, seed: int = 0) -> 'CompressedVectorIndex':
+        """
+        Train the codec and encode every row
+        Args:
+            sample_size (int): Rows used for training
+            seed (int): Random seed
+        Returns:
+            CompressedVectorIndex: self
+        """
+        vectors = self.base.vectors
+        self.built_size = len(vectors)
+        if self.built_size == 0:
+            self.codes = None
+            return self
+        rng = np.random.default_rng(seed)
+        sample = (
+            np.arange(len(vectors)) if len(vectors) <= sample_size
+            else np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        )
+        self.codec.train(np.asarray(vectors[sample], dtype=np.float32))
+        self.codes = np.concatenate([
+            self.codec.encode(vectors[start:start + 8192])
+            for start in range(0, len(vectors), 8192)
+        ])
+        # Encoding read every mapped row; searching does not need them resident
+        _drop_pages(vectors)
+        return self
+
+    def _exact_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Exact vectors of built rows, read from the saved file when the base is memory-mapped"""
+        vectors = self.base._vectors
+        if not isinstance(vectors, np.memmap) or not vectors.filename:
+            return vectors[rows]
+        if self._reader is None or self._reader.vectors is not vectors:
+            self._reader = _RowReader(vectors)
+        return self._reader.read(rows)
+
+    def exact_in_memory(self) -> bool:
+        """Whether the base index holds its exact vectors in memory rather than memory-mapped"""
+        vectors = self.base._vectors
+        return vectors is not None and len(vectors) > 0 and not isinstance(vectors, np.memmap)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """
+        Memory used for searching
+        Codes and codebooks are scanned by every query and count as resident. Exact
+        vectors count as resident when the base index holds them in memory; otherwise
+        re-ranking reads at most rerank rows per query from the saved file.
+        Returns:
+            dict: Bytes of codes and codebooks, resident exact vectors, exact bytes read
+                per query, the resident total, and the full-precision vectors the codes replace
+        """
+        codebook = sum(array.nbytes for array in self.codec.state().values())
+        codes = 0 if self.codes is None else self.codes.nbytes
+        exact = 0 if self.base._vectors is None else self.base._vectors.nbytes
+        resident = exact if self.exact_in_memory() else 0
+        rerank = self.rerank if self.exact == "file" else 0
+        return {
+            "codes": codes,
+            "codebook": codebook,
+            "compressed": codes + codebook,
+            "exact_resident": resident,
+            "rerank_per_query": rerank * self.base.dimension * 4,
+            "total": codes + codebook + resident,
+            "float32": self.built_size * self.base.dimension * 4
+        }
+
+    def search_rows(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: Optional[int] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k search scored against compressed vectors
+        Rows added after build are scored exactly.
+        Args:
+            vectors (np.ndarray): Query embeddings, one per row
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+            rerank (int, optional): Override the number of re-ranked candidates
+        Returns:
+            list: (row indices, scores) per query, best first
+        """
+        if self.codes is None:
+            return self.base.search_rows(vectors, k, filter)
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        rerank = self.rerank if rerank is None else rerank
+        if self.exact == "none":
+            rerank = 0
+        shortlist = max(k, rerank)
+        mask = self.base.filter_mask(filter)
+        base_vectors = self.base.vectors
+        tail = np.arange(self.built_size, len(base_vectors))
+        results = []
+        for start in range(0, len(queries), 64):
+            block = queries[start:start + 64]
+            scores = np.full((len(block), len(base_vectors)), -np.inf, dtype=np.float32)
+            # Decode in row blocks so temporaries stay small next to the codes
+            for row in range(0, self.built_size, 16384):
+                end = min(row + 16384, self.built_size)
+                scores[:, row:end] = self.codec.score(block, self.codes[row:end])
+            if len(tail):
+                scores[:, tail] = block @ base_vectors[tail].T
+            scores[:, ~mask] = -np.inf
+            for query, row_scores in zip(block, scores):
+                rows = self.base._top_k(row_scores, shortlist)
+                if rerank > k and len(rows):
+                    # Sorted rows keep reads of the vector file sequential
+                    rows = np.sort(rows)
+                    exact = self._exact_rows(rows) @ query
+                    order = np.argsort(-exact, kind="stable")[:k]
+                    results.append((rows[order], exact[order]))
+                else:
+                    results.append((rows[:k], row_scores[rows[:k]]))
+        return results
+
+    def query_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[List[str], List[Document]]]:
+        """
+        Search with precomputed query embeddings
+        Args:
+            vectors (list): Query embeddings
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (chunk IDs, Document objects) per query
+        """
+        return [
+            ([self.base.ids[row] for row in rows], [self.base._document(row) for row in rows])
+            for rows, _ in self.search_rows(np.asarray(vectors), k, filter)
+        ]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch documents by chunk ID
+        Args:
+            ids (List[str]): Chunk IDs
+        Returns:
+            List[Document]: Documents of the IDs that exist, in the given order
+        """
+        return self.base.get_documents(ids)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search for a query
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            List[Document]: Most similar documents found, best first
+        """
+        vector = self.embeddings.embed_query(query)
+        return self.query_by_vectors([vector], k, filter)[0][1]
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """
+        Persist codes and codec state
+        Args:
+            directory (str, optional): Target directory, defaults to <persist_directory>/compressed_<mode>
+        """
+        directory = directory or self.index_directory
+        if not directory:
+            raise ValueError("No directory given for CompressedVectorIndex")
+        os.makedirs(directory, exist_ok=True)
+        if self.codes is not None:
+            np.save(os.path.join(directory, "codes.npy"), self.codes)
+        for name, array in self.codec.state().items():
+            np.save(os.path.join(directory, f"codec_{name}.npy"), array)
+        with open(os.path.join(directory, "compressed.json"), 'w') as f:
+            json.dump({
+                "mode": self.mode,
+                "built_size": self.built_size,
+                "fingerprint": self.base.fingerprint(self.built_size),
+                "codec_state": sorted(self.codec.state())
+            }, f)
+
+    @classmethod
+    def load(
+        cls,
+        base: NumpyVectorIndex,
+        mode: str = "int8",
+        rerank: int = 0,
+        directory: Optional[str] = None,
+        exact: str = "file"
+    ) -> 'CompressedVectorIndex':
+        """
+        Load persisted codes, building and saving them if missing or stale
+        Args:
+            base (NumpyVectorIndex): Index the codes were built over
+            mode (str): "float16", "int8" or "pq"
+            rerank (int): Candidates re-scored with exact vectors
+            directory (str, optional): Directory of the codes
+            exact (str): "file" or "none", see __init__
+        Returns:
+            CompressedVectorIndex: Loaded or rebuilt index
+        """
+        index = cls(base, mode, rerank, exact)
+        if index.exact_in_memory():
+            print("Warning: the base index holds its exact vectors in memory; "
+                  "load it with NumpyVectorIndex.load(..., mmap=True) to keep them off the heap")
+        directory = directory or index.index_directory
+        meta_path = os.path.join(directory, "compressed.json") if directory else None
+        meta = None
+        if meta_path and os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta["built_size"] > len(base.ids) or base.fingerprint(meta["built_size"]) != meta["fingerprint"]:
+                print("Warning: compressed vectors are stale, rebuilding")
+                meta = None
+
+        if meta is None:
+            index.build()
+            if directory:
+                index.save(directory)
+            return index
+
+        index.built_size = meta["built_size"]
+        codes_path = os.path.join(directory, "codes.npy")
+        index.codes = np.load(codes_path, mmap_mode="r") if os.path.exists(codes_path) else None
+        index.codec.restore({
+            name: np.load(os.path.join(directory, f"codec_{name}.npy"))
+            for name in meta["codec_state"]
+        })
+        return index
+
+def compression_report(
+    base: NumpyVectorIndex,
+    queries: np.ndarray,
+    k: int = 10,
+    modes: Optional[List[str]] = None,
+    rerank: int = 0,
+    exact: str = "file"
+) -> List[Dict[str, Any]]:
+    """
+    Compare memory footprint, recall@k and latency of each compression mode
+    Args:
+        base (NumpyVectorIndex): Index holding the exact vectors
+        queries (np.ndarray): Query embeddings, one per row
+        k (int): Number of results per query
+        modes (list, optional): Modes to compare, defaults to all
+        rerank (int): Candidates re-scored with exact vectors
+        exact (str): "file" or "none", see CompressedVectorIndex
+    Returns:
+        list: One dict per mode with compressed and resident bytes, the compression
+            ratio against resident bytes, recall@k and mean latency
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    expected_rows = [set(rows.tolist()) for rows, _ in base.search_rows(queries, k)]
+    report = []
+    for mode in modes or list(CODECS):
+        index = CompressedVectorIndex(base, mode, rerank, exact).build()
+        memory = index.memory_bytes()
+        recalls = []
+        latencies = []
+        for query, expected in zip(queries, expected_rows):
+            start = time.perf_counter()
+            rows, _ = index.search_rows(query, k)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            if expected:
+                recalls.append(len(expected.intersection(rows.tolist())) / len(expected))
+        report.append({
+            "mode": mode,
+            "rerank": rerank,
+            "exact": exact,
+            "bytes": memory["compressed"],
+            "resident_bytes": memory["total"],
+            "exact_resident_bytes": memory["exact_resident"],
+            "rerank_bytes_per_query": memory["rerank_per_query"],
+            "float32_bytes": memory["float32"],
+            "compression_ratio": memory["float32"] / memory["total"] if memory["total"] else 0.0,
+            "recall_at_k": float(np.mean(recalls)) if recalls else 1.0,
+            "mean_latency_ms": float(np.mean(latencies)) if latencies else 0.0
+        })
+    return report
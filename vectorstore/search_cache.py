@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from .ingest_manifest import MANIFEST_FILE
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live"""
+
+    def __init__(self, max_entries: int = 4096, ttl: Optional[float] = None):
+        """
+        Initialize the cache
+        Args:
+            max_entries (int): Maximum number of entries before LRU eviction
+            ttl (float, optional): Seconds an entry stays valid, None keeps it until evicted
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a value
+        Args:
+            key: Cache key
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int = 0) -> None:
+        """
+        Store a value
+        Args:
+            key: Cache key
+            value: Value to store
+            size (int): Approximate memory used by the value in bytes
+        """
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        """Remove an entry; the caller holds the lock"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        Returns:
+            dict: Hit/miss counters, hit rate, entry count and approximate bytes used
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
+
+class SearchCache:
+    """Two-layer query cache: query text to embedding, and query to result IDs"""
+
+    def __init__(
+        self,
+        max_embeddings: int = 4096,
+        max_results: int = 4096,
+        ttl: Optional[float] = 3600.0
+    ):
+        """
+        Initialize the search cache
+        Args:
+            max_embeddings (int): Maximum number of cached query embeddings
+            max_results (int): Maximum number of cached result ID lists
+            ttl (float, optional): Seconds a cached result list stays valid
+        """
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results, ttl=ttl)
+        self.generation: Optional[int] = None
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        Normalize query text for cache lookups
+        Args:
+            query (str): Raw query text
+        Returns:
+            str: Query with surrounding and repeated whitespace collapsed
+        """
+        return " ".join(query.split())
+
+    @staticmethod
+    def result_key(query_key: str, k: int, filter_criteria: Optional[Dict[str, Any]]) -> tuple:
+        """
+        Build the result-layer key
+        Args:
+            query_key (str): Normalized query text identifying the embedding
+            k (int): Number of results
+            filter_criteria (dict, optional): Metadata filters
+        Returns:
+            tuple: Hashable key
+        """
+        filter_key = json.dumps(filter_criteria, sort_keys=True) if filter_criteria else ""
+        return (query_key, k, filter_key)
+
+    @staticmethod
+    def embedding_size(vector: Any) -> int:
+        """Approximate bytes used by a cached embedding"""
+        return sys.getsizeof(vector) + 24 * len(vector)
+
+    @staticmethod
+    def ids_size(ids: Any) -> int:
+        """Approximate bytes used by a cached result ID list"""
+        return sys.getsizeof(ids) + sum(sys.getsizeof(chunk_id) for chunk_id in ids)
+
+    def check_generation(self, generation: Optional[int]) -> None:
+        """
+        Drop cached results when the store generation changed
+        Query embeddings do not depend on the store and are kept.
+        Args:
+            generation (int, optional): Current store generation
+        """
+        if generation != self.generation:
+            if self.generation is not None:
+                self.results.clear()
+                self.invalidations += 1
+            self.generation = generation
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of both cache layers
+        Returns:
+            dict: Per-layer stats, total bytes, generation and invalidation count
+        """
+        embeddings = self.embeddings.stats()
+        results = self.results.stats()
+        return {
+            "embeddings": embeddings,
+            "results": results,
+            "bytes": embeddings["bytes"] + results["bytes"],
+            "generation": self.generation,
+            "invalidations": self.invalidations
+        }
+
+class StoreGeneration:
+    """Read the ingest generation of a persisted store, re-reading only when it changes"""
+
+    def __init__(self, persist_directory: Optional[str]):
+        """
+        Initialize the generation reader
+        Args:
+            persist_directory (str, optional): Directory holding the ingest manifest
+        """
+        self.path = os.path.join(persist_directory, MANIFEST_FILE) if persist_directory else None
+        self._signature: Optional[tuple] = None
+        self._generation: Optional[int] = None
+
+    def current(self) -> Optional[int]:
+        """
+        Get the current generation
+        Returns:
+            int: Generation stored in the manifest, or None if there is no manifest
+        """
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        # The manifest is replaced atomically, so a new inode or mtime means a new write
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with open(self.path, 'r') as f:
+                self._generation = json.load(f).get("generation", 0)
+            self._signature = signature
+        return self._generation
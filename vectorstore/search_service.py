@@ -0,0 +1,465 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import json
+import time
+import asyncio
+import argparse
+from functools import partial
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+from langchain.schema import Document
+from utils.metrics import metrics, SIZE_BUCKETS
+from .vector_search import VectorSearch
+from .metadata_index import MetadataIndex
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+# Largest k a request may ask for; one request sets the k searched for its whole batch group
+MAX_K = 100
+
+class ServiceOverloaded(Exception):
+    """Raised when the queue of pending queries is full"""
+
+class _BadRequest(Exception):
+    """Malformed HTTP request; the connection is answered and closed"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+@dataclass
+class _PendingQuery:
+    """Query waiting to be searched in the next batch"""
+    query: str
+    k: int
+    filter_criteria: Optional[Dict[str, Any]]
+    future: asyncio.Future
+    enqueued: float
+
+class QueryBatcher:
+    """Gather concurrent queries into batched VectorSearch.search_many calls"""
+
+    def __init__(
+        self,
+        search: VectorSearch,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 1024
+    ):
+        """
+        Initialize the batcher
+        Args:
+            search (VectorSearch): Search to run batches on
+            max_batch_size (int): Most queries embedded and searched in one call
+            max_wait_ms (float): Longest a query waits for others to join its batch
+            max_pending (int): Queries queued before new ones are rejected with
+                ServiceOverloaded
+        """
+        self.search = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.batches = 0
+        self.queries = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # A single thread keeps batches in order and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def pending(self) -> int:
+        """Number of queries waiting for a batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the batching worker on the running event loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker and fail the queries still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(ServiceOverloaded("Search service stopped"))
+        self._executor.shutdown(wait=False)
+
+    async def search_one(
+        self,
+        query: str,
+        k: int = 3,
+        filter_criteria: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search a query as part of the next batch
+        Args:
+            query (str): Search query
+            k (int): Number of results to return
+            filter_criteria (dict): Metadata filters, as for advanced_similarity_search
+        Returns:
+            list: List of relevant Document objects
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        pending = _PendingQuery(query, k, filter_criteria, loop.create_future(), time.perf_counter())
+        try:
+            self._queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            metrics.increment("service_rejected_total")
+            raise ServiceOverloaded(f"{self.max_pending} queries already pending")
+        return await pending.future
+
+    async def _collect(self) -> List[_PendingQuery]:
+        """Wait for a query, then for others until the batch is full or max_wait passes"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        """Search batches until cancelled; queries arriving meanwhile form the next batch"""
+        while True:
+            batch = [pending for pending in await self._collect() if not pending.future.done()]
+            try:
+                await self._search_batch(batch)
+            except asyncio.CancelledError:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(ServiceOverloaded("Search service stopped"))
+                raise
+            except Exception as e:
+                # Fail this batch but keep serving; later queries must not hang
+                metrics.increment("errors_total", operation="service")
+                print(f"Error in search batch: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    async def _search_batch(self, batch: List[_PendingQuery]) -> None:
+        """
+        Search one batch and resolve the futures of its queries
+        Args:
+            batch (List[_PendingQuery]): Queries collected for this batch
+        """
+        loop = asyncio.get_running_loop()
+        # search_many takes one k and filter per call: group by filter, search the
+        # largest k and cut each result list to the k that was asked for
+        groups: Dict[str, List[_PendingQuery]] = {}
+        for pending in batch:
+            key = json.dumps(pending.filter_criteria, sort_keys=True, default=str)
+            groups.setdefault(key, []).append(pending)
+
+        now = time.perf_counter()
+        for pending in batch:
+            metrics.observe("service_queue_seconds", now - pending.enqueued)
+        for group in groups.values():
+            metrics.observe("service_batch_size", len(group), SIZE_BUCKETS)
+            self.batches += 1
+            self.queries += len(group)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor,
+                    partial(
+                        self.search.search_many,
+                        [pending.query for pending in group],
+                        max(pending.k for pending in group),
+                        group[0].filter_criteria,
+                        raise_errors=True
+                    )
+                )
+            except Exception as e:
+                for pending in group:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+            for pending, docs in zip(group, results):
+                if not pending.future.done():
+                    pending.future.set_result(docs[:pending.k])
+
+class SearchService:
+    """Local asyncio HTTP service answering searches in micro-batches
+
+    Endpoints:
+        POST /search   {"query": str, "k": int, "filter": dict} -> {"results": [...]}
+        GET  /health   -> {"status": "ok", "pending": int, ...}
+        GET  /metrics  -> Prometheus text of utils.metrics
+    """
+
+    def __init__(
+        self,
+        search: VectorSearch,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 1024,
+        max_body_bytes: int = 65536,
+        max_k: int = MAX_K
+    ):
+        """
+        Initialize the service
+        Args:
+            search (VectorSearch): Search to serve
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 picks a free one
+            max_batch_size (int): Most queries searched in one batch
+            max_wait_ms (float): Longest a query waits for others to join its batch
+            max_pending (int): Queued queries before requests are answered with 503
+            max_body_bytes (int): Largest accepted request body
+            max_k (int): Largest k a request may ask for
+        """
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.max_k = max_k
+        self.batcher = QueryBatcher(search, max_batch_size, max_wait_ms, max_pending)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """
+        Start listening
+        Returns:
+            int: Port the service listens on
+        """
+        self.batcher.start()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop listening and fail the queries still waiting"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+
+    async def serve_forever(self) -> None:
+        """Start the service and run until cancelled"""
+        await self.start()
+        print(f"Search service listening on http://{self.host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _read_request(
+        self,
+        reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Read one HTTP/1.x request
+        Args:
+            reader (asyncio.StreamReader): Connection to read from
+        Returns:
+            tuple: Method, path, lower-cased headers and body, or None at end of stream
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            raise _BadRequest(400, "Malformed request line")
+        headers = {"_version": parts[2]}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise _BadRequest(400, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise _BadRequest(413, f"Request body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return parts[0].upper(), urlsplit(parts[1]).path, headers, body
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        content_type: str = "application/json",
+        keep_alive: bool = True
+    ) -> None:
+        """Write an HTTP response"""
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+
+    @staticmethod
+    def _json(payload: Any) -> bytes:
+        """Encode a JSON response body"""
+        return json.dumps(payload).encode("utf-8")
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, str]:
+        """
+        Answer a request
+        Args:
+            method (str): HTTP method
+            path (str): Request path without query string
+            body (bytes): Request body
+        Returns:
+            tuple: Status, response body and content type
+        """
+        if path == "/search":
+            if method != "POST":
+                return 405, self._json({"error": "Use POST"}), "application/json"
+            try:
+                request = json.loads(body)
+                query = request["query"]
+                k = int(request.get("k", 3))
+                filter_criteria = request.get("filter")
+                if not isinstance(query, str):
+                    raise ValueError("query must be a string")
+                if not 1 <= k <= self.max_k:
+                    raise ValueError(f"k must be between 1 and {self.max_k}")
+                # Unknown operators would otherwise only fail inside the batch search
+                MetadataIndex.validate(filter_criteria)
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, self._json({"error": f"Invalid search request: {e}"}), "application/json"
+            try:
+                docs = await self.batcher.search_one(query, k, filter_criteria)
+            except ServiceOverloaded as e:
+                return 503, self._json({"error": str(e)}), "application/json"
+            except Exception as e:
+                print(f"Error in search service: {e}")
+                return 500, self._json({"error": str(e)}), "application/json"
+            results = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+            return 200, self._json({"results": results}), "application/json"
+        if path == "/health":
+            return 200, self._json({
+                "status": "ok",
+                "pending": self.batcher.pending,
+                "batches": self.batcher.batches,
+                "queries": self.batcher.queries,
+                "rejected": self.batcher.rejected
+            }), "application/json"
+        if path == "/metrics":
+            return 200, metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        return 404, self._json({"error": f"Unknown path: {path}"}), "application/json"
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on a connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except _BadRequest as e:
+                    self._write_response(writer, e.status, self._json({"error": str(e)}), keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (
+                    headers["_version"] == "HTTP/1.1" or connection == "keep-alive"
+                )
+                with metrics.timer("service_request_seconds", path=path):
+                    status, payload, content_type = await self._route(method, path, body)
+                self._write_response(writer, status, payload, content_type, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def main():
+    """Serve a persisted vector store over HTTP"""
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP search service")
+    parser.add_argument("--persist-directory", default="docs/chroma/", help="Vector store directory")
+    parser.add_argument("--backend", choices=["chroma", "numpy", "sharded"], default="chroma", help="Vector store backend")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Most queries per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Longest wait for a batch to fill")
+    parser.add_argument("--max-pending", type=int, default=1024, help="Queued queries before answering 503")
+    parser.add_argument("--max-k", type=int, default=MAX_K, help="Largest k a request may ask for")
+    parser.add_argument(
+        "--fake-embeddings",
+        type=int,
+        default=None,
+        help="Use FakeEmbeddings of this dimension instead of OpenAI, for local testing"
+    )
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from .fake_embeddings import FakeEmbeddings
+        embedding = FakeEmbeddings(args.fake_embeddings)
+    else:
+        from utils.env import load_environment
+        from langchain_openai import OpenAIEmbeddings
+        load_environment()
+        embedding = OpenAIEmbeddings()
+    if args.backend == "numpy":
+        from .numpy_index import NumpyVectorIndex
+        vectordb = NumpyVectorIndex.load(args.persist_directory, embedding)
+    elif args.backend == "sharded":
+        from .sharded_store import ShardedVectorIndex
+        vectordb = ShardedVectorIndex.load(args.persist_directory, embedding)
+    else:
+        from langchain_community.vectorstores import Chroma
+        vectordb = Chroma(persist_directory=args.persist_directory, embedding_function=embedding)
+
+    service = SearchService(
+        VectorSearch(vectordb),
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        max_k=args.max_k
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
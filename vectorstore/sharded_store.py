@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import zlib
+import heapq
+import weakref
+import multiprocessing
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Set
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from utils.metrics import metrics
+from .numpy_index import NumpyVectorIndex
+
+SHARDS_FILE = "shards.json"
+
+# Shards loaded by each worker process, by directory, with the generation they were loaded at
+_worker_shards: Dict[str, Tuple[int, NumpyVectorIndex]] = {}
+
+def _shard_results(
+    shard: NumpyVectorIndex,
+    vectors: np.ndarray,
+    k: int,
+    filter: Optional[Dict[str, Any]]
+) -> List[Tuple[List[float], List[str]]]:
+    """Per-query (scores, chunk IDs) of a shard's top-k, best first"""
+    return [
+        (scores.tolist(), [shard.ids[row] for row in rows])
+        for rows, scores in shard.search_rows(vectors, k, filter)
+    ]
+
+def _search_saved_shard(
+    directory: str,
+    generation: int,
+    vectors: np.ndarray,
+    k: int,
+    filter: Optional[Dict[str, Any]]
+) -> List[Tuple[List[float], List[str]]]:
+    """
+    Search a saved shard in a worker process
+    The shard is memory-mapped once per process and reloaded when the store
+    was saved again.
+    Args:
+        directory (str): Shard directory
+        generation (int): Save generation of the store
+        vectors (np.ndarray): Query embeddings
+        k (int): Results per query
+        filter (dict, optional): Metadata filter, evaluated on the shard
+    Returns:
+        list: (scores, chunk IDs) per query, best first
+    """
+    loaded = _worker_shards.get(directory)
+    if loaded is None or loaded[0] != generation:
+        loaded = _worker_shards[directory] = (generation, NumpyVectorIndex.load(directory, None))
+    return _shard_results(loaded[1], vectors, k, filter)
+
+def _shutdown_executors(executors: Dict[str, Any]) -> None:
+    """Shut down and forget the pools of an index; module level so a finalizer holds no index"""
+    while executors:
+        _, executor = executors.popitem()
+        executor.shutdown()
+
+class ShardedVectorIndex:
+    """Collection split over NumpyVectorIndex shards and searched with parallel scatter-gather"""
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        persist_directory: Optional[str] = None,
+        num_shards: int = 4,
+        shard_by: str = "hash",
+        workers: str = "process"
+    ):
+        """
+        Initialize an empty sharded index
+        Args:
+            embedding_function (Embeddings): Model used to embed queries
+            persist_directory (str, optional): Directory holding one subdirectory per shard
+            num_shards (int): Number of shards
+            shard_by (str): "hash" of the chunk ID, or "source" to keep each source on one shard
+            workers (str): "process" to search saved shards in worker processes, "thread"
+                to search them on threads of this process, "none" to search sequentially
+        """
+        if shard_by not in ("hash", "source"):
+            raise ValueError(f"Unsupported shard key: {shard_by}")
+        if workers not in ("process", "thread", "none"):
+            raise ValueError(f"Unsupported worker type: {workers}")
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.num_shards = num_shards
+        self.shard_by = shard_by
+        self.workers = workers
+        self.shards = [
+            NumpyVectorIndex(embedding_function, self._shard_directory(number))
+            for number in range(num_shards)
+        ]
+        self.generation = 0
+        self.version = 0
+        self._shard_of: Dict[str, int] = {}
+        self._saved = False
+        # Pools start on first use and are shut down by close(), on exit or when the index is collected
+        self._executors: Dict[str, Any] = {}
+        weakref.finalize(self, _shutdown_executors, self._executors)
+
+    def _shard_directory(self, number: int) -> Optional[str]:
+        """Directory of a shard"""
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, f"shard-{number:03d}")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used for queries"""
+        return self.embedding_function
+
+    def __len__(self) -> int:
+        return len(self._shard_of)
+
+    def shard_for(self, chunk_id: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Pick the shard of a chunk
+        Args:
+            chunk_id (str): Chunk ID
+            metadata (dict, optional): Chunk metadata, whose source is the key when sharding by source
+        Returns:
+            int: Shard number
+        """
+        key = chunk_id
+        if self.shard_by == "source" and metadata and "source" in metadata:
+            key = str(metadata["source"])
+        return zlib.crc32(key.encode("utf-8")) % self.num_shards
+
+    def chunk_ids(self) -> List[str]:
+        """
+        Get the IDs of all stored chunks
+        Returns:
+            List[str]: Chunk IDs, grouped by shard
+        """
+        return list(self._shard_of)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        documents: Optional[List[str]] = None
+    ) -> None:
+        """
+        Insert or replace rows, writing to the shards in parallel
+        Args:
+            ids (List[str]): Chunk IDs
+            embeddings (list): Embeddings
+            metadatas (list, optional): Metadata per chunk
+            documents (list, optional): Text per chunk
+        """
+        if not ids:
+            return
+        groups: Dict[int, List[int]] = {}
+        moved = []
+        for position, chunk_id in enumerate(ids):
+            shard = self.shard_for(chunk_id, metadatas[position] if metadatas else None)
+            previous = self._shard_of.get(chunk_id)
+            if previous is not None and previous != shard:
+                moved.append(chunk_id)
+            groups.setdefault(shard, []).append(position)
+        # A chunk whose source changed shard leaves its old shard
+        if moved:
+            self.delete(moved)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+
+        def write(item: Tuple[int, List[int]]) -> None:
+            shard, positions = item
+            self.shards[shard].upsert(
+                [ids[position] for position in positions],
+                matrix[positions],
+                [metadatas[position] for position in positions] if metadatas else None,
+                [documents[position] for position in positions] if documents else None
+            )
+
+        list(self._thread_pool().map(write, groups.items()))
+        for shard, positions in groups.items():
+            for position in positions:
+                self._shard_of[ids[position]] = shard
+        self.version += 1
+        self._saved = False
+
+    def delete(self, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Delete rows by chunk ID
+        Args:
+            ids (list): Chunk IDs to delete; unknown IDs are ignored
+        """
+        groups: Dict[int, List[str]] = {}
+        for chunk_id in ids or []:
+            shard = self._shard_of.pop(chunk_id, None)
+            if shard is not None:
+                groups.setdefault(shard, []).append(chunk_id)
+        for shard, chunk_ids in groups.items():
+            self.shards[shard].delete(chunk_ids)
+        if groups:
+            self.version += 1
+            self._saved = False
+
+    def _documents_by_id(self, ids: List[str]) -> Dict[str, Document]:
+        """Documents of the IDs that exist, keyed by chunk ID"""
+        groups: Dict[int, List[str]] = {}
+        for chunk_id in dict.fromkeys(ids):
+            shard = self._shard_of.get(chunk_id)
+            if shard is not None:
+                groups.setdefault(shard, []).append(chunk_id)
+        found: Dict[str, Document] = {}
+        for shard, chunk_ids in groups.items():
+            found.update(zip(chunk_ids, self.shards[shard].get_documents(chunk_ids)))
+        return found
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch documents by chunk ID
+        Args:
+            ids (List[str]): Chunk IDs
+        Returns:
+            List[Document]: Documents of the IDs that exist, in the given order
+        """
+        found = self._documents_by_id(ids)
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def filter_ids(self, filter: Optional[Dict[str, Any]]) -> Set[str]:
+        """
+        Resolve a metadata filter to the chunk IDs it matches on any shard
+        Args:
+            filter (dict, optional): Metadata filter, see MetadataIndex
+        Returns:
+            set: Matching chunk IDs
+        """
+        matched: Set[str] = set()
+        for number in self._shards_for(filter):
+            shard = self.shards[number]
+            matched.update(shard.ids[row] for row in shard.metadata_index.rows(filter))
+        return matched
+
+    def _shards_for(self, filter: Optional[Dict[str, Any]]) -> List[int]:
+        """Shards that can hold matches: all, unless the store is sharded by a filtered source"""
+        if self.shard_by == "source" and filter and "source" in filter:
+            condition = filter["source"]
+            if isinstance(condition, dict) and set(condition) == {"$eq"}:
+                sources = [condition["$eq"]]
+            elif isinstance(condition, dict) and set(condition) == {"$in"}:
+                sources = list(condition["$in"])
+            elif not isinstance(condition, dict):
+                sources = [condition]
+            else:
+                sources = None
+            if sources is not None:
+                return sorted({self.shard_for("", {"source": source}) for source in sources})
+        return list(range(self.num_shards))
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        """Worker threads, started on first use"""
+        if "threads" not in self._executors:
+            self._executors["threads"] = ThreadPoolExecutor(max_workers=self.num_shards)
+        return self._executors["threads"]
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        """Worker processes, started on first use"""
+        if "processes" not in self._executors:
+            # Forking a process that runs thread pools can copy locks held by other threads
+            self._executors["processes"] = ProcessPoolExecutor(
+                max_workers=min(self.num_shards, 61),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executors["processes"]
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[float, str]]]:
+        """
+        Scatter a batch of queries to the shards and merge their top-k lists
+        Worker processes search the saved shards; unsaved changes are searched
+        on threads of this process.
+        Args:
+            vectors (np.ndarray): Query embeddings, one per row
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter, pushed down to every shard
+        Returns:
+            list: (cosine score, chunk ID) pairs per query, best first
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        targets = [number for number in self._shards_for(filter) if len(self.shards[number])]
+        with metrics.timer("shard_scatter_seconds", shards=len(targets)):
+            if self.workers == "process" and self._saved and len(targets) > 1:
+                pool = self._process_pool()
+                futures = [
+                    pool.submit(
+                        _search_saved_shard,
+                        self.shards[number].persist_directory,
+                        self.generation,
+                        queries,
+                        k,
+                        filter
+                    )
+                    for number in targets
+                ]
+                per_shard = [future.result() for future in futures]
+            elif self.workers == "none" or len(targets) <= 1:
+                per_shard = [_shard_results(self.shards[number], queries, k, filter) for number in targets]
+            else:
+                per_shard = list(self._thread_pool().map(
+                    lambda number: _shard_results(self.shards[number], queries, k, filter), targets
+                ))
+
+        # Each shard list is sorted best first; a heap merge yields the global top-k
+        merged = []
+        for query in range(len(queries)):
+            streams = [zip(results[query][0], results[query][1]) for results in per_shard]
+            merged.append(list(islice(heapq.merge(*streams, key=lambda item: -item[0]), k)))
+        return merged
+
+    def query_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[List[str], List[Document]]]:
+        """
+        Search with precomputed query embeddings
+        Args:
+            vectors (list): Query embeddings
+            k (int): Number of results per query
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (chunk IDs, Document objects) per query
+        """
+        results = []
+        for hits in self.search(np.asarray(vectors), k, filter):
+            # A chunk deleted since the search has no document; keep IDs and documents aligned
+            found = self._documents_by_id([chunk_id for _, chunk_id in hits])
+            ids = [chunk_id for _, chunk_id in hits if chunk_id in found]
+            results.append((ids, [found[chunk_id] for chunk_id in ids]))
+        return results
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for a query and return cosine similarity scores
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            list: (Document, score) pairs, best first
+        """
+        hits = self.search(np.asarray([self.embedding_function.embed_query(query)]), k, filter)[0]
+        found = self._documents_by_id([chunk_id for _, chunk_id in hits])
+        return [(found[chunk_id], float(score)) for score, chunk_id in hits if chunk_id in found]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search for a query
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Metadata filter
+        Returns:
+            List[Document]: Most similar documents, best first
+        """
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def save(self) -> None:
+        """Write every shard in parallel, then the shard layout"""
+        if not self.persist_directory:
+            raise ValueError("No persist_directory given for ShardedVectorIndex")
+        os.makedirs(self.persist_directory, exist_ok=True)
+        list(self._thread_pool().map(lambda shard: shard.save(), self.shards))
+        self.generation += 1
+        path = os.path.join(self.persist_directory, SHARDS_FILE)
+        with open(path + ".tmp", 'w') as f:
+            json.dump({
+                "num_shards": self.num_shards,
+                "shard_by": self.shard_by,
+                "generation": self.generation
+            }, f)
+        os.replace(path + ".tmp", path)
+        self._saved = True
+
+    @classmethod
+    def load(
+        cls,
+        persist_directory: str,
+        embedding_function: Embeddings,
+        num_shards: int = 4,
+        shard_by: str = "hash",
+        workers: str = "process"
+    ) -> 'ShardedVectorIndex':
+        """
+        Load a saved sharded index, or create an empty one if none exists
+        Args:
+            persist_directory (str): Directory the index was saved to
+            embedding_function (Embeddings): Model used to embed queries
+            num_shards (int): Number of shards of a new index; a saved index keeps its own
+            shard_by (str): Shard key of a new index; a saved index keeps its own
+            workers (str): "process", "thread" or "none", see __init__
+        Returns:
+            ShardedVectorIndex: Loaded index
+        """
+        layout = {}
+        path = os.path.join(persist_directory, SHARDS_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                layout = json.load(f)
+        index = cls(
+            embedding_function,
+            persist_directory,
+            num_shards=layout.get("num_shards", num_shards),
+            shard_by=layout.get("shard_by", shard_by),
+            workers=workers
+        )
+        if not layout:
+            return index
+        # A pool of its own, so a loaded index holds no threads until it is searched
+        with ThreadPoolExecutor(max_workers=index.num_shards) as executor:
+            index.shards = list(executor.map(
+                lambda number: NumpyVectorIndex.load(index._shard_directory(number), embedding_function),
+                range(index.num_shards)
+            ))
+        for number, shard in enumerate(index.shards):
+            for chunk_id in shard.ids:
+                index._shard_of[chunk_id] = number
+        index.generation = layout.get("generation", 0)
+        index._saved = True
+        return index
+
+    def close(self) -> None:
+        """Stop the worker threads and processes; they are started again if the index is used"""
+        _shutdown_executors(self._executors)
+
+    def __enter__(self) -> 'ShardedVectorIndex':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from typing import Iterator, Optional, Tuple, Union
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale vectors to unit length so dot products are cosine similarities
+    Args:
+        vectors (np.ndarray): One vector per row
+    Returns:
+        np.ndarray: float32 unit vectors; zero vectors stay zero
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def cosine_blocks(
+    a: np.ndarray,
+    b: np.ndarray,
+    block_size: int = 1024
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield the cosine matrix of two sets of unit vectors one block of rows at a time
+    Args:
+        a (np.ndarray): Unit vectors, one per row
+        b (np.ndarray): Unit vectors, one per row
+        block_size (int): Rows of a per block
+    Returns:
+        Iterator: (first row, block of scores with shape (rows, len(b)))
+    """
+    for start in range(0, len(a), block_size):
+        yield start, a[start:start + block_size] @ b.T
+
+def cosine_matrix(
+    a: np.ndarray,
+    b: np.ndarray,
+    top_n: Optional[int] = None,
+    block_size: int = 1024,
+    exclude_diagonal: bool = False
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Cosine similarity of every row of a against every row of b
+    Args:
+        a (np.ndarray): Unit vectors, one per row
+        b (np.ndarray): Unit vectors, one per row
+        top_n (int, optional): Keep only the n best matches per row
+        block_size (int): Rows of a scored at a time
+        exclude_diagonal (bool): Skip a[i] vs b[i], for a matrix of a set against itself
+    Returns:
+        np.ndarray: Full (len(a), len(b)) matrix, or with top_n a tuple of
+            (column indices, scores), each (len(a), n) and best first
+    """
+    if top_n is None:
+        matrix = np.empty((len(a), len(b)), dtype=np.float32)
+        for start, scores in cosine_blocks(a, b, block_size):
+            matrix[start:start + len(scores)] = scores
+        if exclude_diagonal:
+            np.fill_diagonal(matrix, np.nan)
+        return matrix
+
+    n = max(0, min(top_n, len(b) - 1 if exclude_diagonal else len(b)))
+    indices = np.empty((len(a), n), dtype=np.int64)
+    top_scores = np.empty((len(a), n), dtype=np.float32)
+    if n == 0:
+        return indices, top_scores
+    for start, scores in cosine_blocks(a, b, block_size):
+        rows = np.arange(len(scores))
+        if exclude_diagonal:
+            scores[rows, start + rows] = -np.inf
+        # Partial sort keeps only n candidates per row before ordering them
+        part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        part_scores = scores[rows[:, None], part]
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        indices[start:start + len(scores)] = part[rows[:, None], order]
+        top_scores[start:start + len(scores)] = part_scores[rows[:, None], order]
+    return indices, top_scores
@@ -1,18 +1,50 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from typing import List, Dict, Any, Optional
+import os
+import json
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set, Tuple
 from langchain.schema import Document
+from utils.metrics import metrics, SIZE_BUCKETS
+from .search_cache import SearchCache, StoreGeneration
+from .metadata_index import MetadataIndex
+from .bm25_index import BM25Index
 
 class VectorSearch:
-    def __init__(self, vectordb):
+    def __init__(
+        self,
+        vectordb,
+        cache: Optional[SearchCache] = None,
+        persist_directory: Optional[str] = None,
+        lexical_index: Optional[BM25Index] = None
+    ):
         """
         Initialize vector search
         Args:
-            vectordb: Chroma vector store instance
+            vectordb: Chroma vector store or NumpyVectorIndex instance
+            cache (SearchCache, optional): Query embedding and result cache
+            persist_directory (str, optional): Store directory whose ingest generation
+                invalidates cached results, defaults to the vector store's own directory
+            lexical_index (BM25Index, optional): BM25 index for hybrid search, defaults to
+                the one EmbeddingsStore saves in the store directory
         """
         self.vectordb = vectordb
-        
+        self.cache = cache
+        self.persist_directory = (
+            persist_directory
+            or getattr(vectordb, "_persist_directory", None)
+            or getattr(vectordb, "persist_directory", None)
+        )
+        self.generation = StoreGeneration(self.persist_directory)
+        self.lexical_index = lexical_index
+        self._lexical_generation: Optional[int] = None
+        # BM25 row masks of recent filters, keyed by filter and store/index versions
+        self._filter_masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.max_filter_masks = 64
+
+    @metrics.timed("search_seconds", method="basic")
     def basic_similarity_search(self, query: str, k: int = 3) -> List[Document]:
         """
         Perform basic similarity search
@@ -23,15 +55,19 @@ class VectorSearch:
             list: List of relevant Document objects
         """
         try:
+            if self.cache:
+                return self._cached_search([query], k)[0]
             return self.vectordb.similarity_search(query, k=k)
         except Exception as e:
+            metrics.increment("errors_total", operation="search", method="basic")
             print(f"Error in similarity search: {e}")
             return []
-            
+
+    @metrics.timed("search_seconds", method="advanced")
     def advanced_similarity_search(
-        self, 
-        query: str, 
-        k: int = 3, 
+        self,
+        query: str,
+        k: int = 3,
         filter_criteria: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
         """
@@ -39,18 +75,337 @@ class VectorSearch:
         Args:
             query (str): Search query
             k (int): Number of results to return
-            filter_criteria (dict): Metadata filters for search
+            filter_criteria (dict): Metadata filters for search, e.g. {"source_type": "PDF"},
+                {"source_type": {"$in": ["PDF", "URL"]}, "page": {"$gte": 10, "$lt": 20}}
+                or {"$or": [{"source_type": "URL"}, {"source_type": "YouTube"}]}
         Returns:
             list: List of relevant Document objects
         """
         try:
             if filter_criteria:
+                if self.cache:
+                    return self._cached_search([query], k, filter_criteria)[0]
                 return self.vectordb.similarity_search(
                     query,
                     k=k,
-                    filter=filter_criteria
+                    filter=self._native_filter(filter_criteria)
                 )
             return self.basic_similarity_search(query, k)
         except Exception as e:
+            metrics.increment("errors_total", operation="search", method="advanced")
             print(f"Error in advanced similarity search: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @metrics.timed("search_seconds", method="many")
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 3,
+        filter_criteria: Optional[Dict[str, Any]] = None,
+        raise_errors: bool = False
+    ) -> List[List[Document]]:
+        """
+        Search for many queries at once
+        All queries are embedded in one batched call and scored against the store
+        in a single batched lookup.
+        Args:
+            queries (List[str]): Search queries
+            k (int): Number of results to return per query
+            filter_criteria (dict): Metadata filters applied to every query
+            raise_errors (bool): Re-raise errors instead of returning empty results,
+                so callers such as the search service can report them
+        Returns:
+            list: One list of relevant Document objects per query, in input order
+        """
+        try:
+            if not queries:
+                return []
+            metrics.observe("search_batch_size", len(queries), SIZE_BUCKETS)
+            if self.cache:
+                return self._cached_search(queries, k, filter_criteria)
+            vectors = self._embed_queries(queries)
+            return [docs for _, docs in self._query(vectors, k, filter_criteria)]
+        except Exception as e:
+            metrics.increment("errors_total", operation="search", method="many")
+            print(f"Error in batched similarity search: {e}")
+            if raise_errors:
+                raise
+            return [[] for _ in queries]
+
+    @metrics.timed("search_seconds", method="hybrid")
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 3,
+        filter_criteria: Optional[Dict[str, Any]] = None,
+        fetch_k: Optional[int] = None,
+        rrf_k: int = 60
+    ) -> List[Document]:
+        """
+        Combine BM25 and vector rankings with reciprocal rank fusion
+        Exact terms such as course codes or fees are found by the lexical side even
+        when their embeddings are not close to the query.
+        Args:
+            query (str): Search query
+            k (int): Number of results to return
+            filter_criteria (dict): Metadata filters applied to both rankings
+            fetch_k (int, optional): Candidates taken from each ranking, defaults to max(4 * k, 20)
+            rrf_k (int): Rank offset of the fusion; larger values flatten the rank weights
+        Returns:
+            list: List of relevant Document objects
+        """
+        try:
+            lexical = self._lexical()
+            if lexical is None:
+                return self.advanced_similarity_search(query, k, filter_criteria)
+            fetch_k = fetch_k or max(4 * k, 20)
+            
+            vector_ids, vector_docs = self._query(self._embed_queries([query]), fetch_k, filter_criteria)[0]
+            lexical_ids = [
+                chunk_id for chunk_id, _ in
+                lexical.search(query, fetch_k, allowed_rows=self._filter_rows(lexical, filter_criteria))
+            ]
+            
+            scores: Dict[str, float] = {}
+            for ranking in (vector_ids, lexical_ids):
+                for rank, chunk_id in enumerate(ranking):
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            top = sorted(scores, key=scores.get, reverse=True)[:k]
+            
+            found = dict(zip(vector_ids, vector_docs))
+            missing = [chunk_id for chunk_id in top if chunk_id not in found]
+            found.update(zip(missing, self._get_documents(missing)))
+            return [found[chunk_id] for chunk_id in top if chunk_id in found]
+        except Exception as e:
+            metrics.increment("errors_total", operation="search", method="hybrid")
+            print(f"Error in hybrid search: {e}")
+            return []
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get query cache statistics
+        Returns:
+            dict: Hit rates and memory use of both cache layers, or None without a cache
+        """
+        return self.cache.stats() if self.cache else None
+
+    def _cached_search(
+        self,
+        queries: List[str],
+        k: int,
+        filter_criteria: Optional[Dict[str, Any]] = None
+    ) -> List[List[Document]]:
+        """
+        Search through the query cache
+        Cached result IDs are resolved to documents; the remaining queries are
+        embedded (skipping cached embeddings) and searched in one batch.
+        Args:
+            queries (List[str]): Search queries
+            k (int): Number of results per query
+            filter_criteria (dict): Metadata filters
+        Returns:
+            list: One list of Document objects per query
+        """
+        self.cache.check_generation(self.generation.current())
+        keys = [SearchCache.normalize_query(query) for query in queries]
+        results: List[Optional[List[Document]]] = [None] * len(queries)
+
+        missing: Dict[str, List[int]] = {}
+        for position, key in enumerate(keys):
+            ids = self.cache.results.get(SearchCache.result_key(key, k, filter_criteria))
+            if ids is not None:
+                results[position] = self._get_documents(ids)
+            else:
+                missing.setdefault(key, []).append(position)
+
+        if missing:
+            vectors = self._embed_queries(list(missing))
+            for (key, positions), (ids, docs) in zip(
+                missing.items(), self._query(vectors, k, filter_criteria)
+            ):
+                self.cache.results.put(
+                    SearchCache.result_key(key, k, filter_criteria),
+                    ids,
+                    SearchCache.ids_size(ids)
+                )
+                for position in positions:
+                    results[position] = docs
+        return results
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries the way similarity_search does, embedding repeated queries once
+        Queries go through embed_query (batched when the model offers embed_queries),
+        since some models embed queries and documents differently.
+        Args:
+            queries (List[str]): Search queries
+        Returns:
+            list: One embedding per query
+        """
+        vectors: Dict[str, List[float]] = {}
+        if self.cache:
+            for query in dict.fromkeys(queries):
+                vector = self.cache.embeddings.get(SearchCache.normalize_query(query))
+                if vector is not None:
+                    vectors[query] = vector
+
+        unique = [query for query in dict.fromkeys(queries) if query not in vectors]
+        if unique:
+            embeddings = self.vectordb.embeddings
+            if hasattr(embeddings, "embed_queries"):
+                embedded = embeddings.embed_queries(unique)
+            else:
+                embedded = [embeddings.embed_query(query) for query in unique]
+            for query, vector in zip(unique, embedded):
+                vectors[query] = vector
+                if self.cache:
+                    self.cache.embeddings.put(
+                        SearchCache.normalize_query(query),
+                        vector,
+                        SearchCache.embedding_size(vector)
+                    )
+        return [vectors[query] for query in queries]
+
+    def _query(
+        self,
+        vectors: List[List[float]],
+        k: int,
+        filter_criteria: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[List[str], List[Document]]]:
+        """
+        Look up the nearest chunks for a batch of query embeddings
+        Args:
+            vectors (list): Query embeddings
+            k (int): Number of results per query
+            filter_criteria (dict): Metadata filters
+        Returns:
+            list: (chunk IDs, Document objects) per query embedding
+        """
+        if hasattr(self.vectordb, "query_by_vectors"):
+            return self.vectordb.query_by_vectors(vectors, k=k, filter=filter_criteria)
+
+        # Chroma scores a list of query embeddings in one call
+        results = self.vectordb._collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=MetadataIndex.to_chroma_where(filter_criteria),
+            include=["documents", "metadatas"]
+        )
+        return [
+            (
+                list(ids),
+                [
+                    Document(page_content=text, metadata=metadata or {})
+                    for text, metadata in zip(texts, metadatas)
+                ]
+            )
+            for ids, texts, metadatas in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        ]
+
+    def _lexical(self) -> Optional[BM25Index]:
+        """
+        Get the lexical index, reloading the saved one after each ingest
+        Returns:
+            BM25Index: Lexical index, or None if there is none
+        """
+        if self.lexical_index is not None and self._lexical_generation is None:
+            return self.lexical_index
+        if not self.persist_directory:
+            return None
+        generation = self.generation.current()
+        if self.lexical_index is None or generation != self._lexical_generation:
+            directory = os.path.join(self.persist_directory, "bm25")
+            if not os.path.isdir(directory):
+                return None
+            self.lexical_index = BM25Index.load(directory)
+            self._lexical_generation = generation
+        return self.lexical_index
+
+    def _filter_rows(self, lexical: BM25Index, filter_criteria: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Resolve a metadata filter to a BM25 row mask, reusing it until the store changes
+        Args:
+            lexical (BM25Index): Lexical index the mask is built for
+            filter_criteria (dict): Metadata filters
+        Returns:
+            np.ndarray: Boolean mask over the rows of the lexical index, or None for no filter
+        """
+        if not filter_criteria:
+            return None
+        base = getattr(self.vectordb, "base", self.vectordb)
+        key = (
+            json.dumps(filter_criteria, sort_keys=True, default=str),
+            self.generation.current(),
+            getattr(base, "version", None),
+            id(lexical),
+            lexical.version
+        )
+        mask = self._filter_masks.get(key)
+        if mask is not None:
+            self._filter_masks.move_to_end(key)
+            return mask
+        mask = lexical.row_mask(self._filter_ids(filter_criteria))
+        self._filter_masks[key] = mask
+        while len(self._filter_masks) > self.max_filter_masks:
+            self._filter_masks.popitem(last=False)
+        return mask
+
+    def _filter_ids(self, filter_criteria: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+        """
+        Resolve a metadata filter to the chunk IDs it matches
+        Args:
+            filter_criteria (dict): Metadata filters
+        Returns:
+            set: Matching chunk IDs, or None for no filter
+        """
+        if not filter_criteria:
+            return None
+        base = getattr(self.vectordb, "base", self.vectordb)
+        if hasattr(base, "filter_ids"):
+            return base.filter_ids(filter_criteria)
+        if hasattr(base, "metadata_index"):
+            rows = base.metadata_index.rows(filter_criteria)
+            return {base.ids[row] for row in rows}
+        results = self.vectordb._collection.get(
+            where=MetadataIndex.to_chroma_where(filter_criteria),
+            include=[]
+        )
+        return set(results["ids"])
+
+    def _native_filter(self, filter_criteria: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Adapt a filter to the backend
+        In-process backends evaluate filters with MetadataIndex; Chroma needs
+        several fields wrapped in an explicit $and.
+        Args:
+            filter_criteria (dict): Metadata filters
+        Returns:
+            dict: Filter in the backend's syntax
+        """
+        if hasattr(self.vectordb, "query_by_vectors"):
+            return filter_criteria
+        return MetadataIndex.to_chroma_where(filter_criteria)
+
+    def _get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch documents by chunk ID, preserving the order of ids
+        Args:
+            ids (List[str]): Chunk IDs
+        Returns:
+            list: Document objects that still exist in the store
+        """
+        if not ids:
+            return []
+        if hasattr(self.vectordb, "get_documents"):
+            return self.vectordb.get_documents(ids)
+
+        results = self.vectordb._collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        }
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]